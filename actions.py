@@ -3,13 +3,212 @@ from astrbot.api import logger
 import astrbot.api.message_components as Comp
 import json
 from urllib.parse import urlencode
-import re
 import asyncio
 
-from . import utils, config
+from . import utils, config, breaker, imageproc, renderer, tracing, turntable
+from .render_cache import RenderCache, download as download_render
+from .sheet import compose_sheet
+from .namemc import NameMCError, RandomSkinBuffer
 
-async def process_skin_command(session: aiohttp.ClientSession, username: str, rendertype: str) -> list | str:
-    """处理 /skin 命令的核心逻辑"""
+STARLIGHT_UNAVAILABLE_MSG = "错误：Starlight 渲染服务暂时不可用，请稍后再试。"
+
+# 持有后台任务的引用，避免任务被垃圾回收
+_background_tasks: set[asyncio.Task] = set()
+
+def _spawn(coro) -> None:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+async def build_image_component(
+    session: aiohttp.ClientSession,
+    url: str,
+    render_cache: RenderCache | None = None,
+    cache_key: str | None = None,
+    immutable: bool = False,
+) -> Comp.Image | None:
+    """
+    构建 Starlight 渲染图的图片消息组件。
+
+    启用渲染缓存时先下载到本地再以文件发送，下载失败则退回到直接发送 URL。
+    Starlight 熔断期间只使用缓存（包括已过期的缓存），没有可用缓存时返回 None；
+    仅发送 URL 的模式下，半开状态会先预检一次渲染 URL。
+    """
+    circuit = breaker.starlight
+    if render_cache is not None and cache_key:
+        path = render_cache.get(cache_key, immutable)
+        if path:
+            return Comp.Image.fromFileSystem(path)
+        if not circuit.allow():
+            stale_path = render_cache.get(cache_key, immutable, allow_stale=True)
+            return Comp.Image.fromFileSystem(stale_path) if stale_path else None
+        path = await render_cache.fetch(session, cache_key, url, immutable)
+        if path:
+            return Comp.Image.fromFileSystem(path)
+        return None if circuit.state == breaker.OPEN else Comp.Image.fromURL(url=url)
+
+    if not circuit.allow():
+        return None
+    if circuit.state == breaker.HALF_OPEN and not await breaker.probe_starlight(session, url):
+        return None
+    return Comp.Image.fromURL(url=url)
+
+async def render_skin_image(
+    session: aiohttp.ClientSession,
+    rendertype: str,
+    uuid: str,
+    render_cache: RenderCache | None = None,
+) -> Comp.Image | None:
+    """
+    构建玩家渲染图的图片组件，Starlight 不可用且没有缓存时返回 None。
+
+    启用渲染缓存时，缓存以 (渲染类型, rendercrop, 皮肤材质哈希) 为键：
+    已知材质哈希且命中缓存时立即返回缓存图片，并在后台重新校验玩家是否更换了皮肤；
+    否则先获取玩家当前的材质哈希再下载渲染图。无法获取材质哈希时退回以 UUID 为键。
+
+    本地渲染器支持的类型在 render_backend 为 "local"（或 "auto" 且 Starlight 熔断）时在本地渲染。
+    """
+    if renderer.should_render_locally(rendertype, breaker.starlight.state != breaker.OPEN):
+        image = await render_local_image(session, rendertype, uuid)
+        if image is not None:
+            return image
+
+    render_url = utils.build_render_url(rendertype, uuid)
+    if render_cache is None:
+        return await build_image_component(session, render_url)
+
+    rendercrop = utils.get_rendercrop(rendertype)
+    textures, needs_revalidate = await utils.get_known_textures(uuid)
+    if textures and textures["hash"]:
+        key = RenderCache.make_key("texture", rendertype, rendercrop, textures["hash"])
+        path = render_cache.get(key, immutable=True)
+        if path:
+            logger.info(f"{tracing.log_prefix()}命中皮肤材质渲染缓存: {uuid} ({rendertype})")
+            if needs_revalidate:
+                _spawn(_revalidate_render(session, rendertype, uuid, textures["hash"], render_cache))
+            return Comp.Image.fromFileSystem(path)
+
+    if not textures or needs_revalidate:
+        textures = await utils.fetch_skin_textures(session, uuid) or textures
+
+    if textures and textures["hash"]:
+        key = RenderCache.make_key("texture", rendertype, rendercrop, textures["hash"])
+        return await build_image_component(session, render_url, render_cache, key, immutable=True)
+
+    return await build_image_component(
+        session, render_url, render_cache, RenderCache.make_key("render", rendertype, uuid, rendercrop)
+    )
+
+async def render_local_bytes(session: aiohttp.ClientSession, rendertype: str, uuid: str) -> bytes | None:
+    """使用本地渲染器生成 PNG 数据，无法获取皮肤材质时返回 None"""
+    textures, needs_revalidate = await utils.get_known_textures(uuid)
+    if not textures or needs_revalidate:
+        textures = await utils.fetch_skin_textures(session, uuid) or textures
+    if not textures:
+        return None
+    with tracing.span("local_render", rendertype=rendertype):
+        data = await renderer.render(session, rendertype, textures)
+    if data is not None:
+        logger.info(f"{tracing.log_prefix()}已在本地渲染 {uuid} 的 '{rendertype}'")
+    return data
+
+async def render_local_image(session: aiohttp.ClientSession, rendertype: str, uuid: str) -> Comp.Image | None:
+    """使用本地渲染器生成图片组件，无法获取皮肤材质时返回 None"""
+    data = await render_local_bytes(session, rendertype, uuid)
+    return Comp.Image.fromBytes(data) if data is not None else None
+
+def _read_file(path: str) -> bytes | None:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError as e:
+        # 缓存文件可能在读取前被淘汰
+        logger.warning(f"{tracing.log_prefix()}读取渲染缓存文件失败: {e!r}")
+        return None
+
+async def fetch_render_bytes(
+    session: aiohttp.ClientSession,
+    rendertype: str,
+    uuid: str,
+    render_cache: RenderCache | None = None,
+) -> bytes | None:
+    """
+    获取玩家渲染图的原始数据，供本地进一步处理（如拼图）。
+
+    与 render_skin_image 使用相同的本地渲染、渲染缓存键与熔断规则，
+    Starlight 不可用且没有缓存时返回 None。
+    """
+    if renderer.should_render_locally(rendertype, breaker.starlight.state != breaker.OPEN):
+        data = await render_local_bytes(session, rendertype, uuid)
+        if data is not None:
+            return data
+
+    render_url = utils.build_render_url(rendertype, uuid)
+    if render_cache is None:
+        return await download_render(session, render_url) if breaker.starlight.allow() else None
+
+    rendercrop = utils.get_rendercrop(rendertype)
+    textures, needs_revalidate = await utils.get_known_textures(uuid)
+    if not textures or needs_revalidate:
+        textures = await utils.fetch_skin_textures(session, uuid) or textures
+    if textures and textures["hash"]:
+        key, immutable = RenderCache.make_key("texture", rendertype, rendercrop, textures["hash"]), True
+    else:
+        key, immutable = RenderCache.make_key("render", rendertype, uuid, rendercrop), False
+    return await fetch_image_bytes(session, render_url, render_cache, key, immutable)
+
+async def fetch_image_bytes(
+    session: aiohttp.ClientSession,
+    url: str,
+    render_cache: RenderCache | None = None,
+    cache_key: str | None = None,
+    immutable: bool = False,
+) -> bytes | None:
+    """
+    获取 Starlight 图片的原始数据：启用渲染缓存时优先读取缓存，未命中再下载并写入缓存。
+    Starlight 熔断期间只使用缓存（包括已过期的缓存），没有可用数据时返回 None。
+    """
+    if render_cache is None or not cache_key:
+        return await download_render(session, url) if breaker.starlight.allow() else None
+    path = render_cache.get(cache_key, immutable)
+    if path is None:
+        if breaker.starlight.allow():
+            path = await render_cache.fetch(session, cache_key, url, immutable)
+        else:
+            path = render_cache.get(cache_key, immutable, allow_stale=True)
+    if path is None:
+        return None
+    return await asyncio.to_thread(_read_file, path)
+
+async def _revalidate_render(
+    session: aiohttp.ClientSession,
+    rendertype: str,
+    uuid: str,
+    known_hash: str,
+    render_cache: RenderCache,
+) -> None:
+    """后台重新校验玩家皮肤，皮肤已更换时预先渲染并缓存新皮肤"""
+    textures = await utils.fetch_skin_textures(session, uuid)
+    if not textures or not textures["hash"] or textures["hash"] == known_hash:
+        return
+    logger.info(f"{tracing.log_prefix()}玩家 {uuid} 已更换皮肤，正在后台刷新 '{rendertype}' 渲染缓存")
+    key = RenderCache.make_key("texture", rendertype, utils.get_rendercrop(rendertype), textures["hash"])
+    await build_image_component(
+        session, utils.build_render_url(rendertype, uuid), render_cache, key, immutable=True
+    )
+
+async def process_skin_command(
+    session: aiohttp.ClientSession,
+    username: str,
+    rendertype: str,
+    render_cache: RenderCache | None = None,
+    image_format: str | None = None,
+) -> list | str:
+    """
+    处理 /skin 命令的核心逻辑。
+    指定 image_format 时先获取渲染图，缩放并转换为该格式后再发送（见 imageproc）；
+    获取失败时不会再以 URL 方式重试同一个上游。
+    """
     # 1. 验证渲染类型
     rendertype_lower = rendertype.lower()
     is_valid, error_msg = utils.validate_rendertype(rendertype_lower)
@@ -23,99 +222,125 @@ async def process_skin_command(session: aiohttp.ClientSession, username: str, re
 
     # 3. 构建渲染 URL
     render_url = utils.build_render_url(rendertype_lower, uuid)
-    logger.info(f"为 {username} 生成渲染 URL: {render_url}")
-
-    # 4. 准备结果
+    logger.info(f"{tracing.log_prefix()}为 {username} 生成渲染 URL: {render_url}")
+
+    # 4. 准备结果（转换失败时 imageproc 会发送原图）
+    if image_format is not None:
+        data = await fetch_render_bytes(session, rendertype_lower, uuid, render_cache)
+        image = await imageproc.build_component(data, image_format) if data is not None else None
+    else:
+        image = await render_skin_image(session, rendertype_lower, uuid, render_cache)
+    if image is None:
+        return STARLIGHT_UNAVAILABLE_MSG
     render_desc = f"'{rendertype_lower}' 渲染"
     chain = [
         Comp.Plain(f"这是 {username} 的 {render_desc}：\n"),
-        Comp.Image.fromURL(url=render_url)
+        image
     ]
     return chain
 
 
-async def process_randomskin_command(session: aiohttp.ClientSession) -> list | str:
+async def process_multi_skin_command(
+    session: aiohttp.ClientSession,
+    username: str,
+    rendertypes: list[str],
+    render_cache: RenderCache | None = None,
+    image_format: str | None = None,
+) -> list | str:
     """
-    从 NameMC 随机皮肤页面获取一个随机皮肤，解析第一个玩家名称，获取 UUID 并返回默认皮肤渲染链。
-
-    使用 curl_cffi 的同步请求包装在线程中运行以绕过 Cloudflare。
+    处理 /skin <类型1,类型2,...> <玩家名称>：
+    只查询一次 UUID，并发获取所有渲染图，并在本地拼接为一张图片发送。
+    image_format 的含义同 process_skin_command。
     """
-    try:
-        # 延迟导入，避免没有依赖时启动失败
-        from curl_cffi import requests
-    except Exception as e:
-        logger.error(f"缺少 curl_cffi 库或导入失败: {e}")
-        return "错误：服务器未安装或无法加载 'curl_cffi' 库，无法访问 NameMC 随机皮肤页面。"
-
-    headers = config.DEFAULT_HEADER
-
-    def fetch_text(url: str) -> str:
-        # 使用 chrome120 指纹
-        resp = requests.get(url, headers=headers, impersonate="chrome120", timeout=20)
-        resp.raise_for_status()
-        text = resp.text
-        if "<title>Just a moment...</title>" in text:
-            raise Exception("被 Cloudflare 5秒盾拦截")
-        return text
-
-    # 获取随机皮肤页面
-    try:
-        html = await asyncio.to_thread(fetch_text, config.NAMEMC_RAMDOM)
-    except Exception as e:
-        logger.error(f"从 NameMC 获取随机页面失败: {e}")
-        return f"错误：无法从 NameMC 获取随机皮肤，请稍后再试。({e})"
-
-    # 解析 skin id
-    m = re.search(r'href="/skin/([A-Za-z0-9_-]+)"', html)
-    if not m:
-        logger.error("在 NameMC 随机页面中未找到 skin id")
-        return "错误：未能从 NameMC 随机页面解析出皮肤 ID。"
-    skinid = m.group(1)
-    skin_url = config.NAMEMC_SKIN.format(skinid=skinid)
-
-    # 请求皮肤页面并解析第一个玩家名
-    try:
-        skin_html = await asyncio.to_thread(fetch_text, skin_url)
-    except Exception as e:
-        logger.error(f"获取 NameMC 皮肤页面失败 ({skin_url}): {e}")
-        return f"错误：无法访问 NameMC 的皮肤页面，请稍后再试。({e})"
+    # 1. 验证渲染类型（去重并保持顺序）
+    types = list(dict.fromkeys(t.strip().lower() for t in rendertypes if t.strip()))
+    if not types:
+        return "错误：请提供至少一个渲染类型，多个类型之间用英文逗号分隔。"
+    for rendertype in types:
+        is_valid, error_msg = utils.validate_rendertype(rendertype)
+        if not is_valid:
+            return error_msg
 
-    # 尝试解析玩家名
-    player = None
-    m2 = re.search(r'/profile/([A-Za-z0-9_]{1,16})', skin_html)
-    if m2:
-        player = m2.group(1)
+    warning_msg = ""
+    if len(types) > config.SHEET_MAX_RENDERS:
+        warning_msg = f"⚠️ 注意：一次最多拼接 {config.SHEET_MAX_RENDERS} 种渲染类型，已自动截取前 {config.SHEET_MAX_RENDERS} 种。\n\n"
+        types = types[:config.SHEET_MAX_RENDERS]
+    if len(types) == 1:
+        return await process_skin_command(session, username, types[0], render_cache, image_format)
 
-    if not player:
-        logger.error("未能从皮肤页面解析出玩家名称")
-        return "错误：未能从 NameMC 的皮肤页面解析出玩家名称。"
+    # 2. 获取玩家 UUID（只查询一次）
+    uuid, error_msg = await utils.get_player_uuid(session, username)
+    if error_msg:
+        return error_msg
 
-    logger.info(f"从 NameMC 解析到玩家: {player} (skinid={skinid})")
+    # 3. 并发获取所有渲染图
+    logger.info(f"{tracing.log_prefix()}为 {username} 并发获取 {len(types)} 种渲染: {', '.join(types)}")
+    results = await asyncio.gather(*(fetch_render_bytes(session, t, uuid, render_cache) for t in types))
+    cells = [(t, data) for t, data in zip(types, results) if data is not None]
+    failed = [t for t, data in zip(types, results) if data is None]
+    if not cells:
+        return STARLIGHT_UNAVAILABLE_MSG
 
-    # 4) 使用默认渲染类型生成结果
-    return await process_skin_command(session, player, 'default')
+    # 4. 拼接为一张图片
+    try:
+        sheet = await asyncio.to_thread(compose_sheet, cells)
+    except (OSError, ValueError) as e:
+        logger.error(f"{tracing.log_prefix()}拼接渲染图失败: {e!r}")
+        return "错误：拼接渲染图失败，请稍后再试。"
+
+    if failed:
+        warning_msg += f"⚠️ 以下渲染类型获取失败，已跳过：{', '.join(failed)}\n\n"
+    types_desc = ", ".join(t for t, _ in cells)
+    if image_format is not None:
+        image = await imageproc.build_component(sheet, image_format)
+    else:
+        image = Comp.Image.fromBytes(sheet)
+    chain = [
+        Comp.Plain(f"{warning_msg}这是 {username} 的 {types_desc} 渲染：\n"),
+        image
+    ]
+    return chain
 
-async def upload_and_render_custom_skin(
+
+async def process_randomskin_command(
     session: aiohttp.ClientSession,
+    random_skins: RandomSkinBuffer,
+    render_cache: RenderCache | None = None,
+    image_format: str | None = None,
+) -> list | str:
+    """
+    从 NameMC 随机皮肤页面获取一个随机皮肤，解析第一个玩家名称，获取 UUID 并返回默认皮肤渲染链。
+
+    优先从后台预取的随机皮肤队列中取出，队列为空时才直接抓取 NameMC。
+    """
+    try:
+        _, player, _ = await random_skins.get()
+    except NameMCError as e:
+        return str(e)
+
+    # 使用默认渲染类型生成结果（UUID 已在预取时缓存）
+    return await process_skin_command(session, player, 'default', render_cache, image_format)
+
+def build_custom_render_url(
     uuid: str,
-    model_url: str,
-    username: str,
+    model_url: str | None = None,
     camera_position: dict | None = None,
     camera_focal_point: dict | None = None,
-) -> list:
-    """通过模型 URL 构建渲染 URL，使用 urlencode 确保参数正确编码。"""
+) -> str:
+    """
+    构建自定义渲染 URL，使用 urlencode 确保参数正确编码。
+    不提供模型 URL 时使用 Starlight 的标准玩家模型，只自定义相机。
+    """
     endpoint = config.CUSTOM_RENDER_API_ENDPOINT.format(uuid=uuid)
 
-    # 1. 模型 URL 添加欺骗后缀
-    tricked_model_url = f"{model_url}#.obj"
-
-    # 2. 准备所有查询参数
-    params = {
-        "wideModel": tricked_model_url,
-        "slimModel": tricked_model_url,
-    }
+    # 1. 模型 URL 添加欺骗后缀，并准备所有查询参数
+    params = {}
+    if model_url:
+        tricked_model_url = f"{model_url}#.obj"
+        params["wideModel"] = tricked_model_url
+        params["slimModel"] = tricked_model_url
 
-    # 3. 添加相机和焦点参数（转为紧凑的 JSON 字符串）
+    # 2. 添加相机和焦点参数（转为紧凑的 JSON 字符串）
     cam = camera_position or config.DEFAULT_CAMERA_POSITION
     params["cameraPosition"] = json.dumps(cam, separators=(",", ":"))
 
@@ -123,13 +348,21 @@ async def upload_and_render_custom_skin(
     if focal:
         params["cameraFocalPoint"] = json.dumps(focal, separators=(",", ":"))
 
-    # 4. 使用 urlencode 构建查询字符串
+    # 3. 使用 urlencode 构建查询字符串，拼接最终的 URL
     query_string = urlencode(params)
+    return f"{endpoint}?{query_string}"
 
-    # 5. 拼接最终的 URL
-    final_url = f"{endpoint}?{query_string}"
-
-    logger.info(f"为 {username} 构建的自定义渲染 URL: {final_url}")
+async def upload_and_render_custom_skin(
+    session: aiohttp.ClientSession,
+    uuid: str,
+    model_url: str,
+    username: str,
+    camera_position: dict | None = None,
+    camera_focal_point: dict | None = None,
+) -> list:
+    """通过模型 URL 构建自定义渲染的消息链"""
+    final_url = build_custom_render_url(uuid, model_url, camera_position, camera_focal_point)
+    logger.info(f"{tracing.log_prefix()}为 {username} 构建的自定义渲染 URL: {final_url}")
 
     chain = [
         Comp.Plain(f"这是为 {username} 使用自定义模型生成的渲染图：\n⚠️ 如果是空白图片，请检查上传的模型与渲染皮肤的类型是否一致（标准或纤细）\n"),
@@ -137,8 +370,71 @@ async def upload_and_render_custom_skin(
     ]
     return chain
 
-async def process_wallpaper_command(session: aiohttp.ClientSession, wallpaper_id: str, usernames: list[str]) -> list | str:
-    """处理 /wallpaper 命令的核心逻辑"""
+async def process_turntable_command(
+    session: aiohttp.ClientSession,
+    uuid: str,
+    username: str,
+    model_urls: list[str] | None = None,
+    camera_position: dict | None = None,
+    camera_focal_point: dict | None = None,
+    frames: int = config.TURNTABLE_FRAMES,
+    image_format: str = config.DEFAULT_TURNTABLE_FORMAT,
+) -> list | str:
+    """
+    生成 360° 转盘动图：以焦点为中心在轨道上生成 frames 个相机位置，
+    并发请求各帧的自定义渲染，再在本地合成为 GIF/WebP。
+
+    model_urls 为每帧使用的模型 URL（可以重复同一个 URL；一次性的文件服务链接需要每帧一个），
+    不提供时使用标准玩家模型。
+    """
+    frames = turntable.clamp_frames(frames)
+    if model_urls:
+        frames = min(frames, len(model_urls))
+    if not breaker.starlight.allow():
+        return STARLIGHT_UNAVAILABLE_MSG
+
+    # 1. 生成轨道上的相机位置与各帧的渲染 URL
+    focal = camera_focal_point or config.DEFAULT_CAMERA_FOCAL_POINT
+    positions = turntable.orbit_positions(camera_position or config.DEFAULT_CAMERA_POSITION, focal, frames)
+    urls = [
+        build_custom_render_url(uuid, model_urls[i] if model_urls else None, position, focal)
+        for i, position in enumerate(positions)
+    ]
+    logger.info(f"{tracing.log_prefix()}为 {username} 并发请求 {frames} 帧转盘渲染")
+
+    # 2. 并发下载所有帧，丢弃失败的帧
+    results = await turntable.fetch_frames(session, urls)
+    images = [data for data in results if data is not None]
+    if len(images) < max(config.TURNTABLE_MIN_FRAMES, frames // 2):
+        logger.warning(f"{tracing.log_prefix()}转盘渲染成功的帧数不足: {len(images)}/{frames}")
+        if breaker.starlight.state == breaker.OPEN:
+            return STARLIGHT_UNAVAILABLE_MSG
+        return "错误：转盘动图渲染失败，请检查模型文件或稍后再试。"
+
+    # 3. 在本地合成动图
+    try:
+        animation = await asyncio.to_thread(
+            turntable.assemble, images, image_format, config.TURNTABLE_FRAME_DURATION
+        )
+    except (OSError, ValueError) as e:
+        logger.error(f"{tracing.log_prefix()}合成转盘动图失败: {e!r}")
+        return "错误：合成转盘动图失败，请稍后再试。"
+
+    model_desc = "自定义模型" if model_urls else "标准模型"
+    chain = [
+        Comp.Plain(f"这是 {username} 使用{model_desc}的 360° 转盘渲染（{len(images)} 帧）：\n"),
+        Comp.Image.fromBytes(animation),
+    ]
+    return chain
+
+async def process_wallpaper_command(
+    session: aiohttp.ClientSession,
+    wallpaper_id: str,
+    usernames: list[str],
+    render_cache: RenderCache | None = None,
+    image_format: str | None = None,
+) -> list | str:
+    """处理 /wallpaper 命令的核心逻辑，image_format 的含义同 process_skin_command"""
     # 1. 验证壁纸ID
     wallpaper_lower = wallpaper_id.lower()
     is_valid, error_msg, max_players = utils.validate_wallpaper(wallpaper_lower)
@@ -160,15 +456,15 @@ async def process_wallpaper_command(session: aiohttp.ClientSession, wallpaper_id
         warning_msg = f"⚠️ 注意：壁纸 '{wallpaper_lower}' 最多支持 {max_players} 个玩家，已自动截取前 {max_players} 个。\n\n"
         actual_usernames = actual_usernames[:max_players]
 
-    # 4. 将所有玩家名称转换为UUID
+    # 4. 并发将所有玩家名称转换为UUID（结果保持原有顺序）
     player_uuids = []
     failed_players = []
 
-    for username in actual_usernames:
-        uuid, error_msg_uuid = await utils.get_player_uuid(session, username)
+    results = await utils.resolve_player_uuids(session, actual_usernames)
+    for username, (uuid, error_msg_uuid) in zip(actual_usernames, results):
         if error_msg_uuid:
             failed_players.append(username)
-            logger.warning(f"无法获取玩家 {username} 的 UUID，跳过该玩家")
+            logger.warning(f"{tracing.log_prefix()}无法获取玩家 {username} 的 UUID，跳过该玩家")
         else:
             player_uuids.append(uuid)
 
@@ -192,14 +488,22 @@ async def process_wallpaper_command(session: aiohttp.ClientSession, wallpaper_id
         playernames=player_uuids_path
     )
 
-    logger.info(f"为壁纸 '{wallpaper_lower}' 生成 URL（{len(player_uuids)} 个玩家）: {wallpaper_url}")
+    logger.info(f"{tracing.log_prefix()}为壁纸 '{wallpaper_lower}' 生成 URL（{len(player_uuids)} 个玩家）: {wallpaper_url}")
 
     # 8. 准备结果
+    cache_key = RenderCache.make_key("wallpaper", wallpaper_lower, player_uuids_path)
+    if image_format is not None:
+        data = await fetch_image_bytes(session, wallpaper_url, render_cache, cache_key)
+        image = await imageproc.build_component(data, image_format) if data is not None else None
+    else:
+        image = await build_image_component(session, wallpaper_url, render_cache, cache_key)
+    if image is None:
+        return STARLIGHT_UNAVAILABLE_MSG
     success_players = [name for name in actual_usernames if name not in failed_players]
     players_desc = ", ".join(success_players)
     chain = [
         Comp.Plain(f"{warning_msg}这是壁纸 '{wallpaper_lower}' (玩家: {players_desc})：\n"),
-        Comp.Image.fromURL(url=wallpaper_url)
+        image
     ]
     return chain
 
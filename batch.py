@@ -0,0 +1,168 @@
+import asyncio
+import io
+import os
+import re
+import time
+import zipfile
+from typing import Awaitable, Callable
+
+import aiohttp
+from PIL import Image
+from astrbot.api import logger
+
+from . import actions, config, utils
+from .render_cache import RenderCache
+
+# 进度回调：(已完成数量, 总数量, 失败数量)
+ProgressCallback = Callable[[int, int, int], Awaitable[None]]
+
+_separator_re = re.compile(r"[\s,，;；]+")
+
+
+def parse_roster(text: str) -> list[str]:
+    """
+    从消息或文本文件内容中解析玩家列表。
+    玩家之间可以用空白、换行、逗号或分号分隔，# 开头的行视为注释；按玩家名去重并保持顺序。
+    """
+    names: dict[str, str] = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        for name in _separator_re.split(line):
+            if name:
+                names.setdefault(name.lower(), name)
+    return list(names.values())
+
+
+def validate_image_format(image_format: str) -> tuple[bool, str | None]:
+    """
+    验证配置的批量渲染图片格式
+
+    Returns:
+        tuple[is_valid, error_msg]: 有效返回 (True, None)，无效返回 (False, error_msg)
+    """
+    if image_format not in config.BATCH_IMAGE_FORMATS:
+        available = ", ".join(config.BATCH_IMAGE_FORMATS)
+        return False, f"错误：插件配置中的批量渲染图片格式 '{image_format}' 无效，可选: {available}"
+    return True, None
+
+
+def output_path(rendertype: str) -> str:
+    """生成批量任务压缩包的保存路径"""
+    directory = os.path.join(utils.get_data_dir(), config.BATCH_OUTPUT_DIR)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"skins_{rendertype}_{time.strftime('%Y%m%d_%H%M%S')}.zip")
+
+
+async def remove_later(path: str, delay: float = config.BATCH_FILE_KEEP_SECONDS) -> None:
+    """等待平台发送完文件后删除压缩包"""
+    await asyncio.sleep(delay)
+    try:
+        os.remove(path)
+        logger.info(f"已清理批量渲染压缩包: {path}")
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error(f"清理批量渲染压缩包 {path} 失败: {e}")
+
+
+def _transcode(data: bytes, image_format: str) -> bytes:
+    with Image.open(io.BytesIO(data)) as img:
+        buf = io.BytesIO()
+        img.save(buf, format=config.BATCH_IMAGE_FORMATS[image_format])
+    return buf.getvalue()
+
+
+async def _render_one(
+    session: aiohttp.ClientSession,
+    username: str,
+    rendertype: str,
+    render_cache: RenderCache | None,
+    image_format: str,
+) -> bytes | None:
+    """单个玩家的流水线：UUID 查询 -> 获取渲染图 -> 可选转码，失败返回 None"""
+    uuid, error_msg = await utils.get_player_uuid(session, username)
+    if error_msg:
+        logger.warning(f"批量渲染：无法获取玩家 {username} 的 UUID，跳过该玩家")
+        return None
+    data = await actions.fetch_render_bytes(session, rendertype, uuid, render_cache)
+    if data is not None and image_format != "png":
+        data = await asyncio.to_thread(_transcode, data, image_format)
+    return data
+
+
+async def run_roster_job(
+    session: aiohttp.ClientSession,
+    usernames: list[str],
+    rendertype: str,
+    path: str,
+    render_cache: RenderCache | None = None,
+    progress: ProgressCallback | None = None,
+    concurrency: int = config.BATCH_CONCURRENCY,
+    image_format: str = config.DEFAULT_BATCH_IMAGE_FORMAT,
+) -> list[str]:
+    """
+    为一批玩家生成渲染图并打包为 zip。
+
+    最多 concurrency 个玩家同时处理，请求经过全局限流器（UUID 查询会自动合并为批量请求）。
+    渲染结果通过有界队列交给唯一的写入协程，逐个写入压缩包，内存中最多只保留少量图片；
+    每隔 BATCH_PROGRESS_INTERVAL 秒调用一次 progress 汇报进度。
+
+    Returns:
+        处理失败的玩家名称列表（同时写入压缩包内的 failed.txt）
+
+    Raises:
+        ValueError: image_format 无效（应先用 validate_image_format 检查）
+    """
+    is_valid, error_msg = validate_image_format(image_format)
+    if not is_valid:
+        raise ValueError(error_msg)
+    total = len(usernames)
+    pending: asyncio.Queue[str] = asyncio.Queue()
+    for name in usernames:
+        pending.put_nowait(name)
+    results: asyncio.Queue[tuple[str, bytes | None]] = asyncio.Queue(maxsize=max(1, concurrency))
+    failed: list[str] = []
+
+    async def worker() -> None:
+        while True:
+            try:
+                name = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                data = await _render_one(session, name, rendertype, render_cache, image_format)
+            except Exception as e:
+                logger.error(f"批量渲染玩家 {name} 时发生错误: {e!r}")
+                data = None
+            await results.put((name, data))
+
+    async def report(done: int) -> None:
+        try:
+            await progress(done, total, len(failed))
+        except Exception as e:
+            logger.warning(f"发送批量渲染进度失败: {e!r}")
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, total)))]
+    try:
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as archive:
+            last_report = time.monotonic()
+            for done in range(1, total + 1):
+                name, data = await results.get()
+                if data is None:
+                    failed.append(name)
+                else:
+                    # 图片本身已经压缩，直接存储；写入放到线程中避免阻塞事件循环
+                    await asyncio.to_thread(archive.writestr, f"{name}_{rendertype}.{image_format}", data)
+                now = time.monotonic()
+                if progress is not None and done < total and now - last_report >= config.BATCH_PROGRESS_INTERVAL:
+                    last_report = now
+                    await report(done)
+            if failed:
+                archive.writestr("failed.txt", "\n".join(failed) + "\n")
+    finally:
+        for task in workers:
+            task.cancel()
+    logger.info(f"批量渲染完成：共 {total} 个玩家，失败 {len(failed)} 个，已保存到 {path}")
+    return failed
@@ -0,0 +1,413 @@
+"""
+离线压测驱动：启动模拟上游（stub_server），把插件 config 中的上游地址指向它，
+然后以指定并发执行各指令的核心逻辑，输出吞吐量与延迟分位数。
+
+需要在安装了 AstrBot 及插件依赖的 Python 环境中运行，例如：
+    python benchmarks/run.py --scenario skin --scenario wallpaper -n 500 -c 20 --latency 80
+    python benchmarks/run.py --json before.json
+    python benchmarks/run.py --baseline before.json --tolerance 0.15
+
+场景：
+    skin        actions.process_skin_command
+    wallpaper   actions.process_wallpaper_command
+    randomskin  actions.process_randomskin_command（NameMC 需要 curl_cffi）
+    customskin  UUID 查询 -> 模型校验压缩 -> 上传 tmpfiles -> 构建自定义渲染（与 /customskin 的流程一致）
+"""
+import argparse
+import asyncio
+import importlib
+import importlib.machinery
+import importlib.util
+import json
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from stub_server import HOSTS, UPSTREAM_HOSTS, add_fault_arguments, parse_fault_args, serve_forever
+
+ROOT = Path(__file__).resolve().parent.parent
+# 插件目录名不一定是合法的包名，以固定的包名加载
+PACKAGE = "mcskin_bench_plugin"
+
+SCENARIOS = ("skin", "wallpaper", "randomskin", "customskin")
+
+
+def load_plugin() -> None:
+    """将插件目录注册为 PACKAGE 包，使其中的相对导入可以正常工作"""
+    spec = importlib.machinery.ModuleSpec(PACKAGE, None, is_package=True)
+    spec.submodule_search_locations = [str(ROOT)]
+    sys.modules[PACKAGE] = importlib.util.module_from_spec(spec)
+
+
+def plugin_module(name: str):
+    return importlib.import_module(f"{PACKAGE}.{name}")
+
+
+def point_config(config, base_urls: dict[str, str]) -> None:
+    """把 config 中所有指向真实上游的 URL 改写为模拟服务的地址，并让限流分组使用模拟服务的主机"""
+    for name, value in list(vars(config).items()):
+        if not isinstance(value, str) or not value.startswith("https://"):
+            continue
+        host = urlsplit(value).hostname
+        service = UPSTREAM_HOSTS.get(host)
+        if service:
+            setattr(config, name, base_urls[service] + value[len(f"https://{host}"):])
+    config.RATE_LIMIT_HOSTS = {group: [HOSTS[group]] for group in config.RATE_LIMIT_HOSTS}
+
+
+def write_model(path: str, size: int, seed: int) -> None:
+    """生成一个 size x size 网格的 OBJ 模型，带有注释、法线与未被引用的顶点，供压缩逻辑处理"""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        f.write(f"# benchmark model {seed}\nmtllib model.mtl\no Grid\n")
+        for i in range(size):
+            for j in range(size):
+                f.write(f"v {i * 0.5:.6f} {rng.uniform(-0.05, 0.05) + seed * 1e-4:.6f} {j * 0.5:.6f}\n")
+        for i in range(size):
+            for j in range(size):
+                f.write(f"vt {i / size:.6f} {j / size:.6f}\n")
+        f.write("vn 0.000000 1.000000 0.000000\n")
+        f.write("v 999.0 999.0 999.0\n")  # 未被引用的顶点
+        f.write("usemtl Skin\ns off\n")
+        for i in range(size - 1):
+            for j in range(size - 1):
+                a = i * size + j + 1
+                b, c, d = a + 1, a + size + 1, a + size
+                f.write(f"f {a}/{a}/1 {b}/{b}/1 {c}/{c}/1 {d}/{d}/1\n")
+
+
+class Context:
+    """压测期间共享的对象：插件模块、会话与各场景需要的资源"""
+
+    def __init__(self, args: argparse.Namespace, session: aiohttp.ClientSession, workdir: str):
+        self.args = args
+        self.session = session
+        self.workdir = workdir
+        self.players = [f"Bench{i:05d}" for i in range(args.players)]
+        self.render_cache = None
+        self.random_skins = None
+        self.models: list[str] = []
+        self.actions = plugin_module("actions")
+        self.config = plugin_module("config")
+        self.utils = plugin_module("utils")
+        self.objmodel = plugin_module("objmodel")
+        self.transfer = plugin_module("transfer")
+
+    def player(self, i: int) -> str:
+        return self.players[i % len(self.players)]
+
+
+async def _fetch_images(ctx: Context, chain: list) -> bool:
+    """模拟消息平台下载结果中以 URL 发送的图片"""
+    for component in chain:
+        url = getattr(component, "url", None) or getattr(component, "file", None)
+        if isinstance(url, str) and url.startswith("http"):
+            async with ctx.session.get(url) as response:
+                await response.read()
+                if response.status != 200:
+                    return False
+    return True
+
+
+async def run_skin(ctx: Context, i: int):
+    return await ctx.actions.process_skin_command(
+        ctx.session, ctx.player(i), ctx.args.rendertype, ctx.render_cache, ctx.args.image_format
+    )
+
+
+async def run_wallpaper(ctx: Context, i: int):
+    wallpaper = ctx.args.wallpaper
+    count = ctx.config.WALLPAPER_CONFIGS.get(wallpaper, 1)
+    names = [ctx.player(i + k) for k in range(count)]
+    return await ctx.actions.process_wallpaper_command(
+        ctx.session, wallpaper, names, ctx.render_cache, ctx.args.image_format
+    )
+
+
+async def run_randomskin(ctx: Context, i: int):
+    return await ctx.actions.process_randomskin_command(
+        ctx.session, ctx.random_skins, ctx.render_cache, ctx.args.image_format
+    )
+
+
+async def run_customskin(ctx: Context, i: int):
+    username = ctx.player(i)
+    uuid, error_msg = await ctx.utils.get_player_uuid(ctx.session, username)
+    if error_msg:
+        return error_msg
+    compact_path = os.path.join(ctx.workdir, f"compact_{i}.obj")
+    try:
+        stats = await asyncio.to_thread(ctx.objmodel.compact_obj, ctx.models[i % len(ctx.models)], compact_path)
+        model_url = await ctx.transfer.upload_to_tmpfiles(ctx.session, compact_path)
+        if not model_url:
+            return "上传失败"
+        camera, focal = ctx.objmodel.frame_camera(stats)
+        return await ctx.actions.upload_and_render_custom_skin(ctx.session, uuid, model_url, username, camera, focal)
+    finally:
+        try:
+            os.remove(compact_path)
+        except OSError:
+            pass
+
+
+RUNNERS = {
+    "skin": run_skin,
+    "wallpaper": run_wallpaper,
+    "randomskin": run_randomskin,
+    "customskin": run_customskin,
+}
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """最近秩法计算分位数"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(q * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+async def _stub_request(session: aiohttp.ClientSession, base_url: str, method: str, path: str):
+    async with session.request(method, base_url + path) as response:
+        return await response.json() if response.status == 200 else None
+
+
+async def prepare(ctx: Context, scenario: str, plugin_config: dict) -> None:
+    """每个场景开始前重建插件的缓存、限流器与熔断器，使场景之间互不影响"""
+    for name in ("ratelimit", "breaker", "renderer", "imageproc"):
+        plugin_module(name).configure(plugin_config)
+    ctx.utils.configure_uuid_lookup(plugin_config)
+
+    if ctx.args.render_cache:
+        cache_dir = os.path.join(ctx.workdir, f"render_cache_{scenario}")
+        ctx.render_cache = plugin_module("render_cache").RenderCache(cache_dir, 200 * 1024 * 1024, 3600)
+
+    if scenario == "randomskin":
+        namemc = plugin_module("namemc")
+        ctx.random_skins = namemc.RandomSkinBuffer(namemc.NameMCClient(), ctx.session, ctx.args.randomskin_buffer)
+        ctx.random_skins.start()
+
+    if scenario == "customskin" and not ctx.models:
+        # 模型在计时开始前生成；--shared-model 时所有请求使用同一个模型（测试上传去重）
+        count = 1 if ctx.args.shared_model else ctx.args.requests + ctx.args.warmup
+        for seed in range(count):
+            path = os.path.join(ctx.workdir, f"model_{seed}.obj")
+            write_model(path, ctx.args.model_grid, seed)
+            ctx.models.append(path)
+
+
+async def cleanup(ctx: Context) -> None:
+    if ctx.random_skins is not None:
+        await ctx.random_skins.stop()
+        await ctx.random_skins.client.close()
+        ctx.random_skins = None
+
+
+async def run_scenario(ctx: Context, scenario: str, stub_url: str) -> dict:
+    args = ctx.args
+    runner = RUNNERS[scenario]
+    latencies: list[float] = []
+    failures = 0
+    errors: dict[str, int] = {}
+
+    async def one(i: int, record: bool) -> None:
+        nonlocal failures
+        start = time.perf_counter()
+        try:
+            result = await runner(ctx, i)
+            ok = not isinstance(result, str)
+            if ok and args.fetch_images:
+                ok = await _fetch_images(ctx, result)
+            if not ok and isinstance(result, str):
+                key = result.splitlines()[0][:60]
+                errors[key] = errors.get(key, 0) + 1
+        except Exception as e:
+            ok = False
+            key = type(e).__name__
+            errors[key] = errors.get(key, 0) + 1
+        if record:
+            latencies.append(time.perf_counter() - start)
+            failures += not ok
+
+    async def drive(indices: range, record: bool) -> None:
+        pending = iter(indices)
+
+        async def worker() -> None:
+            for i in pending:
+                await one(i, record)
+
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+    await drive(range(args.requests, args.requests + args.warmup), record=False)
+    errors.clear()
+    await _stub_request(ctx.session, stub_url, "POST", "/_reset")
+    started = time.perf_counter()
+    await drive(range(args.requests), record=True)
+    elapsed = time.perf_counter() - started
+    stub_stats = await _stub_request(ctx.session, stub_url, "GET", "/_stats") or {}
+
+    latencies.sort()
+    return {
+        "scenario": scenario,
+        "requests": len(latencies),
+        "concurrency": args.concurrency,
+        "failures": failures,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "upstream": stub_stats.get("counts", {}),
+    }
+
+
+def print_report(results: list[dict]) -> None:
+    header = f"{'场景':<12}{'请求':>7}{'失败':>7}{'吞吐(次/秒)':>13}{'平均':>9}{'p50':>9}{'p95':>9}{'p99':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['scenario']:<12}{r['requests']:>7}{r['failures']:>7}{r['throughput']:>13.2f}"
+            f"{r['mean_ms']:>9.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+        )
+    print("（延迟单位：毫秒）")
+    for r in results:
+        upstream = ", ".join(
+            f"{service} " + "/".join(f"{status}:{n}" for status, n in statuses.items())
+            for service, statuses in r["upstream"].items()
+        )
+        print(f"\n[{r['scenario']}] 上游请求: {upstream or '无'}")
+        for message, n in sorted(r["errors"].items(), key=lambda item: -item[1]):
+            print(f"  失败 {n} 次: {message}")
+
+
+def compare(results: list[dict], baseline_path: str, tolerance: float) -> list[str]:
+    """与基线结果比较，吞吐量下降或 p95 上升超过 tolerance 时视为性能回退"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["scenario"]: r for r in json.load(f)["results"]}
+    regressions = []
+    for r in results:
+        base = baseline.get(r["scenario"])
+        if base is None:
+            continue
+        if r["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{r['scenario']}: 吞吐量 {base['throughput']:.2f} -> {r['throughput']:.2f} 次/秒")
+        if r["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{r['scenario']}: p95 {base['p95_ms']:.1f} -> {r['p95_ms']:.1f} ms")
+        if r["failures"] > base["failures"]:
+            regressions.append(f"{r['scenario']}: 失败数 {base['failures']} -> {r['failures']}")
+    return regressions
+
+
+def build_plugin_config(args: argparse.Namespace, config) -> dict:
+    plugin_config: dict = {}
+    if not args.rate_limits:
+        # 默认关闭限流，测量插件本身的开销；--rate-limits 时使用插件的默认限流
+        plugin_config.update({f"{group}_rate_limit": 0 for group in config.RATE_LIMIT_HOSTS})
+    for item in args.set or []:
+        key, _, value = item.partition("=")
+        try:
+            plugin_config[key] = json.loads(value)
+        except json.JSONDecodeError:
+            plugin_config[key] = value
+    return plugin_config
+
+
+async def main_async(args: argparse.Namespace, stub_port: int) -> int:
+    load_plugin()
+    config = plugin_module("config")
+    base_urls = {service: f"http://{host}:{stub_port}" for service, host in HOSTS.items()}
+    point_config(config, base_urls)
+    plugin_config = build_plugin_config(args, config)
+
+    workdir = tempfile.mkdtemp(prefix="mcskin_bench_")
+    session = plugin_module("transport").create_session(plugin_config)
+    ctx = Context(args, session, workdir)
+    results = []
+    try:
+        for scenario in args.scenario or ["skin"]:
+            await prepare(ctx, scenario, plugin_config)
+            try:
+                results.append(await run_scenario(ctx, scenario, base_urls["mojang"]))
+            finally:
+                await cleanup(ctx)
+    finally:
+        await session.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.json}")
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print("\n性能回退：")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\n与基线 {args.baseline} 相比没有超过 {args.tolerance:.0%} 的回退")
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="皮肤渲染插件离线压测")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="要运行的场景，可重复（默认 skin）")
+    parser.add_argument("-n", "--requests", type=int, default=200, help="每个场景计时的请求数")
+    parser.add_argument("-c", "--concurrency", type=int, default=10, help="并发数")
+    parser.add_argument("--warmup", type=int, default=0, help="计时前先执行的请求数")
+    parser.add_argument("--players", type=int, default=50, help="玩家名池大小（越小缓存命中越多）")
+    parser.add_argument("--rendertype", default="default", help="skin 场景的渲染类型")
+    parser.add_argument("--wallpaper", default="quick_hide", help="wallpaper 场景的壁纸 ID")
+    parser.add_argument("--randomskin-buffer", type=int, default=0, help="随机皮肤预取队列大小（0 表示每次实时抓取）")
+    parser.add_argument("--model-grid", type=int, default=60, help="customskin 场景模型的网格边长（顶点数为其平方）")
+    parser.add_argument("--shared-model", action="store_true", help="customskin 场景所有请求使用同一个模型")
+    parser.add_argument("--render-cache", action="store_true", help="启用渲染缓存（图片会下载到本地）")
+    parser.add_argument(
+        "--image-format", choices=("png", "webp", "jpeg"),
+        help="发送前将渲染图转换为该格式（配合 --set image_max_dimension=N 缩放）",
+    )
+    parser.add_argument("--fetch-images", action="store_true", help="模拟消息平台下载以 URL 发送的图片，计入延迟")
+    parser.add_argument("--rate-limits", action="store_true", help="保留插件默认的上游限流")
+    parser.add_argument("--set", action="append", metavar="KEY=VALUE", help="覆盖插件配置项（值按 JSON 解析），可重复")
+    parser.add_argument("--port", type=int, default=0, help="模拟服务端口（默认随机）")
+    parser.add_argument("--json", metavar="PATH", help="将结果写入 JSON 文件")
+    parser.add_argument("--baseline", metavar="PATH", help="与之前 --json 输出的基线比较，出现回退时以状态码 1 退出")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="允许的性能波动比例")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出插件日志")
+    add_fault_arguments(parser)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if not args.verbose:
+        logging.getLogger("astrbot").setLevel(logging.WARNING)
+
+    # 模拟服务在独立进程中运行，不与被测代码争用事件循环
+    ready = multiprocessing.Queue()
+    stub = multiprocessing.Process(target=serve_forever, args=(parse_fault_args(args), args.port, ready), daemon=True)
+    stub.start()
+    try:
+        port = ready.get(timeout=30)
+        code = asyncio.run(main_async(args, port))
+    finally:
+        stub.terminate()
+        stub.join()
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+本地模拟的上游服务：Mojang、Starlight、NameMC 与 tmpfiles.org。
+
+每个上游绑定到不同的回环地址（同一端口），使插件的限流、熔断与指标仍然按主机区分。
+可以为每个上游单独设置延迟、错误率、429 比例，NameMC 还可以模拟 Cloudflare 验证页。
+
+单独运行（便于手动调试）：
+    python benchmarks/stub_server.py --port 8650 --latency 50 --latency starlight=300
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+from aiohttp import web
+from PIL import Image
+
+# 上游名称 -> 绑定的回环地址（Linux 上整个 127.0.0.0/8 都指向本机）
+HOSTS = {
+    "mojang": "127.0.0.1",
+    "starlight": "127.0.0.2",
+    "namemc": "127.0.0.3",
+    "tmpfiles": "127.0.0.4",
+}
+
+# 真实上游主机 -> 由哪个模拟服务接管
+UPSTREAM_HOSTS = {
+    "api.mojang.com": "mojang",
+    "api.minecraftservices.com": "mojang",
+    "sessionserver.mojang.com": "mojang",
+    "textures.minecraft.net": "mojang",
+    "starlightskins.lunareclipse.studio": "starlight",
+    "namemc.com": "namemc",
+    "tmpfiles.org": "tmpfiles",
+}
+
+CLOUDFLARE_PAGE = (
+    "<!DOCTYPE html><html><head><title>Just a moment...</title></head>"
+    "<body>Checking your browser before accessing namemc.com.</body></html>"
+)
+
+# 以 "missing" 开头的玩家名视为不存在
+MISSING_PREFIX = "missing"
+
+
+@dataclass
+class Faults:
+    """单个上游的故障注入配置"""
+
+    latency: float = 0.0  # 基础延迟（毫秒）
+    jitter: float = 0.0  # 在基础延迟上叠加的随机延迟上限（毫秒）
+    error_rate: float = 0.0  # 返回 500 的比例
+    throttle_rate: float = 0.0  # 返回 429 的比例
+    challenge_rate: float = 0.0  # 返回 Cloudflare 验证页的比例（仅 NameMC）
+    retry_after: int = 1  # 429 响应的 Retry-After（秒）
+
+
+def player_uuid(name: str) -> str:
+    """玩家名 -> 固定的 UUID（32 位十六进制）"""
+    return hashlib.md5(name.lower().encode()).hexdigest()
+
+
+def _png(image: Image.Image) -> bytes:
+    buf = io.BytesIO()
+    image.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def make_skin() -> bytes:
+    """生成一张 64x64 的皮肤图片"""
+    rng = random.Random(64)
+    skin = Image.new("RGBA", (64, 64), (0, 0, 0, 0))
+    for x in range(0, 64, 4):
+        for y in range(0, 64, 4):
+            color = (rng.randrange(256), rng.randrange(256), rng.randrange(256), 255)
+            skin.paste(color, (x, y, x + 4, y + 4))
+    return _png(skin)
+
+
+def make_render(width: int, height: int) -> bytes:
+    """生成一张与 Starlight 渲染图大小相近的图片（透明背景 + 带噪点的人形色块）"""
+    noise = Image.effect_noise((width, height), 48).convert("RGBA")
+    body = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    mask = Image.new("L", (width, height), 0)
+    unit = width // 8
+    for box in (
+        (3 * unit, 0, 5 * unit, 2 * unit),  # 头
+        (3 * unit, 2 * unit, 5 * unit, 5 * unit),  # 躯干
+        (2 * unit, 2 * unit, 3 * unit, 5 * unit),  # 手臂
+        (5 * unit, 2 * unit, 6 * unit, 5 * unit),
+        (3 * unit, 5 * unit, 5 * unit, min(height, 8 * unit)),  # 腿
+    ):
+        mask.paste(255, box)
+    body.paste(noise, (0, 0), mask)
+    return _png(body)
+
+
+class StubServer:
+    """所有模拟上游共用一个 aiohttp 应用，按请求的目标地址区分上游"""
+
+    def __init__(
+        self,
+        faults: dict[str, Faults],
+        port: int = 0,
+        render_size: tuple[int, int] = (512, 832),
+        skins_per_page: int = 30,
+        page_bytes: int = 120_000,
+    ):
+        self.faults = faults
+        self.port = port
+        self.skins_per_page = skins_per_page
+        self.page_bytes = page_bytes
+        self.counts: Counter = Counter()
+        self.upload_bytes = 0
+        self._skin = make_skin()
+        self._render = make_render(*render_size)
+        self._runner: web.AppRunner | None = None
+        self._rng = random.Random()
+
+    @property
+    def base_urls(self) -> dict[str, str]:
+        """上游名称 -> 模拟服务的基础 URL"""
+        return {service: f"http://{host}:{self.port}" for service, host in HOSTS.items()}
+
+    def reset_counts(self) -> None:
+        self.counts.clear()
+        self.upload_bytes = 0
+
+    def _service(self, request: web.Request) -> str:
+        host = request.transport.get_extra_info("sockname")[0]
+        for service, address in HOSTS.items():
+            if address == host:
+                return service
+        return "mojang"
+
+    @web.middleware
+    async def _inject_faults(self, request: web.Request, handler):
+        if request.path.startswith("/_"):
+            # 统计接口不注入故障、不计数
+            return await handler(request)
+        service = self._service(request)
+        faults = self.faults.get(service) or Faults()
+        delay = faults.latency + self._rng.uniform(0, faults.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        roll = self._rng.random()
+        if roll < faults.throttle_rate:
+            response = web.Response(status=429, headers={"Retry-After": str(faults.retry_after)})
+        elif roll < faults.throttle_rate + faults.error_rate:
+            response = web.Response(status=500, text="Internal Server Error")
+        elif service == "namemc" and roll < faults.throttle_rate + faults.error_rate + faults.challenge_rate:
+            response = web.Response(status=403, text=CLOUDFLARE_PAGE, content_type="text/html")
+        else:
+            response = await handler(request)
+        self.counts[service, response.status] += 1
+        return response
+
+    # Mojang
+
+    async def _profile_by_name(self, request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        if name.lower().startswith(MISSING_PREFIX):
+            return web.Response(status=404)
+        return web.json_response({"id": player_uuid(name), "name": name})
+
+    async def _profiles_bulk(self, request: web.Request) -> web.Response:
+        names = await request.json()
+        return web.json_response([
+            {"id": player_uuid(name), "name": name}
+            for name in names
+            if not name.lower().startswith(MISSING_PREFIX)
+        ])
+
+    async def _profile_by_uuid(self, request: web.Request) -> web.Response:
+        uuid = request.match_info["uuid"]
+        return web.json_response({"id": uuid, "name": f"P{uuid[:10]}"})
+
+    async def _session_profile(self, request: web.Request) -> web.Response:
+        uuid = request.match_info["uuid"]
+        texture_hash = hashlib.sha256(uuid.encode()).hexdigest()
+        textures = {
+            "timestamp": int(time.time() * 1000),
+            "profileId": uuid,
+            "textures": {"SKIN": {"url": f"http://{request.host}/texture/{texture_hash}"}},
+        }
+        value = base64.b64encode(json.dumps(textures).encode()).decode()
+        return web.json_response({
+            "id": uuid,
+            "name": f"P{uuid[:10]}",
+            "properties": [{"name": "textures", "value": value}],
+        })
+
+    async def _texture(self, request: web.Request) -> web.Response:
+        return web.Response(body=self._skin, content_type="image/png")
+
+    # Starlight
+
+    async def _render_image(self, request: web.Request) -> web.Response:
+        return web.Response(body=self._render, content_type="image/png")
+
+    # NameMC
+
+    def _html_page(self, links: list[str]) -> str:
+        body = "".join(f'<div class="card"><a href="{link}">{link}</a></div>' for link in links)
+        # 链接放在页面中部，与真实页面一样需要读取一部分内容后才能找到
+        filler = "<!-- " + "x" * max(0, (self.page_bytes - len(body)) // 2) + " -->"
+        return f"<!DOCTYPE html><html><head><title>NameMC</title></head><body>{filler}{body}{filler}</body></html>"
+
+    async def _random_skins(self, request: web.Request) -> web.Response:
+        links = [f"/skin/{self._rng.getrandbits(64):016x}" for _ in range(self.skins_per_page)]
+        return web.Response(text=self._html_page(links), content_type="text/html")
+
+    async def _skin_page(self, request: web.Request) -> web.Response:
+        skinid = request.match_info["skinid"]
+        return web.Response(text=self._html_page([f"/profile/Skin_{skinid[:10]}"]), content_type="text/html")
+
+    # tmpfiles.org
+
+    async def _upload(self, request: web.Request) -> web.Response:
+        reader = await request.multipart()
+        filename = "model.obj"
+        async for part in reader:
+            if part.name == "file":
+                filename = part.filename or filename
+                while chunk := await part.read_chunk():
+                    self.upload_bytes += len(chunk)
+        file_id = self._rng.randrange(10_000_000, 99_999_999)
+        # 与真实接口相同，返回的是页面地址，由插件转换为下载地址
+        return web.json_response({"status": "success", "data": {"url": f"https://tmpfiles.org/{file_id}/{filename}"}})
+
+    # 统计接口（供压测驱动在进程外读取）
+
+    async def _stats(self, request: web.Request) -> web.Response:
+        counts: dict[str, dict[str, int]] = {}
+        for (service, status), n in sorted(self.counts.items()):
+            counts.setdefault(service, {})[str(status)] = n
+        return web.json_response({"counts": counts, "upload_bytes": self.upload_bytes})
+
+    async def _reset(self, request: web.Request) -> web.Response:
+        self.reset_counts()
+        return web.Response(status=204)
+
+    def build_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._inject_faults], client_max_size=64 * 1024 * 1024)
+        app.router.add_get("/users/profiles/minecraft/{name}", self._profile_by_name)
+        app.router.add_post("/minecraft/profile/lookup/bulk/byname", self._profiles_bulk)
+        app.router.add_get("/minecraft/profile/lookup/{uuid}", self._profile_by_uuid)
+        app.router.add_get("/session/minecraft/profile/{uuid}", self._session_profile)
+        app.router.add_get("/texture/{hash}", self._texture)
+        app.router.add_get("/render/{path:.+}", self._render_image)
+        app.router.add_get("/minecraft-skins/random", self._random_skins)
+        app.router.add_get("/skin/{skinid}", self._skin_page)
+        app.router.add_post("/api/v1/upload", self._upload)
+        app.router.add_get("/_stats", self._stats)
+        app.router.add_post("/_reset", self._reset)
+        return app
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        for service, host in HOSTS.items():
+            site = web.TCPSite(self._runner, host, self.port)
+            await site.start()
+            if self.port == 0:
+                # 第一个站点随机分配端口后，其余上游使用同一个端口
+                self.port = self._runner.addresses[0][1]
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def parse_fault_args(args: argparse.Namespace) -> dict[str, Faults]:
+    """
+    将命令行中的故障参数转换为各上游的 Faults。
+    每个参数可以写成 "值"（作用于所有上游）或 "上游=值"（只作用于该上游），可以重复出现。
+    """
+    faults = {service: Faults() for service in HOSTS}
+    for field in ("latency", "jitter", "error_rate", "throttle_rate", "challenge_rate"):
+        for item in getattr(args, field) or []:
+            service, _, value = item.rpartition("=")
+            if service and service not in faults:
+                raise SystemExit(f"未知的上游 '{service}'，可选: {', '.join(HOSTS)}")
+            for name in [service] if service else faults:
+                setattr(faults[name], field, float(value))
+    return faults
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group("故障注入（值或 上游=值，可重复）")
+    group.add_argument("--latency", action="append", metavar="[SVC=]MS", help="响应延迟（毫秒）")
+    group.add_argument("--jitter", action="append", metavar="[SVC=]MS", help="随机附加延迟上限（毫秒）")
+    group.add_argument("--error-rate", action="append", metavar="[SVC=]P", help="返回 500 的比例")
+    group.add_argument("--throttle-rate", action="append", metavar="[SVC=]P", help="返回 429 的比例")
+    group.add_argument("--challenge-rate", action="append", metavar="[SVC=]P", help="NameMC 返回 Cloudflare 验证页的比例")
+
+
+async def _serve(faults: dict[str, Faults], port: int, ready=None) -> None:
+    server = StubServer(faults, port)
+    await server.start()
+    if ready is not None:
+        ready.put(server.port)
+    else:
+        for service, url in server.base_urls.items():
+            print(f"{service:10s} {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def serve_forever(faults: dict[str, Faults], port: int = 0, ready=None) -> None:
+    """
+    在当前进程中运行模拟服务直到被终止。
+    作为子进程运行时通过 ready 队列（multiprocessing.Queue）返回实际端口，避免与压测驱动争用事件循环。
+    """
+    try:
+        asyncio.run(_serve(faults, port, ready))
+    except KeyboardInterrupt:
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="启动模拟上游服务")
+    parser.add_argument("--port", type=int, default=8650)
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+    serve_forever(parse_fault_args(args), args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+from astrbot.api import logger
+
+from . import config, ratelimit, transport
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    上游服务的熔断器。
+
+    连续失败（包括响应慢于 slow_threshold 秒）达到 failure_threshold 次后熔断，
+    熔断期间 allow() 返回 False；reset_timeout 秒后进入半开状态，放行一个探测请求，
+    探测成功则恢复，失败则继续熔断。
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, slow_threshold: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.slow_threshold = slow_threshold
+        self.state = CLOSED
+        self.failures = 0
+        self.last_latency: float | None = None
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+
+    def allow(self) -> bool:
+        """当前是否允许请求该上游"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == HALF_OPEN:
+            # 探测请求未汇报结果（如被取消）时，超时后允许再次探测
+            now = time.monotonic()
+            if not self._probing or now - self._probe_started >= self.reset_timeout:
+                self._probing = True
+                self._probe_started = now
+                return True
+        return False
+
+    def record_success(self, latency: float) -> None:
+        self.last_latency = latency
+        if latency > self.slow_threshold:
+            logger.warning(f"{self.name} 响应缓慢 ({latency:.1f} 秒)，记为一次失败")
+            self.record_failure()
+            return
+        if self.state != CLOSED:
+            logger.info(f"{self.name} 已恢复，关闭熔断")
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                logger.warning(f"{self.name} 连续失败 {self.failures} 次，熔断 {self.reset_timeout} 秒")
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+
+
+def _build(plugin_config: dict) -> CircuitBreaker:
+    return CircuitBreaker(
+        "Starlight",
+        failure_threshold=plugin_config.get("starlight_failure_threshold", config.STARLIGHT_FAILURE_THRESHOLD),
+        reset_timeout=plugin_config.get("starlight_reset_timeout", config.STARLIGHT_RESET_TIMEOUT),
+        slow_threshold=plugin_config.get("starlight_slow_threshold", config.STARLIGHT_SLOW_THRESHOLD),
+    )
+
+
+starlight = _build({})
+
+
+def configure(plugin_config: dict) -> None:
+    """根据插件配置重建 Starlight 熔断器"""
+    global starlight
+    starlight = _build(plugin_config)
+
+
+def for_url(url: str) -> CircuitBreaker | None:
+    """返回 URL 所属上游的熔断器，没有熔断器的上游返回 None"""
+    if urlsplit(url).hostname == urlsplit(config.STARLIGHT_RENDER_URL).hostname:
+        return starlight
+    return None
+
+
+async def probe_starlight(session: aiohttp.ClientSession, url: str = config.STARLIGHT_PROBE_URL) -> bool:
+    """请求一次渲染图（默认为固定的探测 URL），并将结果记录到熔断器"""
+    try:
+        async with ratelimit.request(session, "GET", url, timeout=transport.timeout("render")) as response:
+            await response.read()
+            ok = response.status == 200
+            latency = ratelimit.elapsed(response)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning(f"Starlight 健康检查失败: {e!r}")
+        ok = False
+    if ok:
+        starlight.record_success(latency or 0.0)
+    else:
+        starlight.record_failure()
+    # 响应过慢时 record_success 会重新熔断
+    return ok and starlight.state != OPEN
+
+
+async def run_probe(session: aiohttp.ClientSession, interval: float) -> None:
+    """后台定期探测 Starlight，使仅发送 URL 的模式也能感知服务状态"""
+    while True:
+        await asyncio.sleep(interval)
+        if starlight.allow():
+            await probe_starlight(session)
@@ -0,0 +1,86 @@
+import asyncio
+
+import aiohttp
+from astrbot.api import logger
+
+from . import config, ratelimit, transport
+
+# 进行中的批量请求：事件循环只弱引用任务，需要在这里保持引用直到完成，否则任务可能被回收，等待者一直挂起
+_send_tasks: set[asyncio.Task] = set()
+
+
+class BulkNameResolver:
+    """
+    使用 Mojang 批量接口查询玩家名的微批处理器。
+
+    在 window 秒的窗口内到达的查询（包括来自不同指令的并发查询）会被合并，
+    每 max_batch 个玩家名发送一次 POST 请求；窗口内凑满一批时立即发送。
+    """
+
+    def __init__(self, window: float = 0.005, max_batch: int = 10):
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: dict[str, list[asyncio.Future]] = {}
+        self._names: dict[str, str] = {}
+        self._session: aiohttp.ClientSession | None = None
+        self._timer: asyncio.TimerHandle | None = None
+
+    async def resolve(self, session: aiohttp.ClientSession, username: str) -> dict | None:
+        """
+        查询单个玩家名。
+
+        Returns:
+            玩家数据 {"id": ..., "name": ...}，玩家不存在时返回 None
+
+        Raises:
+            aiohttp.ClientError: 批量请求失败时抛出
+        """
+        loop = asyncio.get_running_loop()
+        key = username.lower()
+        future = loop.create_future()
+        self._pending.setdefault(key, []).append(future)
+        self._names.setdefault(key, username)
+        self._session = session
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, {}
+        names, self._names = self._names, {}
+        keys = list(pending)
+        for i in range(0, len(keys), self.max_batch):
+            chunk = {key: pending[key] for key in keys[i:i + self.max_batch]}
+            task = asyncio.create_task(self._send(self._session, chunk, [names[key] for key in chunk]))
+            _send_tasks.add(task)
+            task.add_done_callback(_send_tasks.discard)
+
+    async def _send(
+        self,
+        session: aiohttp.ClientSession,
+        chunk: dict[str, list[asyncio.Future]],
+        usernames: list[str],
+    ) -> None:
+        logger.info(f"正在通过 Mojang 批量接口查询 {len(usernames)} 个玩家: {', '.join(usernames)}")
+        try:
+            async with ratelimit.request(
+                session, "POST", config.MOJANG_BULK_API_URL, json=usernames, timeout=transport.timeout("api")
+            ) as response:
+                response.raise_for_status()
+                profiles = await response.json()
+            found = {p["name"].lower(): p for p in profiles if p.get("name") and p.get("id")}
+            for key, futures in chunk.items():
+                for future in futures:
+                    if not future.done():
+                        future.set_result(found.get(key))
+        except Exception as e:
+            for futures in chunk.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
@@ -1,12 +1,88 @@
+# 插件名称（用于数据目录）
+PLUGIN_NAME = "astrbot_plugin_minecraft_skin_render"
+
 # API URLs
 MOJANG_API_URL = "https://api.mojang.com/users/profiles/minecraft/{username}"
+MOJANG_BULK_API_URL = "https://api.minecraftservices.com/minecraft/profile/lookup/bulk/byname"
+MOJANG_SESSION_PROFILE_URL = "https://sessionserver.mojang.com/session/minecraft/profile/{uuid}"
+SKIN_TEXTURE_URL = "https://textures.minecraft.net/texture/{hash}"
 MOJANG_API_UUID_URL = "https://api.minecraftservices.com/minecraft/profile/lookup/{uuid}"
 STARLIGHT_RENDER_URL = "https://starlightskins.lunareclipse.studio/render/{rendertype}/{uuid}/{rendercrop}"
+STARLIGHT_PROBE_URL = "https://starlightskins.lunareclipse.studio/render/head/069a79f444e94726a5befca90e38aaf5/full"
 WALLPAPER_API_URL = "https://starlightskins.lunareclipse.studio/render/wallpaper/{wallpaper_id}/{playernames}"
+TMPFILES_UPLOAD_URL = "https://tmpfiles.org/api/v1/upload"
+
+# HTTP 连接配置
+HTTP_POOL_SIZE = 100  # 连接池总连接数上限
+HTTP_POOL_SIZE_PER_HOST = 20  # 单个主机的连接数上限
+HTTP_DNS_CACHE_TTL = 300  # DNS 解析结果缓存时间（秒）
+HTTP_KEEPALIVE_TIMEOUT = 60  # 空闲长连接的保持时间（秒）
+HTTP_CONNECT_TIMEOUT = 5  # 建立连接的超时时间（秒）
+# 各类请求的 (总超时, 读取超时)（秒）
+HTTP_TIMEOUTS = {
+    "default": (30, 20),
+    "api": (15, 10),
+    "render": (60, 45),
+    "upload": (60, 30),
+}
+HTTP_USER_AGENT = "astrbot_plugin_minecraft_skin_render (+https://github.com/SatellIta/astrbot_plugin_minecraft_skin_render)"
+
+# Starlight 熔断配置
+STARLIGHT_FAILURE_THRESHOLD = 3  # 连续失败多少次后熔断
+STARLIGHT_RESET_TIMEOUT = 60  # 熔断持续时间（秒），之后放行一个探测请求
+STARLIGHT_SLOW_THRESHOLD = 30  # 响应慢于该时间（秒）记为失败
+STARLIGHT_PROBE_INTERVAL = 60  # 后台健康检查间隔（秒），0 表示关闭
+
+# 上游限流配置：分组 -> 主机列表，以及分组默认的 (每秒请求数, 突发容量)
+RATE_LIMIT_HOSTS = {
+    "mojang": ["api.mojang.com", "api.minecraftservices.com", "sessionserver.mojang.com"],
+    "namemc": ["namemc.com"],
+    "tmpfiles": ["tmpfiles.org"],
+    "starlight": ["starlightskins.lunareclipse.studio"],
+}
+RATE_LIMIT_DEFAULTS = {
+    "mojang": (2.0, 10),
+    "namemc": (0.5, 3),
+    "tmpfiles": (1.0, 3),
+    "starlight": (5.0, 10),
+}
+# 各上游同时进行的最大请求数（0 表示不限制），可在插件配置中以 {分组}_max_concurrency 覆盖
+UPSTREAM_CONCURRENCY = {
+    "mojang": 8,
+    "namemc": 2,
+    "tmpfiles": 2,
+    "starlight": 8,
+}
+UPSTREAM_MAX_RETRIES = 3  # 遇到 429/503 时的最大重试次数
+UPSTREAM_RETRY_BASE_DELAY = 1.0  # 指数退避的基础等待时间（秒）
+UPSTREAM_RETRY_MAX_DELAY = 30.0  # 单次重试的最大等待时间（秒）
+
+# 玩家名格式：3-16 位字母、数字或下划线
+USERNAME_PATTERN = r"^[A-Za-z0-9_]{3,16}$"
+
+# UUID 缓存配置（可在插件配置中覆盖）
+UUID_CACHE_MAX_SIZE = 2048
+UUID_CACHE_TTL = 3600  # 成功结果的缓存时间（秒）
+UUID_NEGATIVE_CACHE_TTL = 300  # "玩家不存在"结果的缓存时间（秒）
+UUID_LOOKUP_CONCURRENCY = 10  # 批量查询 UUID 时的最大并发数
+UUID_BATCH_WINDOW_MS = 5  # 合并并发玩家名查询的时间窗口（毫秒），0 表示不合并
+MOJANG_BULK_MAX_NAMES = 10  # Mojang 批量接口单次最多查询的玩家名数量
+
+# 玩家档案持久化存储配置
+PROFILE_DB_FILE = "profiles.db"
+PROFILE_STORE_TTL = 86400  # 持久化记录的有效期（秒）
+PROFILE_STORE_MAX_ROWS = 50000  # 玩家名记录上限
+PROFILE_STORE_WARMUP_SIZE = 200  # 启动时预热到内存的热门玩家数量
+PROFILE_STORE_COMPACT_INTERVAL = 3600  # 后台整理间隔（秒）
 
 # NAMEMC
 NAMEMC_RAMDOM = "https://namemc.com/minecraft-skins/random"
 NAMEMC_SKIN = "https://namemc.com/skin/{skinid}"
+NAMEMC_TIMEOUT = 20  # NameMC 请求超时时间（秒）
+NAMEMC_MAX_SCAN_BYTES = 2 * 1024 * 1024  # 流式扫描 NameMC 页面时最多读取的字节数
+NAMEMC_RANDOM_HARVEST = 8  # 每次从随机页面收集的皮肤 ID 数量
+RANDOM_SKIN_BUFFER_SIZE = 5  # 后台预取的随机皮肤数量
+RANDOM_SKIN_RETRY_MAX_DELAY = 60  # 预取失败后的最大重试间隔（秒）
 
 # 有效的渲染类型（使用 set 以提高查找效率）
 VALID_RENDERTYPES = {
@@ -51,13 +127,117 @@ DEFAULT_RENDERCROP = "full"
 SKIN_RENDERCROP = "default"  # skin 类型使用的 rendercrop
 DEFAULT_WALLPAPER = "herobrine_hill"  # 默认壁纸
 
+# 渲染图片本地缓存配置
+RENDER_CACHE_DIR = "render_cache"
+RENDER_CACHE_MAX_MB = 200  # 缓存总大小上限（MB）
+RENDER_CACHE_TTL = 3600  # 缓存图片的有效期（秒）
+TEXTURE_CACHE_TTL = 7 * 86400  # 已知皮肤材质信息在内存中的保留时间（秒）
+TEXTURE_REVALIDATE_INTERVAL = 300  # 命中缓存后，超过该时间（秒）在后台重新校验玩家皮肤
+
+# 发送前的图片缩放与重新编码配置（/skin、/wallpaper）
+DEFAULT_IMAGE_OUTPUT_FORMAT = "original"  # original / auto / png / webp / jpeg
+DEFAULT_IMAGE_MAX_DIMENSION = 0  # 图片最长边上限（像素），0 表示不缩放
+IMAGE_OUTPUT_FORMATS = {"png": "PNG", "webp": "WEBP", "jpeg": "JPEG"}  # 可选的输出格式 -> Pillow 格式名
+# auto 模式下各消息平台（适配器名称）使用的格式，未列出的平台使用 DEFAULT_PLATFORM_IMAGE_FORMAT
+PLATFORM_IMAGE_FORMATS = {
+    "aiocqhttp": "webp",
+    "qq_official": "jpeg",
+    "telegram": "jpeg",
+    "discord": "webp",
+    "wecom": "jpeg",
+}
+DEFAULT_PLATFORM_IMAGE_FORMAT = "png"
+IMAGE_WEBP_QUALITY = 85
+IMAGE_JPEG_QUALITY = 85
+IMAGE_JPEG_BACKGROUND = (255, 255, 255)  # JPEG 不支持透明，透明区域填充的颜色
+IMAGE_TRANSCODE_WORKERS = 2  # 图片处理线程数
+IMAGE_VARIANT_CACHE_SIZE = 128  # 内存中缓存的处理结果数量
+IMAGE_VARIANT_CACHE_TTL = 3600  # 处理结果的缓存时间（秒）
+
+# 全局渲染任务调度配置
+SCHEDULER_MAX_JOBS = 6  # 同时处理的渲染任务数
+SCHEDULER_MAX_QUEUE = 50  # 最多排队的任务数，超过后直接拒绝
+SCHEDULER_NOTIFY_AFTER = 3.0  # 排队超过该时间（秒）时告知用户排队位置，0 表示不提示
+SCHEDULER_AGING_SECONDS = 15  # 任务每等待该时间（秒）优先级提升一级
+SCHEDULER_CHEAP_RENDERTYPES = {"head", "pixel", "skin"}  # 这些渲染类型以最高优先级处理
+# 指令 -> 优先级（0 最高），未列出的指令为 1
+SCHEDULER_COMMAND_PRIORITIES = {
+    "skin": 1,
+    "randomskin": 1,
+    "skin_sheet": 2,
+    "wallpaper": 2,
+    "customskin": 2,
+    "turntable": 2,
+    "skinbatch": 2,
+}
+
+# 运行统计配置（/skinstats）
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # 耗时直方图的分桶（秒）
+METRICS_EXPORT_INTERVAL = 30  # 写入 Prometheus 指标文件的间隔（秒）
+
+# 指令追踪与慢指令日志配置
+TRACE_SLOW_THRESHOLD = 10.0  # 指令耗时超过该值（秒）时写入慢日志
+TRACE_SAMPLE_RATE = 0.01  # 未超过阈值的指令按该比例抽样写入
+TRACE_SLOW_LOG_FILE = "slow_commands.jsonl"
+TRACE_SLOW_LOG_MAX_BYTES = 10 * 1024 * 1024  # 超过后轮转为 .1 文件
+
+# 本地渲染配置
+DEFAULT_RENDER_BACKEND = "auto"  # starlight / local / auto
+LOCAL_RENDERTYPES = {"head", "pixel", "skin", "default", "isometric"}  # 本地渲染器支持的渲染类型
+LOCAL_RENDER_SCALES = {"head": 32, "pixel": 16, "skin": 8}  # 各类型的放大倍数
+LOCAL_SKIN_CACHE_SIZE = 512  # 内存中缓存的已解码皮肤数量
+LOCAL_3D_MAX_SIZE = 512  # 本地 3D 渲染图的最长边（像素）
+
+# 多渲染拼图配置（/skin walking,crouching,head <玩家名称>）
+SHEET_MAX_RENDERS = 6  # 一次最多拼接的渲染类型数量
+SHEET_COLUMNS = 3  # 每行最多的格子数
+SHEET_CELL_SIZE = (300, 480)  # 每个格子的图片区域（宽, 高）
+SHEET_PADDING = 16
+SHEET_LABEL_SIZE = 20  # 标签字号
+SHEET_BACKGROUND = (245, 245, 245, 255)
+SHEET_LABEL_COLOR = (60, 60, 60, 255)
+
+# 批量渲染配置（/skinbatch）
+BATCH_MAX_PLAYERS = 500  # 单次任务最多处理的玩家数量
+BATCH_CONCURRENCY = 4  # 同时处理的玩家数量
+BATCH_MAX_FILE_BYTES = 256 * 1024  # 玩家列表文本文件的大小上限
+BATCH_PROGRESS_INTERVAL = 15  # 进度消息的最小间隔（秒）
+BATCH_OUTPUT_DIR = "batch"
+BATCH_FILE_KEEP_SECONDS = 600  # 压缩包发送后保留的时间（秒）
+BATCH_IMAGE_FORMATS = {"png": "PNG", "webp": "WEBP"}  # 可选的输出格式 -> Pillow 格式名
+DEFAULT_BATCH_IMAGE_FORMAT = "png"
+
 # 自定义渲染配置
 CUSTOM_RENDER_API_ENDPOINT = "https://starlightskins.lunareclipse.studio/render/custom/{uuid}/full"
 DEFAULT_CAMERA_POSITION = {"x":"-4.94","y":"32.09","z":"-21.6"}
 DEFAULT_CAMERA_FOCAL_POINT = {"x":"3.67","y":"16.31","z":"3.35"}
 ALLOWED_MODEL_EXTENSIONS = {".obj"}
+# 模型文件校验与压缩
+MODEL_MAX_BYTES = 10 * 1024 * 1024  # 接收的模型文件大小上限
+MODEL_MAX_VERTICES = 200_000  # v / vt / vn 各自的数量上限
+MODEL_MAX_FACES = 400_000
+MODEL_FLOAT_PRECISION = 4  # 压缩时坐标保留的小数位数
+MODEL_SNIFF_LINES = 50  # 文件开头这么多行内没有任何 OBJ 语句时直接拒绝
+# 未指定相机与焦点时根据模型包围盒自动取景
+AUTO_FRAME_DISTANCE_FACTOR = 1.8  # 相机距离 / 模型包围半径；默认预设对标准玩家模型约为 1.6，这里留出一些边距
+AUTO_FRAME_MIN_RADIUS = 1.0
 # 等待用户发送文件的超时时间（秒）
 FILE_WAIT_TIMEOUT = 15
+# 已上传模型的内容哈希 -> tmpfiles.org URL 缓存；tmpfiles.org 保留文件 60 分钟，提前失效留出渲染时间
+MODEL_UPLOAD_CACHE_SIZE = 256
+MODEL_UPLOAD_CACHE_TTL = 55 * 60
+
+# 360° 转盘动图配置（/customskin <玩家名称> turntable、/turntable）
+TURNTABLE_KEYWORD = "turntable"  # 在 /customskin 的相机参数位置使用该关键字开启转盘模式
+TURNTABLE_FRAMES = 12  # 默认帧数
+TURNTABLE_MIN_FRAMES = 2  # 动图至少需要两帧
+TURNTABLE_MAX_FRAMES = 36
+TURNTABLE_FRAME_DURATION = 120  # 每帧时长（毫秒）
+TURNTABLE_CONCURRENCY = 4  # 同时请求的帧数
+TURNTABLE_MIN_RADIUS = 30  # 起始相机与焦点水平重合时使用的轨道半径
+TURNTABLE_WEBP_QUALITY = 80
+DEFAULT_TURNTABLE_FORMAT = "gif"  # gif / webp
+TURNTABLE_MODEL_FILE_CLEANUP_DELAY = 90  # 转盘模式下模型文件的延迟清理时间（秒），需覆盖所有帧的渲染
 
 # 预置的相机位置与焦点位置，用户可以在 /customskin 命令中按名称引用
 CAMERA_PRESETS = {
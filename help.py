@@ -15,6 +15,9 @@ def get_help_text() -> str:
         "用法2 (推荐): /skin <渲染类型> <玩家名称>\n"
         "  » 示例: /skin walking Notch\n"
         f"  <渲染类型>: 可选。默认为 '{config.DEFAULT_RENDERTYPE}'。\n\n"
+        "用法3: /skin <渲染类型1,渲染类型2,...> <玩家名称>\n"
+        "  » 示例: /skin walking,crouching,head Notch\n"
+        f"  将多种渲染拼接为一张图片，类型之间用英文逗号分隔，最多 {config.SHEET_MAX_RENDERS} 种。\n\n"
         "--- 所有可用的 [rendertype] 列表 ---\n"
     )
     
@@ -53,11 +56,27 @@ def get_help_text() -> str:
         "  功能: 使用你提供的 .obj 模型文件来渲染指定玩家的皮肤。\n"
         "  流程: 发送指令后，按提示在15秒内上传模型文件即可。\n"
         "  参数: [相机预设] 和 [焦点预设] 是可选的，可以使用预设名称或自定义JSON。\n"
-        "  详情: 发送 /customskinhelp 查看所有可用预设。"
+        "  详情: 发送 /customskinhelp 查看所有可用预设。\n"
+        f"  转盘: 相机参数填写 '{config.TURNTABLE_KEYWORD}' 时生成 360° 转盘动图，例如 /customskin Notch {config.TURNTABLE_KEYWORD}。"
+    )
+
+    # /turntable 指令帮助
+    turntable_help = (
+        "\n\n【指令6】/turntable <玩家名称> [焦点预设]\n"
+        "  » 示例: /turntable Notch\n"
+        "  功能: 使用标准玩家模型生成 360° 转盘动图。"
+    )
+
+    # /skinbatch 指令帮助
+    skinbatch_help = (
+        "\n\n【指令5】/skinbatch [渲染类型] <玩家1> <玩家2> ... (仅管理员)\n"
+        "  » 示例: /skinbatch head Notch jeb_ Dream\n"
+        "  功能: 批量生成一组玩家的渲染图，并打包为 zip 文件发送。\n"
+        "  流程: 不在指令中提供玩家时，可以按提示发送玩家列表或 .txt 文件（每行一个玩家）。"
     )
     
     # 返回合并后的帮助信息
-    return help_text + types_str + randomskin_help + wallpaper_help + wallpapers_str + customskin_help
+    return help_text + types_str + randomskin_help + wallpaper_help + wallpapers_str + customskin_help + skinbatch_help + turntable_help
 
 def get_customskin_help_text() -> str:
     """
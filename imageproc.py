@@ -0,0 +1,111 @@
+import asyncio
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import astrbot.api.message_components as Comp
+from PIL import Image
+from astrbot.api import logger
+
+from . import config
+from .cache import TTLCache
+from .singleflight import SingleFlight
+
+# 由 configure 设置
+_output_format = config.DEFAULT_IMAGE_OUTPUT_FORMAT
+_max_dimension = config.DEFAULT_IMAGE_MAX_DIMENSION
+
+# 图片处理是 CPU 密集型操作，使用独立的线程池，避免占满 asyncio.to_thread 的默认线程池
+_executor: ThreadPoolExecutor | None = None
+
+# (原图内容哈希, 格式, 尺寸上限) -> 处理后的图片数据
+_variants = TTLCache(config.IMAGE_VARIANT_CACHE_SIZE, config.IMAGE_VARIANT_CACHE_TTL)
+_flight = SingleFlight()
+
+
+def configure(plugin_config: dict) -> None:
+    """根据插件配置设置输出格式与尺寸上限"""
+    global _output_format, _max_dimension
+    _output_format = plugin_config.get("image_output_format", config.DEFAULT_IMAGE_OUTPUT_FORMAT)
+    _max_dimension = plugin_config.get("image_max_dimension", config.DEFAULT_IMAGE_MAX_DIMENSION)
+    _variants.clear()
+
+
+def output_format(platform: str | None) -> str | None:
+    """
+    返回向该消息平台发送渲染图时使用的格式，不需要处理（保持原图）时返回 None。
+
+    auto 模式按 PLATFORM_IMAGE_FORMATS 选择；original 模式只在设置了尺寸上限时缩放并以 PNG 输出。
+    """
+    image_format = _output_format
+    if image_format == "auto":
+        image_format = config.PLATFORM_IMAGE_FORMATS.get(platform or "", config.DEFAULT_PLATFORM_IMAGE_FORMAT)
+    if image_format not in config.IMAGE_OUTPUT_FORMATS:
+        return "png" if _max_dimension > 0 else None
+    return image_format
+
+
+def transcode(data: bytes, image_format: str, max_dimension: int = 0) -> bytes:
+    """
+    将图片缩放到最长边不超过 max_dimension（0 表示不缩放）并以 image_format 重新编码。
+    没有缩放且重新编码后反而更大时返回原图。
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        image = img.convert("RGBA")
+    resized = max_dimension > 0 and max(image.size) > max_dimension
+    if resized:
+        image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+
+    buf = io.BytesIO()
+    if image_format == "jpeg":
+        background = Image.new("RGB", image.size, config.IMAGE_JPEG_BACKGROUND)
+        background.paste(image, mask=image.getchannel("A"))
+        background.save(buf, format="JPEG", quality=config.IMAGE_JPEG_QUALITY, optimize=True, progressive=True)
+    elif image_format == "webp":
+        image.save(buf, format="WEBP", quality=config.IMAGE_WEBP_QUALITY)
+    else:
+        image.save(buf, format="PNG", optimize=True)
+    result = buf.getvalue()
+    if not resized and len(result) >= len(data):
+        return data
+    return result
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=config.IMAGE_TRANSCODE_WORKERS, thread_name_prefix="mcskin-image")
+    return _executor
+
+
+async def _transcode(data: bytes, image_format: str, max_dimension: int) -> bytes:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), transcode, data, image_format, max_dimension)
+
+
+async def build_component(data: bytes, image_format: str) -> Comp.Image:
+    """
+    对渲染图进行缩放与重新编码，返回图片消息组件。
+
+    处理结果按原图内容缓存，同一张图片的并发处理只进行一次；处理失败时发送原图。
+    """
+    key = (hashlib.sha256(data).hexdigest(), image_format, _max_dimension)
+    variant = _variants.get(key)
+    if variant is None:
+        try:
+            variant = await _flight.do(key, lambda: _transcode(data, image_format, _max_dimension))
+        except Exception as e:
+            logger.error(f"处理图片失败，将发送原图: {e!r}")
+            return Comp.Image.fromBytes(data)
+        _variants.set(key, variant)
+        if variant is not data:
+            logger.debug(f"图片已转换为 {image_format}: {len(data)} -> {len(variant)} 字节")
+    return Comp.Image.fromBytes(variant)
+
+
+def shutdown() -> None:
+    """插件停止时关闭图片处理线程池"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -1,6 +1,5 @@
-import aiohttp
 import json
-import asyncio, os
+import asyncio, os, time
 import astrbot.api.message_components as Comp
 from astrbot.api.message_components import File
 from astrbot.api.event import filter, AstrMessageEvent
@@ -8,7 +7,12 @@ from astrbot.api.star import Context, Star, register
 from astrbot.api import logger, AstrBotConfig
 from astrbot.core.utils.session_waiter import session_waiter, SessionController
 
-from . import actions, config, utils, help, transfer
+from . import actions, config, utils, help, transfer, ratelimit, transport, breaker, renderer, batch, objmodel, metrics, tracing, imageproc, scheduler, turntable
+from .store import ProfileStore
+# __init__ 的 config 参数（插件配置）会遮蔽 config 模块，在那里需要的常量单独导入
+from .config import RANDOM_SKIN_BUFFER_SIZE
+from .render_cache import RenderCache
+from .namemc import NameMCClient, RandomSkinBuffer
 
 # 注册插件
 @register(
@@ -21,9 +25,88 @@ from . import actions, config, utils, help, transfer
 class MCSkinPlugin(Star):
     def __init__(self, context: Context, config: AstrBotConfig):
         super().__init__(context)
-        # 在插件初始化时创建一个可复用的 aiohttp.ClientSession
+        # 在插件初始化时创建一个可复用的 aiohttp.ClientSession（连接池与超时见 transport）
         self.config = config
-        self.session = aiohttp.ClientSession()
+        self.session = transport.create_session(self.config)
+        # 按插件配置初始化上游限流、UUID 缓存与批量查询
+        ratelimit.configure(self.config)
+        breaker.configure(self.config)
+        renderer.configure(self.config)
+        imageproc.configure(self.config)
+        scheduler.configure(self.config)
+        utils.configure_uuid_lookup(self.config)
+        self.profile_store = None
+        self.render_cache = None
+        self.namemc = NameMCClient()
+        self.random_skins = RandomSkinBuffer(
+            self.namemc,
+            self.session,
+            self.config.get("randomskin_buffer_size", RANDOM_SKIN_BUFFER_SIZE),
+        )
+        self._background_tasks: list[asyncio.Task] = []
+        # 同一时间只运行一个批量渲染任务
+        self._batch_lock = asyncio.Lock()
+
+    async def initialize(self):
+        """插件初始化：打开持久化存储、预热缓存并启动后台任务"""
+        if self.config.get("render_cache_enabled", False):
+            self.render_cache = RenderCache(
+                os.path.join(utils.get_data_dir(), config.RENDER_CACHE_DIR),
+                max_bytes=self.config.get("render_cache_max_mb", config.RENDER_CACHE_MAX_MB) * 1024 * 1024,
+                max_age=self.config.get("render_cache_ttl", config.RENDER_CACHE_TTL),
+            )
+
+        if self.config.get("persistent_cache", True):
+            self.profile_store = ProfileStore(
+                os.path.join(utils.get_data_dir(), config.PROFILE_DB_FILE),
+                ttl=self.config.get("profile_store_ttl", config.PROFILE_STORE_TTL),
+                max_rows=config.PROFILE_STORE_MAX_ROWS,
+            )
+            utils.set_profile_store(self.profile_store)
+            try:
+                warmed = await utils.warm_up_uuid_cache(
+                    self.config.get("profile_store_warmup_size", config.PROFILE_STORE_WARMUP_SIZE)
+                )
+                logger.info(f"已从持久化存储预热 {warmed} 条 UUID 记录")
+            except Exception as e:
+                logger.error(f"预热 UUID 缓存失败: {e}", exc_info=True)
+            self._background_tasks.append(asyncio.create_task(
+                self.profile_store.run_maintenance(config.PROFILE_STORE_COMPACT_INTERVAL)
+            ))
+
+        # 启动随机皮肤预取
+        self.random_skins.start()
+
+        # 慢指令日志写入插件数据目录
+        tracing.configure(self.config, os.path.join(utils.get_data_dir(), config.TRACE_SLOW_LOG_FILE))
+
+        # 定期写出 Prometheus 格式的指标文件
+        metrics_file = self.config.get("metrics_prometheus_file", "")
+        if metrics_file:
+            if not os.path.isabs(metrics_file):
+                metrics_file = os.path.join(utils.get_data_dir(), metrics_file)
+            self._background_tasks.append(asyncio.create_task(
+                metrics.run_exporter(metrics_file, config.METRICS_EXPORT_INTERVAL)
+            ))
+
+        # 启动 Starlight 健康检查
+        probe_interval = self.config.get("starlight_probe_interval", config.STARLIGHT_PROBE_INTERVAL)
+        if probe_interval > 0:
+            self._background_tasks.append(asyncio.create_task(breaker.run_probe(self.session, probe_interval)))
+
+    def _schedule(self, event: AstrMessageEvent, command: str, rendertype: str | None = None):
+        """
+        返回指令渲染工作的调度上下文（见 scheduler）。
+        同一个群（私聊时为同一用户）的请求属于同一租户，排队较久时告知用户当前位置。
+        """
+        group_id = event.get_group_id()
+        tenant = f"group:{group_id}" if group_id else f"user:{event.get_sender_id()}"
+
+        async def notify(position: int) -> None:
+            logger.info(f"{tracing.log_prefix()}{tenant} 的 /{command} 请求排在第 {position} 位")
+            await event.send(event.plain_result(f"⏳ 当前渲染请求较多，你的请求排在第 {position} 位，请稍候..."))
+
+        return scheduler.slot(command, tenant, notify, rendertype)
 
     @filter.command("skin")
     async def get_skin(
@@ -34,19 +117,38 @@ class MCSkinPlugin(Star):
     ):
         """
         获取 Minecraft 玩家皮肤的渲染图。
-        支持两种用法:
+        支持三种用法:
         1. /skin <username>
         2. /skin <rendertype> <username>
+        3. /skin <rendertype1,rendertype2,...> <username>
         """
         # 如果没有提供任何参数，显示错误
         if not param1:
             yield event.plain_result(
                 "错误：请提供玩家名称。\n"
                 "用法1: /skin <玩家名称>\n"
-                "用法2: /skin <渲染类型> <玩家名称>"
+                "用法2: /skin <渲染类型> <玩家名称>\n"
+                "用法3: /skin <渲染类型1,渲染类型2,...> <玩家名称>"
             )
             return
 
+        # 用法3: 用逗号分隔的多个渲染类型，拼接为一张图片
+        if param2 and "," in param1:
+            try:
+                with tracing.trace("skin_sheet", player=param2), metrics.command_timer("skin_sheet"):
+                    async with self._schedule(event, "skin_sheet"):
+                        result = await actions.process_multi_skin_command(
+                            self.session, param2, param1.split(","), self.render_cache,
+                            imageproc.output_format(event.get_platform_name()),
+                        )
+            except scheduler.QueueFullError as e:
+                result = str(e)
+            if isinstance(result, str):
+                yield event.plain_result(result)
+            else:
+                yield event.chain_result(result)
+            return
+
         username: str
         rendertype: str
 
@@ -72,7 +174,15 @@ class MCSkinPlugin(Star):
             rendertype = config.DEFAULT_RENDERTYPE
 
         # 调用核心逻辑
-        result = await actions.process_skin_command(self.session, username, rendertype)
+        try:
+            with tracing.trace("skin", player=username), metrics.command_timer("skin"):
+                async with self._schedule(event, "skin", rendertype):
+                    result = await actions.process_skin_command(
+                        self.session, username, rendertype, self.render_cache,
+                        imageproc.output_format(event.get_platform_name()),
+                    )
+        except scheduler.QueueFullError as e:
+            result = str(e)
 
         # 根据结果类型发送消息
         if isinstance(result, str):
@@ -118,7 +228,15 @@ class MCSkinPlugin(Star):
             usernames = [p for p in [param1, param2, param3, param4] if p]
 
         # 调用核心逻辑
-        result = await actions.process_wallpaper_command(self.session, wallpaper_id, usernames)
+        try:
+            with tracing.trace("wallpaper"), metrics.command_timer("wallpaper"):
+                async with self._schedule(event, "wallpaper"):
+                    result = await actions.process_wallpaper_command(
+                        self.session, wallpaper_id, usernames, self.render_cache,
+                        imageproc.output_format(event.get_platform_name()),
+                    )
+        except scheduler.QueueFullError as e:
+            result = str(e)
 
         # 根据结果类型发送消息
         if isinstance(result, str):
@@ -153,21 +271,28 @@ class MCSkinPlugin(Star):
             yield event.plain_result("错误：请提供玩家名称。\n用法: /customskin <玩家名称> [相机预设] [焦点预设]")
             return
 
+        # 整个会话跨越多个任务（session_waiter 的回调在收到文件时执行），各阶段显式挂到同一个追踪下
+        trace_root = tracing.start("customskin", player=username)
+
         # 1. 获取玩家 UUID
-        uuid, error_msg = await utils.get_player_uuid(self.session, username)
+        with tracing.activate(trace_root):
+            uuid, error_msg = await utils.get_player_uuid(self.session, username)
         if error_msg:
+            tracing.finish(trace_root)
             yield event.plain_result(error_msg)
             return
 
         # 2. 发送提示
+        # 相机参数为 turntable 时生成 360° 转盘动图
+        turntable_mode = bool(camera_preset) and camera_preset.lower() == config.TURNTABLE_KEYWORD
         prompt_msg = (
             f"请在 {config.FILE_WAIT_TIMEOUT} 秒内发送一个 .obj 模型文件 "
-            f"来为玩家 {username} 进行渲染。"
+            f"来为玩家 {username} 进行{'转盘动图' if turntable_mode else ''}渲染。"
         )
         await event.send(event.plain_result(prompt_msg))
 
         # 2.1 解析用户可选参数
-        camera_param_raw = camera_preset
+        camera_param_raw = None if turntable_mode else camera_preset
         focal_param_raw = focal_preset
 
         # 将原始字符串解析为 dict 或从预置中取值（延后到会话处理，以便用户仍可发送文件）
@@ -186,96 +311,184 @@ class MCSkinPlugin(Star):
             #    await event.send(event.plain_result("请发送文件，而不是文本消息。"))
                 return
 
-            local_path = await file_component.get_file()
+            tracing.record("file_wait", wait_started, parent=trace_root)
+            started = time.perf_counter()
+            with tracing.span("get_file", parent=trace_root):
+                local_path = await file_component.get_file()
+            compact_path = local_path + ".compact.obj" if local_path else None
 
             try:
-                # 根据配置决定使用本地文件服务还是公共中转服务
-                if self.config.get("use_file_transfer"):
-                    # 使用公共中转服务 (tmpfiles.org)
-                    logger.info("use_file_transfer 已开启，使用 tmpfiles.org 上传...")
-                    stable_url = await transfer.upload_to_tmpfiles(self.session, local_path)
-                else:
-                    # 使用内置文件服务
-                    logger.info("use_file_transfer 已关闭，使用内置文件服务注册...")
-                    stable_url = await file_component.register_to_file_service()
-
-                if not stable_url:
-                    await event.send(event.plain_result("错误：文件上传或注册失败，无法获取有效的 URL。"))
-                    controller.stop()
-                    return
-
-                logger.info(f"文件服务返回的稳定 URL: {stable_url}")
-
-                # 2. 解析并决定最终使用的相机与焦点参数（优先使用用户输入，支持预置名或 JSON）
-                def resolve_position_param(raw_value, presets, default):
-                    if not raw_value:
-                        return default
-                    raw_lower = raw_value.lower()
-                    # 如果用户提供了一个预置名
-                    if raw_lower in presets:
-                        return presets[raw_lower]
-                    # 否则尝试解析 JSON
-                    try:
-                        parsed = json.loads(raw_value)
-                        if isinstance(parsed, dict):
-                            return parsed
-                    except Exception:
-                        pass
-                    # 无法解析则返回默认并告知用户（但不抛错）
-                    return default
-
-                camera_position = resolve_position_param(camera_param_raw, config.CAMERA_PRESETS, config.DEFAULT_CAMERA_POSITION)
-                camera_focal = resolve_position_param(focal_param_raw, config.FOCAL_PRESETS, config.DEFAULT_CAMERA_FOCAL_POINT)
-
-                # 3. 将 URL 和额外参数传递给 action 构建最终的渲染URL
-                result_chain = await actions.upload_and_render_custom_skin(
-                    self.session,
-                    uuid,
-                    stable_url,
-                    username,
-                    camera_position=camera_position,
-                    camera_focal_point=camera_focal,
-                )
-
-                # 3. 发送结果
-                await event.send(event.chain_result(result_chain))
+                with tracing.activate(trace_root):
+                    async with self._schedule(event, "customskin"):
+                        # 1. 在本地校验并压缩模型：无效或过大的模型在上传前直接拒绝
+                        objmodel.check_extension(getattr(file_component, "name", None))
+                        with tracing.span("compact", parent=trace_root) as stage:
+                            stats = await asyncio.to_thread(objmodel.compact_obj, local_path, compact_path)
+                            stage.set(original_bytes=stats["original_bytes"], compact_bytes=stats["compact_bytes"])
+                        logger.info(
+                            f"模型已压缩: {stats['original_bytes']} -> {stats['compact_bytes']} 字节，"
+                            f"{stats['vertices']} 个顶点，{stats['faces']} 个面"
+                        )
+                        model_component = File(name=os.path.basename(compact_path), file=compact_path)
+
+                        # 根据配置决定使用本地文件服务还是公共中转服务
+                        use_file_transfer = self.config.get("use_file_transfer")
+                        with tracing.span("upload", parent=trace_root, tmpfiles=bool(use_file_transfer)):
+                            if use_file_transfer:
+                                # 使用公共中转服务 (tmpfiles.org)
+                                logger.info("use_file_transfer 已开启，使用 tmpfiles.org 上传...")
+                                stable_url = await transfer.upload_to_tmpfiles(self.session, compact_path)
+                            else:
+                                # 使用内置文件服务
+                                logger.info("use_file_transfer 已关闭，使用内置文件服务注册...")
+                                stable_url = await model_component.register_to_file_service()
+
+                        if not stable_url:
+                            await event.send(event.plain_result("错误：文件上传或注册失败，无法获取有效的 URL。"))
+                            controller.stop()
+                            return
+
+                        logger.info(f"文件服务返回的稳定 URL: {stable_url}")
+
+                        # 2. 解析并决定最终使用的相机与焦点参数（优先使用用户输入，支持预置名或 JSON）
+                        def resolve_position_param(raw_value, presets, default):
+                            if not raw_value:
+                                return default
+                            raw_lower = raw_value.lower()
+                            # 如果用户提供了一个预置名
+                            if raw_lower in presets:
+                                return presets[raw_lower]
+                            # 否则尝试解析 JSON
+                            try:
+                                parsed = json.loads(raw_value)
+                                if isinstance(parsed, dict):
+                                    return parsed
+                            except Exception:
+                                pass
+                            # 无法解析则返回默认并告知用户（但不抛错）
+                            return default
+
+                        # 未指定相机或焦点时，默认值取自模型包围盒的自动取景
+                        default_camera, default_focal = config.DEFAULT_CAMERA_POSITION, config.DEFAULT_CAMERA_FOCAL_POINT
+                        if self.config.get("auto_frame_camera", True):
+                            default_camera, default_focal = objmodel.frame_camera(stats)
+                            logger.info(f"模型自动取景: 相机 {default_camera}，焦点 {default_focal}")
+
+                        camera_position = resolve_position_param(camera_param_raw, config.CAMERA_PRESETS, default_camera)
+                        camera_focal = resolve_position_param(focal_param_raw, config.FOCAL_PRESETS, default_focal)
+
+                        # 2.2 转盘模式：并发渲染轨道上的多个相机位置并合成动图
+                        if turntable_mode:
+                            # 先限制帧数，再按帧数注册文件服务链接
+                            frames = turntable.clamp_frames(self.config.get("turntable_frames", config.TURNTABLE_FRAMES))
+                            if use_file_transfer:
+                                model_urls = [stable_url] * frames
+                            else:
+                                # 内置文件服务的链接只能下载一次，每帧单独注册
+                                model_urls = [stable_url]
+                                with tracing.span("register", parent=trace_root, count=frames - 1):
+                                    for _ in range(frames - 1):
+                                        model_urls.append(await model_component.register_to_file_service())
+                            with tracing.span("turntable", parent=trace_root, frames=frames):
+                                result = await actions.process_turntable_command(
+                                    self.session,
+                                    uuid,
+                                    username,
+                                    model_urls,
+                                    camera_position=camera_position,
+                                    camera_focal_point=camera_focal,
+                                    frames=frames,
+                                    image_format=self.config.get("turntable_format", config.DEFAULT_TURNTABLE_FORMAT),
+                                )
+                            with tracing.span("send", parent=trace_root):
+                                if isinstance(result, str):
+                                    await event.send(event.plain_result(result))
+                                else:
+                                    await event.send(event.chain_result(result))
+                            controller.stop()
+                            return
+
+                        # 3. 将 URL 和额外参数传递给 action 构建最终的渲染URL
+                        with tracing.span("build_url", parent=trace_root):
+                            result_chain = await actions.upload_and_render_custom_skin(
+                                self.session,
+                                uuid,
+                                stable_url,
+                                username,
+                                camera_position=camera_position,
+                                camera_focal_point=camera_focal,
+                            )
+
+                        # 3. 发送结果
+                        with tracing.span("send", parent=trace_root):
+                            await event.send(event.chain_result(result_chain))
                 
-                controller.stop() # 成功处理，结束会话
+                        controller.stop() # 成功处理，结束会话
+
+            except scheduler.QueueFullError as e:
+                trace_root.set(error=str(e))
+                await event.send(event.plain_result(str(e)))
+                controller.stop()
+
+            except objmodel.ModelError as e:
+                trace_root.set(error=str(e))
+                await event.send(event.plain_result(str(e)))
+                controller.stop()
 
             except Exception as e:
+                trace_root.set(error=repr(e))
                 logger.error(f"文件服务注册或处理时失败: {e}", exc_info=True)
                 await event.send(event.plain_result("错误：文件处理失败。请检查机器人配置文件中的 `callback_api_base` 是否正确设置。"))
                 controller.stop()
 
             finally:
-                if local_path and os.path.exists(local_path):
-                    # 定义一个后台清理函数
-                    async def delayed_cleanup(path, delay=20):
-                        await asyncio.sleep(delay) # 等待 20 秒，足够api获取图片并下载了
-                        try:
-                            if os.path.exists(path):
-                                os.remove(path)
-                                logger.info(f"延迟清理完成: {path}")
-                            else:
-                                logger.warning(f"文件已不存在，跳过清理：{path}")
-                        except Exception as e:
-                            logger.error(f"延迟清理文件{path}时失败：{e}")
-
-                    logger.info(f"为{local_path}创建了延迟清理任务")
-                    asyncio.create_task(delayed_cleanup(local_path))
+                metrics.registry.observe(
+                    "command_duration_seconds", time.perf_counter() - started, command="customskin"
+                )
 
+                # 定义一个后台清理函数
+                async def delayed_cleanup(path, delay=20):
+                    await asyncio.sleep(delay) # 等待 20 秒，足够api获取图片并下载了
+                    try:
+                        if os.path.exists(path):
+                            os.remove(path)
+                            logger.info(f"延迟清理完成: {path}")
+                        else:
+                            logger.warning(f"文件已不存在，跳过清理：{path}")
+                    except Exception as e:
+                        logger.error(f"延迟清理文件{path}时失败：{e}")
+
+                # 清理原始文件与压缩后的模型
+                cleanup_delay = config.TURNTABLE_MODEL_FILE_CLEANUP_DELAY if turntable_mode else 20
+                for path in (local_path, compact_path):
+                    if path and os.path.exists(path):
+                        logger.info(f"为{path}创建了延迟清理任务")
+                        asyncio.create_task(delayed_cleanup(path, cleanup_delay))
+
+        wait_started = time.perf_counter()
         try:
             await custom_skin_waiter(event)
         except TimeoutError:
+            trace_root.set(error="timeout")
             yield event.plain_result("操作超时，已取消渲染。")
         except Exception as e:
+            trace_root.set(error=repr(e))
             logger.error(f"customskin 会话期间发生未知错误: {e}", exc_info=True)
             yield event.plain_result(f"处理过程中发生内部错误: {e}")
         finally:
+            tracing.finish(trace_root)
             event.stop_event()
 
     async def terminate(self):
-        """插件卸载/停止时，异步关闭 session"""
+        """插件卸载/停止时，停止后台任务并异步关闭 session 与持久化存储"""
+        for task in self._background_tasks:
+            task.cancel()
+        await self.random_skins.stop()
+        await self.namemc.close()
+        if self.profile_store is not None:
+            utils.set_profile_store(None)
+            await self.profile_store.close()
+        imageproc.shutdown()
         await self.session.close()
         logger.info("MCSkinPlugin: aiohttp session 已成功关闭")
 
@@ -285,9 +498,181 @@ class MCSkinPlugin(Star):
         /randomskin
         从 NameMC 获取一个随机皮肤，提取玩家名称并渲染默认皮肤预览。
         """
-        result = await actions.process_randomskin_command(self.session)
+        try:
+            with tracing.trace("randomskin"), metrics.command_timer("randomskin"):
+                async with self._schedule(event, "randomskin"):
+                    result = await actions.process_randomskin_command(
+                        self.session, self.random_skins, self.render_cache,
+                        imageproc.output_format(event.get_platform_name()),
+                    )
+        except scheduler.QueueFullError as e:
+            result = str(e)
 
         if isinstance(result, str):
             yield event.plain_result(result)
         else:
-            yield event.chain_result(result)
\ No newline at end of file
+            yield event.chain_result(result)
+
+    @filter.command("turntable")
+    async def turntable_render(self, event: AstrMessageEvent, username: str = None, focal_preset: str = None):
+        """
+        /turntable <玩家名称> [焦点预设]
+        使用标准玩家模型生成 360° 转盘动图。
+        """
+        if not username:
+            yield event.plain_result("错误：请提供玩家名称。\n用法: /turntable <玩家名称> [焦点预设]")
+            return
+
+        uuid, error_msg = await utils.get_player_uuid(self.session, username)
+        if error_msg:
+            yield event.plain_result(error_msg)
+            return
+
+        camera_focal = config.DEFAULT_CAMERA_FOCAL_POINT
+        if focal_preset:
+            camera_focal = config.FOCAL_PRESETS.get(focal_preset.lower(), camera_focal)
+
+        try:
+            with tracing.trace("turntable", player=username), metrics.command_timer("turntable"):
+                async with self._schedule(event, "turntable"):
+                    result = await actions.process_turntable_command(
+                        self.session,
+                        uuid,
+                        username,
+                        camera_focal_point=camera_focal,
+                        frames=self.config.get("turntable_frames", config.TURNTABLE_FRAMES),
+                        image_format=self.config.get("turntable_format", config.DEFAULT_TURNTABLE_FORMAT),
+                    )
+        except scheduler.QueueFullError as e:
+            result = str(e)
+        if isinstance(result, str):
+            yield event.plain_result(result)
+        else:
+            yield event.chain_result(result)
+
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("skinbatch")
+    async def skin_batch(self, event: AstrMessageEvent):
+        """
+        /skinbatch [渲染类型] <玩家1> <玩家2> ...
+        批量生成一组玩家的渲染图并打包为 zip。未在指令中提供玩家时，可以随后发送玩家列表或 .txt 文件。
+        """
+        # 配置的图片格式无效时，所有玩家都会失败，在开始前直接报错
+        image_format = str(self.config.get("batch_image_format", config.DEFAULT_BATCH_IMAGE_FORMAT)).lower()
+        is_valid_format, error_msg = batch.validate_image_format(image_format)
+        if not is_valid_format:
+            yield event.plain_result(error_msg)
+            return
+
+        # 1. 解析渲染类型与玩家列表（玩家数量不定，直接解析整条消息）
+        tokens = event.message_str.split()[1:]
+        rendertype = config.DEFAULT_RENDERTYPE
+        if tokens:
+            is_valid_type, _ = utils.validate_rendertype(tokens[0].lower())
+            if is_valid_type:
+                rendertype = tokens.pop(0).lower()
+        usernames = batch.parse_roster(" ".join(tokens))
+
+        # 2. 没有提供玩家时，等待用户发送玩家列表或 .txt 文件
+        if not usernames:
+            await event.send(event.plain_result(
+                f"请在 {config.FILE_WAIT_TIMEOUT} 秒内发送玩家列表（用空格、逗号或换行分隔）或一个 .txt 文件。"
+            ))
+
+            @session_waiter(timeout=config.FILE_WAIT_TIMEOUT, record_history_chains=False)
+            async def roster_waiter(controller: SessionController, event: AstrMessageEvent):
+                for component in event.get_messages():
+                    if isinstance(component, File):
+                        local_path = await component.get_file()
+                        if os.path.getsize(local_path) > config.BATCH_MAX_FILE_BYTES:
+                            await event.send(event.plain_result(
+                                f"错误：玩家列表文件不能超过 {config.BATCH_MAX_FILE_BYTES // 1024} KB。"
+                            ))
+                            controller.stop()
+                            return
+                        with open(local_path, "r", encoding="utf-8-sig", errors="ignore") as f:
+                            usernames.extend(batch.parse_roster(f.read()))
+                        controller.stop()
+                        return
+                if event.message_str.strip():
+                    usernames.extend(batch.parse_roster(event.message_str))
+                    controller.stop()
+
+            try:
+                await roster_waiter(event)
+            except TimeoutError:
+                yield event.plain_result("操作超时，已取消批量渲染。")
+                return
+
+            if not usernames:
+                yield event.plain_result("错误：没有解析到任何玩家名称。")
+                return
+
+        # 3. 检查数量上限与正在运行的任务
+        max_players = self.config.get("batch_max_players", config.BATCH_MAX_PLAYERS)
+        warning_msg = ""
+        if len(usernames) > max_players:
+            warning_msg = f"⚠️ 注意：单次最多处理 {max_players} 个玩家，已自动截取前 {max_players} 个。\n"
+            usernames = usernames[:max_players]
+        if self._batch_lock.locked():
+            yield event.plain_result("错误：已有批量渲染任务正在进行，请等待其完成后再试。")
+            return
+
+        async with self._batch_lock:
+            await event.send(event.plain_result(
+                f"{warning_msg}开始为 {len(usernames)} 个玩家生成 '{rendertype}' 渲染，完成后将发送压缩包。"
+            ))
+
+            async def report_progress(done: int, total: int, failed: int) -> None:
+                await event.send(event.plain_result(f"批量渲染进度：{done}/{total}（失败 {failed} 个）"))
+
+            # 4. 运行批量任务
+            zip_path = batch.output_path(rendertype)
+            try:
+                # 整个批量任务只占用一个调度名额，内部请求受各上游并发上限约束
+                with metrics.command_timer("skinbatch"):
+                    async with self._schedule(event, "skinbatch"):
+                        failed = await batch.run_roster_job(
+                            self.session,
+                            usernames,
+                            rendertype,
+                            zip_path,
+                            render_cache=self.render_cache,
+                            progress=report_progress,
+                            concurrency=self.config.get("batch_concurrency", config.BATCH_CONCURRENCY),
+                            image_format=image_format,
+                        )
+            except scheduler.QueueFullError as e:
+                yield event.plain_result(str(e))
+                return
+            except Exception as e:
+                logger.error(f"批量渲染任务失败: {e}", exc_info=True)
+                yield event.plain_result(f"批量渲染过程中发生内部错误: {e}")
+                if os.path.exists(zip_path):
+                    os.remove(zip_path)
+                return
+
+        # 5. 发送结果并在稍后清理压缩包
+        summary = f"批量渲染完成：成功 {len(usernames) - len(failed)} 个，失败 {len(failed)} 个。"
+        if failed:
+            summary += "\n失败的玩家已列在压缩包内的 failed.txt 中。"
+        yield event.plain_result(summary)
+        if len(failed) < len(usernames):
+            yield event.chain_result([File(name=os.path.basename(zip_path), file=zip_path)])
+        asyncio.create_task(batch.remove_later(zip_path))
+
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("skinstats")
+    async def skin_stats(self, event: AstrMessageEvent):
+        """
+        /skinstats
+        查看插件的运行统计：各指令耗时、各上游服务的请求数、状态码、超时与流量。
+        """
+        circuit = breaker.starlight
+        text = metrics.format_summary()
+        text += f"\n\n【Starlight 熔断器】\n  状态: {circuit.state}，连续失败 {circuit.failures} 次"
+        if circuit.last_latency is not None:
+            text += f"，最近一次响应 {circuit.last_latency:.2f}s"
+        jobs = scheduler.scheduler
+        text += f"\n\n【渲染队列】\n  运行中 {jobs.running}/{jobs.max_jobs}，排队 {jobs.waiting}"
+        yield event.plain_result(text)
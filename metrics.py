@@ -0,0 +1,275 @@
+import asyncio
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import aiohttp
+from astrbot.api import logger
+
+from . import config
+
+_PREFIX = "mcskin_"
+
+
+class Histogram:
+    """固定分桶的直方图，每次记录只需一次二分查找"""
+
+    def __init__(self, buckets: tuple[float, ...] = config.METRICS_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        # 最后一个桶对应 +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """按桶内线性插值估算分位数，落在 +Inf 桶时返回最大的有限边界"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class Registry:
+    """进程内的计数器与直方图，指标以 (名称, 标签) 为键"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.counters: dict[tuple[str, tuple], float] = {}
+        self.histograms: dict[tuple[str, tuple], Histogram] = {}
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple[str, tuple]:
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = self._key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = self._key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """记录代码块耗时（秒）到直方图"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render_prometheus(self) -> str:
+        """以 Prometheus 文本格式输出所有指标"""
+        lines = []
+
+        def fmt_labels(labels: tuple, extra: str = "") -> str:
+            parts = [f'{k}="{v}"' for k, v in labels]
+            if extra:
+                parts.append(extra)
+            return "{" + ",".join(parts) + "}" if parts else ""
+
+        for name in sorted({name for name, _ in self.counters}):
+            lines.append(f"# TYPE {_PREFIX}{name} counter")
+            for (metric, labels), value in sorted(self.counters.items()):
+                if metric == name:
+                    lines.append(f"{_PREFIX}{name}{fmt_labels(labels)} {value:g}")
+        for name in sorted({name for name, _ in self.histograms}):
+            lines.append(f"# TYPE {_PREFIX}{name} histogram")
+            for (metric, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, n in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    bucket_label = f'le="{le}"'
+                    lines.append(f"{_PREFIX}{name}_bucket{fmt_labels(labels, bucket_label)} {cumulative}")
+                lines.append(f"{_PREFIX}{name}_sum{fmt_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{_PREFIX}{name}_count{fmt_labels(labels)} {histogram.count}")
+        lines.append(f"# TYPE {_PREFIX}uptime_seconds gauge")
+        lines.append(f"{_PREFIX}uptime_seconds {time.time() - self.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def command_timer(command: str):
+    """记录一次指令的处理耗时"""
+    return registry.timer("command_duration_seconds", command=command)
+
+
+def _count_error(host: str, error: BaseException | None) -> None:
+    if isinstance(error, asyncio.TimeoutError):
+        registry.inc("upstream_timeouts_total", host=host)
+    else:
+        registry.inc("upstream_errors_total", host=host)
+
+
+def record_error(url: str, error: BaseException) -> None:
+    """记录一次在收到响应头之后（读取响应体时）发生的超时或传输错误，aiohttp 的请求追踪不会记录这类错误"""
+    _count_error(urlsplit(url).hostname or "unknown", error)
+
+
+def record_upstream(
+    url: str,
+    status: int | None,
+    seconds: float | None = None,
+    nbytes: int = 0,
+    error: BaseException | None = None,
+) -> None:
+    """
+    记录一次非 aiohttp 的上游请求（如 NameMC 使用的 curl_cffi）。
+    status 为 None 表示请求出错、没有收到响应；error 为请求或读取响应体时发生的异常。
+    """
+    host = urlsplit(url).hostname or "unknown"
+    if status is None:
+        _count_error(host, error)
+        return
+    registry.inc("upstream_requests_total", host=host, status=str(status))
+    if seconds is not None:
+        registry.observe("upstream_request_duration_seconds", seconds, host=host)
+    if nbytes:
+        registry.inc("upstream_response_bytes_total", nbytes, host=host)
+    if error is not None:
+        _count_error(host, error)
+
+
+# aiohttp 请求追踪：记录每个上游主机的请求数、状态码、耗时、超时与收发字节数
+
+async def _on_request_start(session, ctx, params: aiohttp.TraceRequestStartParams) -> None:
+    ctx.start = time.monotonic()
+    ctx.host = params.url.host or "unknown"
+
+
+async def _on_request_end(session, ctx, params: aiohttp.TraceRequestEndParams) -> None:
+    # 收到响应头时触发，耗时不包含读取响应体
+    registry.inc("upstream_requests_total", host=ctx.host, status=str(params.response.status))
+    registry.observe("upstream_request_duration_seconds", time.monotonic() - ctx.start, host=ctx.host)
+
+
+async def _on_request_exception(session, ctx, params: aiohttp.TraceRequestExceptionParams) -> None:
+    _count_error(ctx.host, params.exception)
+
+
+async def _on_response_chunk_received(session, ctx, params: aiohttp.TraceResponseChunkReceivedParams) -> None:
+    registry.inc("upstream_response_bytes_total", len(params.chunk), host=ctx.host)
+
+
+async def _on_request_chunk_sent(session, ctx, params: aiohttp.TraceRequestChunkSentParams) -> None:
+    registry.inc("upstream_request_bytes_total", len(params.chunk), host=ctx.host)
+
+
+def trace_config() -> aiohttp.TraceConfig:
+    """返回挂载到共享 session 上的请求追踪配置"""
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(_on_request_start)
+    trace.on_request_end.append(_on_request_end)
+    trace.on_request_exception.append(_on_request_exception)
+    trace.on_response_chunk_received.append(_on_response_chunk_received)
+    trace.on_request_chunk_sent.append(_on_request_chunk_sent)
+    return trace
+
+
+def _format_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f"{days}天{hours}小时"
+    if hours:
+        return f"{hours}小时{minutes}分"
+    return f"{minutes}分{seconds}秒"
+
+
+def format_summary() -> str:
+    """生成 /skinstats 的统计文本"""
+    lines = ["--- 皮肤渲染插件运行统计 ---", f"运行时间: {_format_duration(time.time() - registry.started)}"]
+
+    commands = sorted(
+        ((dict(labels)["command"], h) for (name, labels), h in registry.histograms.items()
+         if name == "command_duration_seconds"),
+        key=lambda item: item[0],
+    )
+    lines.append("\n【指令】")
+    if not commands:
+        lines.append("  暂无数据")
+    for command, h in commands:
+        lines.append(
+            f"  /{command}: {h.count} 次，平均 {h.sum / h.count:.2f}s，"
+            f"p50 {h.quantile(0.5):.2f}s，p95 {h.quantile(0.95):.2f}s"
+        )
+
+    hosts: dict[str, dict] = {}
+    for (name, labels), value in registry.counters.items():
+        label_map = dict(labels)
+        if "host" not in label_map:
+            continue
+        stats = hosts.setdefault(label_map["host"], {"statuses": {}})
+        if name == "upstream_requests_total":
+            status_class = f"{label_map['status'][0]}xx"
+            stats["statuses"][status_class] = stats["statuses"].get(status_class, 0) + value
+        else:
+            stats[name] = stats.get(name, 0) + value
+    lines.append("\n【上游服务】")
+    if not hosts:
+        lines.append("  暂无数据")
+    for host, stats in sorted(hosts.items()):
+        requests = sum(stats["statuses"].values())
+        statuses = ", ".join(f"{k} {v:g}" for k, v in sorted(stats["statuses"].items()))
+        line = f"  {host}: {requests:g} 次请求"
+        if statuses:
+            line += f" ({statuses})"
+        line += f"，超时 {stats.get('upstream_timeouts_total', 0):g}，错误 {stats.get('upstream_errors_total', 0):g}"
+        histogram = registry.histograms.get(("upstream_request_duration_seconds", (("host", host),)))
+        if histogram is not None and histogram.count:
+            line += f"，p50 {histogram.quantile(0.5):.2f}s，p95 {histogram.quantile(0.95):.2f}s"
+        line += f"，接收 {_format_bytes(stats.get('upstream_response_bytes_total', 0))}"
+        if stats.get("upstream_request_bytes_total"):
+            line += f"，发送 {_format_bytes(stats['upstream_request_bytes_total'])}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _write_file(path: str, text: str) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+async def run_exporter(path: str, interval: float) -> None:
+    """定期将指标以 Prometheus 文本格式写入文件（可配合 node_exporter 的 textfile collector 使用）"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(_write_file, path, registry.render_prometheus())
+        except OSError as e:
+            logger.error(f"写入 Prometheus 指标文件失败: {e}")
@@ -0,0 +1,248 @@
+import asyncio
+import codecs
+import importlib.util
+import re
+import time
+from collections import deque
+
+import aiohttp
+from astrbot.api import logger
+
+from . import config, metrics, ratelimit, utils
+from .singleflight import SingleFlight
+
+
+class NameMCError(Exception):
+    """访问或解析 NameMC 失败，异常信息可直接回复给用户"""
+
+
+class StreamScanner:
+    """
+    在分块到达的 HTML 中增量查找正则匹配。
+
+    每次 feed 时只在"上一块末尾 + 新块"中查找，末尾保留 overlap 个字符以处理跨块的匹配；
+    收集到 max_matches 个不同的匹配（第一个捕获组）后即认为完成。
+    同时检测 Cloudflare 的 "Just a moment..." 验证页。
+    """
+
+    CLOUDFLARE_MARKER = "<title>Just a moment...</title>"
+
+    def __init__(self, pattern: str, max_matches: int = 1, overlap: int = 256):
+        self.pattern = re.compile(pattern)
+        self.max_matches = max_matches
+        self.overlap = max(overlap, len(self.CLOUDFLARE_MARKER))
+        self.matches: list[str] = []
+        self.blocked = False
+        self.bytes_read = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._tail = ""
+
+    @property
+    def done(self) -> bool:
+        return self.blocked or len(self.matches) >= self.max_matches
+
+    def feed(self, chunk: bytes) -> bool:
+        """输入一块数据，返回是否已经可以停止读取"""
+        self.bytes_read += len(chunk)
+        text = self._tail + self._decoder.decode(chunk)
+        if self.CLOUDFLARE_MARKER in text:
+            self.blocked = True
+            return True
+        for m in self.pattern.finditer(text):
+            value = m.group(1)
+            if value not in self.matches:
+                self.matches.append(value)
+                if len(self.matches) >= self.max_matches:
+                    break
+        self._tail = text[-self.overlap:]
+        return self.done
+
+
+class NameMCClient:
+    """
+    基于 curl_cffi AsyncSession 的 NameMC 异步客户端。
+
+    会话在第一次请求时创建并在插件运行期间复用连接；使用 chrome120 指纹以绕过 Cloudflare。
+    页面以流式读取，找到所需内容后立即关闭连接。相同请求的并发调用会被合并。
+    """
+
+    def __init__(self):
+        self._session = None
+        self._flight = SingleFlight()
+
+    def _get_session(self):
+        if self._session is None:
+            try:
+                # 延迟导入，避免没有依赖时启动失败
+                from curl_cffi.requests import AsyncSession
+            except Exception as e:
+                logger.error(f"缺少 curl_cffi 库或导入失败: {e}")
+                raise NameMCError("错误：服务器未安装或无法加载 'curl_cffi' 库，无法访问 NameMC 随机皮肤页面。")
+            self._session = AsyncSession(
+                impersonate="chrome120",
+                headers=config.DEFAULT_HEADER,
+                timeout=config.NAMEMC_TIMEOUT,
+            )
+        return self._session
+
+    async def scan(self, url: str, pattern: str, max_matches: int = 1) -> list[str]:
+        """
+        流式读取页面并返回最多 max_matches 个不同的匹配结果。
+
+        Raises:
+            Exception: 请求失败或被 Cloudflare 拦截时抛出
+        """
+        return await self._flight.do(
+            (url, pattern, max_matches), lambda: self._scan(url, pattern, max_matches)
+        )
+
+    async def _scan(self, url: str, pattern: str, max_matches: int) -> list[str]:
+        limiter = ratelimit.limiter
+        attempt = 0
+        while True:
+            scanner = StreamScanner(pattern, max_matches)
+            await limiter.acquire(url)
+            start = time.monotonic()
+            status = None
+            error = None
+            try:
+                async with limiter.slot(url), self._get_session().stream("GET", url) as resp:
+                    status = resp.status_code
+                    if status in ratelimit.RETRY_STATUSES and attempt < limiter.max_retries:
+                        delay = limiter.backoff(url, attempt, resp.headers.get("Retry-After"))
+                        attempt += 1
+                        if limiter.bucket(url) is None:
+                            await asyncio.sleep(delay)
+                        continue
+                    resp.raise_for_status()
+                    try:
+                        async for chunk in resp.aiter_content():
+                            if scanner.feed(chunk) or scanner.bytes_read >= config.NAMEMC_MAX_SCAN_BYTES:
+                                break
+                    except Exception as e:
+                        error = e
+                        raise
+            except Exception as e:
+                if status is None:
+                    error = e
+                raise
+            finally:
+                # curl_cffi 不经过 aiohttp 的请求追踪，在这里单独记录（status 为 None 表示请求未得到响应）
+                metrics.record_upstream(url, status, time.monotonic() - start, scanner.bytes_read, error)
+            break
+        if scanner.blocked:
+            raise Exception("被 Cloudflare 5秒盾拦截")
+        logger.debug(f"NameMC 页面扫描结束: {url}，读取 {scanner.bytes_read} 字节，匹配 {len(scanner.matches)} 个")
+        return scanner.matches
+
+    async def random_skin_ids(self, count: int = 1) -> list[str]:
+        """从 NameMC 随机皮肤页面解析最多 count 个不同的皮肤 ID"""
+        try:
+            skin_ids = await self.scan(config.NAMEMC_RAMDOM, r'href="/skin/([A-Za-z0-9_-]+)"', count)
+        except NameMCError:
+            raise
+        except Exception as e:
+            logger.error(f"从 NameMC 获取随机页面失败: {e}")
+            raise NameMCError(f"错误：无法从 NameMC 获取随机皮肤，请稍后再试。({e})")
+
+        if not skin_ids:
+            logger.error("在 NameMC 随机页面中未找到 skin id")
+            raise NameMCError("错误：未能从 NameMC 随机页面解析出皮肤 ID。")
+        return skin_ids
+
+    async def skin_player(self, skinid: str) -> str:
+        """从 NameMC 皮肤页面解析第一个使用该皮肤的玩家名称"""
+        skin_url = config.NAMEMC_SKIN.format(skinid=skinid)
+        try:
+            # 要求名称后紧跟结束符（NameMC 的链接形如 /profile/Notch.1），避免匹配到在分块边界处被截断的名称
+            players = await self.scan(skin_url, r'/profile/([A-Za-z0-9_]{1,16})(?=[."/?#])')
+        except NameMCError:
+            raise
+        except Exception as e:
+            logger.error(f"获取 NameMC 皮肤页面失败 ({skin_url}): {e}")
+            raise NameMCError(f"错误：无法访问 NameMC 的皮肤页面，请稍后再试。({e})")
+
+        if not players:
+            logger.error("未能从皮肤页面解析出玩家名称")
+            raise NameMCError("错误：未能从 NameMC 的皮肤页面解析出玩家名称。")
+        return players[0]
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class RandomSkinBuffer:
+    """
+    预先解析好的随机皮肤队列，元素为 (skinid, 玩家名, UUID)。
+
+    后台生产者持续从 NameMC 抓取随机皮肤并解析 UUID，直到队列填满；每次抓取随机页面时
+    会收集多个皮肤 ID 依次使用。队列为空时 get() 会直接同步抓取一个。
+    """
+
+    def __init__(self, client: NameMCClient, session: aiohttp.ClientSession, size: int):
+        self.client = client
+        self.session = session
+        self.size = size
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, size))
+        self._producer: asyncio.Task | None = None
+        # 从同一个随机页面收集到、尚未解析的皮肤 ID
+        self._skin_ids: deque[str] = deque()
+        self._refill_lock = asyncio.Lock()
+
+    async def _next_skin_id(self) -> str:
+        async with self._refill_lock:
+            if not self._skin_ids:
+                self._skin_ids.extend(await self.client.random_skin_ids(config.NAMEMC_RANDOM_HARVEST))
+            return self._skin_ids.popleft()
+
+    async def _produce(self) -> tuple[str, str, str]:
+        skinid = await self._next_skin_id()
+        player = await self.client.skin_player(skinid)
+        uuid, error_msg = await utils.get_player_uuid(self.session, player)
+        if error_msg:
+            raise NameMCError(error_msg)
+        logger.info(f"从 NameMC 解析到玩家: {player} (skinid={skinid})")
+        return skinid, player, uuid
+
+    async def _run(self) -> None:
+        failures = 0
+        while True:
+            try:
+                entry = await self._produce()
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                delay = min(config.RANDOM_SKIN_RETRY_MAX_DELAY, 2 ** failures)
+                logger.warning(f"预取随机皮肤失败，{delay} 秒后重试: {e}")
+                await asyncio.sleep(delay)
+                continue
+            await self._queue.put(entry)
+
+    def start(self) -> None:
+        """启动后台生产者（size 为 0 时不启动）"""
+        if self.size > 0 and self._producer is None:
+            if importlib.util.find_spec("curl_cffi") is None:
+                logger.warning("未安装 curl_cffi，随机皮肤预取已禁用")
+                return
+            self._producer = asyncio.create_task(self._run())
+
+    async def get(self) -> tuple[str, str, str]:
+        """
+        取出一个随机皮肤。
+
+        Raises:
+            NameMCError: 队列为空且同步抓取失败时抛出
+        """
+        try:
+            return self._queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return await self._produce()
+
+    async def stop(self) -> None:
+        if self._producer is not None:
+            self._producer.cancel()
+            self._producer = None
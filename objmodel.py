@@ -0,0 +1,192 @@
+import os
+from array import array
+from typing import Iterator
+
+import numpy as np
+
+from . import config
+
+# 渲染只需要几何与 UV，其余语句（材质、平滑组、对象/组名等）在压缩时丢弃
+_VERTEX_KINDS = (b"v", b"vt", b"vn")
+_KNOWN_STATEMENTS = {b"v", b"vt", b"vn", b"vp", b"f", b"l", b"p", b"o", b"g", b"s", b"mtllib", b"usemtl"}
+
+
+class ModelError(Exception):
+    """模型文件无效或超出限制，消息可以直接发送给用户"""
+
+
+def check_extension(filename: str | None) -> None:
+    """文件名带有扩展名时，检查其是否在 ALLOWED_MODEL_EXTENSIONS 中"""
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext and ext not in config.ALLOWED_MODEL_EXTENSIONS:
+        allowed = ", ".join(sorted(config.ALLOWED_MODEL_EXTENSIONS))
+        raise ModelError(f"错误：不支持的模型文件类型 '{ext}'，请发送 {allowed} 文件。")
+
+
+def _statements(path: str) -> Iterator[tuple[int, bytes, list[bytes]]]:
+    """逐行读取 OBJ 文件，去掉注释与空行，返回 (行号, 关键字, 参数)"""
+    recognized = False
+    with open(path, "rb") as f:
+        for lineno, raw in enumerate(f, 1):
+            if b"\0" in raw:
+                raise ModelError("错误：模型文件不是文本格式的 OBJ 文件。")
+            parts = raw.split(b"#", 1)[0].split()
+            if not parts:
+                continue
+            if parts[0] in _KNOWN_STATEMENTS:
+                recognized = True
+            elif not recognized and lineno > config.MODEL_SNIFF_LINES:
+                # 文件开头一段内没有任何 OBJ 语句，尽早拒绝
+                raise ModelError("错误：文件内容不是有效的 OBJ 模型。")
+            yield lineno, parts[0], parts[1:]
+
+
+def _resolve(ref: bytes, count: int, lineno: int) -> int:
+    """将面中的顶点引用（1 起始，负数为相对引用）转换为 0 起始的索引"""
+    try:
+        index = int(ref)
+    except ValueError:
+        raise ModelError(f"错误：模型第 {lineno} 行的面数据无效。") from None
+    index = index - 1 if index > 0 else count + index
+    if not 0 <= index < count:
+        raise ModelError(f"错误：模型第 {lineno} 行的面引用了不存在的顶点。")
+    return index
+
+
+def _face_refs(args: list[bytes], counts: dict[bytes, int], lineno: int) -> list[tuple[int | None, ...]]:
+    """解析一个面的所有顶点引用，返回 (v, vt, vn) 索引元组列表，缺省的分量为 None"""
+    if len(args) < 3:
+        raise ModelError(f"错误：模型第 {lineno} 行的面少于 3 个顶点。")
+    refs = []
+    for arg in args:
+        fields = arg.split(b"/")
+        if len(fields) > 3 or not fields[0]:
+            raise ModelError(f"错误：模型第 {lineno} 行的面数据无效。")
+        refs.append(tuple(
+            _resolve(field, counts[kind], lineno) if field else None
+            for kind, field in zip(_VERTEX_KINDS, fields)
+        ))
+    return refs
+
+
+def _format_float(value: float, precision: int) -> str:
+    text = f"{value:.{precision}f}".rstrip("0").rstrip(".")
+    return "0" if text in ("", "-0") else text
+
+
+def compact_obj(
+    src_path: str,
+    dst_path: str,
+    max_bytes: int = config.MODEL_MAX_BYTES,
+    max_vertices: int = config.MODEL_MAX_VERTICES,
+    max_faces: int = config.MODEL_MAX_FACES,
+    precision: int = config.MODEL_FLOAT_PRECISION,
+) -> dict:
+    """
+    校验并压缩 OBJ 模型，结果写入 dst_path。
+
+    分两遍流式读取，内存占用只与顶点数量有关：第一遍校验语法与数量上限，并标记被面引用的顶点；
+    第二遍只输出被引用的 v/vt/vn（坐标保留 precision 位小数）和重新编号后的面，丢弃注释与其他语句，
+    同时收集被引用顶点的坐标，结束后批量计算包围盒与重心（供 frame_camera 自动取景）。
+
+    Returns:
+        统计信息 {"vertices", "faces", "original_bytes", "compact_bytes", "bounds_min", "bounds_max", "centroid"}
+
+    Raises:
+        ModelError: 文件不是有效的 OBJ 模型或超出限制
+    """
+    original_bytes = os.path.getsize(src_path)
+    if original_bytes > max_bytes:
+        raise ModelError(f"错误：模型文件过大（{original_bytes / 1024 / 1024:.1f} MB），上限为 {max_bytes / 1024 / 1024:.0f} MB。")
+
+    # 第一遍：校验并标记被引用的顶点
+    counts = {kind: 0 for kind in _VERTEX_KINDS}
+    used = {kind: bytearray() for kind in _VERTEX_KINDS}
+    faces = 0
+    for lineno, keyword, args in _statements(src_path):
+        if keyword in counts:
+            dims = 2 if keyword == b"vt" else 3
+            if len(args) < dims:
+                raise ModelError(f"错误：模型第 {lineno} 行的顶点数据不完整。")
+            try:
+                [float(x) for x in args[:dims]]
+            except ValueError:
+                raise ModelError(f"错误：模型第 {lineno} 行的顶点数据无效。") from None
+            counts[keyword] += 1
+            used[keyword].append(0)
+            if counts[keyword] > max_vertices:
+                raise ModelError(f"错误：模型顶点过多，上限为 {max_vertices} 个。")
+        elif keyword == b"f":
+            faces += 1
+            if faces > max_faces:
+                raise ModelError(f"错误：模型的面过多，上限为 {max_faces} 个。")
+            for ref in _face_refs(args, counts, lineno):
+                for kind, index in zip(_VERTEX_KINDS, ref):
+                    if index is not None:
+                        used[kind][index] = 1
+    if faces == 0:
+        raise ModelError("错误：模型中没有任何面，无法渲染。")
+
+    # 旧索引 -> 新索引（1 起始），未被引用的顶点会被丢弃
+    remap = {
+        kind: np.cumsum(np.frombuffer(bytes(flags), dtype=np.uint8), dtype=np.int64).tolist()
+        for kind, flags in used.items()
+    }
+
+    # 第二遍：写出压缩后的模型
+    seen = {kind: 0 for kind in _VERTEX_KINDS}
+    positions = array("d")
+    with open(dst_path, "w", encoding="ascii", newline="\n") as out:
+        for lineno, keyword, args in _statements(src_path):
+            if keyword in seen:
+                index = seen[keyword]
+                seen[keyword] += 1
+                if used[keyword][index]:
+                    dims = 2 if keyword == b"vt" else 3
+                    values = [float(x) for x in args[:dims]]
+                    if keyword == b"v":
+                        positions.extend(values)
+                    coords = " ".join(_format_float(value, precision) for value in values)
+                    out.write(f"{keyword.decode()} {coords}\n")
+            elif keyword == b"f":
+                fields = []
+                for ref in _face_refs(args, seen, lineno):
+                    parts = ["" if index is None else str(remap[kind][index]) for kind, index in zip(_VERTEX_KINDS, ref)]
+                    fields.append("/".join(parts).rstrip("/"))
+                out.write("f " + " ".join(fields) + "\n")
+
+    points = np.frombuffer(positions, dtype=np.float64).reshape(-1, 3)
+    return {
+        "vertices": len(points),
+        "faces": faces,
+        "original_bytes": original_bytes,
+        "compact_bytes": os.path.getsize(dst_path),
+        "bounds_min": points.min(axis=0).tolist(),
+        "bounds_max": points.max(axis=0).tolist(),
+        "centroid": points.mean(axis=0).tolist(),
+    }
+
+
+def _as_preset(point: np.ndarray) -> dict:
+    return {axis: f"{value:.2f}" for axis, value in zip(("x", "y", "z"), point)}
+
+
+def frame_camera(stats: dict) -> tuple[dict, dict]:
+    """
+    根据模型的包围盒与重心计算能完整取景的相机位置与焦点（格式与预设相同）。
+
+    焦点为顶点重心；相机沿默认相机的视线方向后退，距离按焦点到包围盒最远角点的距离
+    乘以 AUTO_FRAME_DISTANCE_FACTOR（参照默认预设对标准玩家模型的取景比例）。
+    """
+    bounds_min = np.array(stats["bounds_min"])
+    bounds_max = np.array(stats["bounds_max"])
+    focal = np.array(stats["centroid"])
+    corners = np.array(np.meshgrid(*zip(bounds_min, bounds_max))).reshape(3, -1).T
+    radius = max(np.linalg.norm(corners - focal, axis=1).max(), config.AUTO_FRAME_MIN_RADIUS)
+
+    default_camera = np.array([float(config.DEFAULT_CAMERA_POSITION[k]) for k in ("x", "y", "z")])
+    default_focal = np.array([float(config.DEFAULT_CAMERA_FOCAL_POINT[k]) for k in ("x", "y", "z")])
+    direction = default_camera - default_focal
+    direction /= np.linalg.norm(direction)
+    camera = focal + direction * radius * config.AUTO_FRAME_DISTANCE_FACTOR
+    return _as_preset(camera), _as_preset(focal)
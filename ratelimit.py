@@ -0,0 +1,223 @@
+import asyncio
+import random
+import time
+import weakref
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import aiohttp
+from astrbot.api import logger
+
+from . import config, metrics
+
+# 触发退避重试的状态码
+RETRY_STATUSES = {429, 503}
+
+# 响应 -> 产生该响应的那次请求的发出时间，用于计算不含排队与退避等待的上游耗时
+_sent_at: "weakref.WeakKeyDictionary[aiohttp.ClientResponse, float]" = weakref.WeakKeyDictionary()
+
+
+class TokenBucket:
+    """
+    令牌桶限流器。
+
+    acquire 按到达顺序排队（asyncio.Lock 是公平的），令牌不足时等待补充，
+    因此突发请求会被平滑为固定速率，而不是直接失败。
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """获取一个令牌，返回排队等待的秒数"""
+        start = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                if self.rate <= 0:
+                    return now - start
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return now - start
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """上游要求暂停时（如 Retry-After），让该主机的所有请求至少等待 seconds 秒"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+        self._updated = self._paused_until
+
+
+class RateLimiter:
+    """按上游主机划分的令牌桶集合，附带 429/503 的退避重试与按上游分组的并发上限"""
+
+    def __init__(
+        self,
+        limits: dict[str, tuple[float, int]],
+        max_retries: int = config.UPSTREAM_MAX_RETRIES,
+        base_delay: float = config.UPSTREAM_RETRY_BASE_DELAY,
+        max_delay: float = config.UPSTREAM_RETRY_MAX_DELAY,
+        concurrency: dict[str, tuple[str, int]] | None = None,
+    ):
+        self.limits = limits
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.concurrency = concurrency or {}
+        self._buckets: dict[str, TokenBucket] = {}
+        # 同一分组的主机共用一个信号量
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    def bucket(self, url: str) -> TokenBucket | None:
+        """返回 URL 所属主机的令牌桶，未配置限流的主机返回 None"""
+        host = urlsplit(url).hostname or ""
+        if host not in self.limits:
+            return None
+        if host not in self._buckets:
+            rate, burst = self.limits[host]
+            self._buckets[host] = TokenBucket(rate, burst)
+        return self._buckets[host]
+
+    def semaphore(self, url: str) -> asyncio.Semaphore | None:
+        """返回 URL 所属上游分组的并发信号量，未限制并发的主机返回 None"""
+        group, limit = self.concurrency.get(urlsplit(url).hostname or "", (None, 0))
+        if group is None or limit <= 0:
+            return None
+        if group not in self._semaphores:
+            self._semaphores[group] = asyncio.Semaphore(limit)
+        return self._semaphores[group]
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """占用 URL 所属上游的一个并发名额，直到 async with 块结束"""
+        semaphore = self.semaphore(url)
+        if semaphore is None:
+            yield
+            return
+        async with semaphore:
+            yield
+
+    async def acquire(self, url: str) -> None:
+        bucket = self.bucket(url)
+        if bucket is not None:
+            waited = await bucket.acquire()
+            if waited > 1:
+                logger.info(f"请求 {urlsplit(url).hostname} 排队等待了 {waited:.1f} 秒")
+
+    def retry_delay(self, attempt: int, retry_after: str | None = None) -> float:
+        """
+        计算第 attempt 次重试前的等待时间。
+        优先使用 Retry-After（秒数或 HTTP 日期），否则使用带随机抖动的指数退避。
+        """
+        if retry_after:
+            try:
+                return min(self.max_delay, max(0.0, float(retry_after)))
+            except ValueError:
+                try:
+                    return min(self.max_delay, max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time()))
+                except (TypeError, ValueError):
+                    pass
+        return min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def backoff(self, url: str, attempt: int, retry_after: str | None = None) -> float:
+        """记录一次限流响应：暂停该主机并返回本次重试需要等待的秒数"""
+        delay = self.retry_delay(attempt, retry_after)
+        bucket = self.bucket(url)
+        if bucket is not None:
+            bucket.pause(delay)
+        logger.warning(f"{urlsplit(url).hostname} 返回限流响应，{delay:.1f} 秒后进行第 {attempt + 1} 次重试")
+        return delay
+
+    @asynccontextmanager
+    async def request(self, session: aiohttp.ClientSession, method: str, url: str, **kwargs):
+        """
+        经过限流的 aiohttp 请求，用法与 session.request 的 async with 相同。
+
+        遇到 429/503 时按 Retry-After 或指数退避重试，重试次数用尽后返回最后一次的响应。
+        请求体只能发送一次的场景（如 FormData）可以传入返回请求体的可调用对象作为 data。
+        每次请求（直到响应读取完毕）占用所属上游的一个并发名额，退避等待期间不占用。
+        """
+        data = kwargs.pop("data", None)
+        attempt = 0
+        while True:
+            await self.acquire(url)
+            body = data() if callable(data) else data
+            async with self.slot(url):
+                sent = time.monotonic()
+                response = await session.request(method, url, data=body, **kwargs)
+                if response.status not in RETRY_STATUSES or attempt >= self.max_retries:
+                    _sent_at[response] = sent
+                    try:
+                        yield response
+                    except (asyncio.TimeoutError, aiohttp.ClientPayloadError, aiohttp.ClientConnectionError) as e:
+                        # 读取响应体时的超时与断连不经过 aiohttp 的请求追踪，在这里计入上游错误
+                        metrics.record_error(url, e)
+                        raise
+                    finally:
+                        response.release()
+                    return
+                delay = self.backoff(url, attempt, response.headers.get("Retry-After"))
+                response.release()
+            attempt += 1
+            if self.bucket(url) is None:
+                # 未配置限流的主机没有令牌桶可以暂停，直接在这里等待
+                await asyncio.sleep(delay)
+
+
+def build_limits(plugin_config: dict) -> dict[str, tuple[float, int]]:
+    """根据插件配置生成 主机 -> (每秒请求数, 突发容量) 的映射"""
+    limits = {}
+    for group, hosts in config.RATE_LIMIT_HOSTS.items():
+        default_rate, burst = config.RATE_LIMIT_DEFAULTS[group]
+        rate = plugin_config.get(f"{group}_rate_limit", default_rate)
+        for host in hosts:
+            limits[host] = (rate, burst)
+    return limits
+
+
+def build_concurrency(plugin_config: dict) -> dict[str, tuple[str, int]]:
+    """根据插件配置生成 主机 -> (上游分组, 最大并发请求数) 的映射"""
+    concurrency = {}
+    for group, hosts in config.RATE_LIMIT_HOSTS.items():
+        limit = plugin_config.get(f"{group}_max_concurrency", config.UPSTREAM_CONCURRENCY.get(group, 0))
+        for host in hosts:
+            concurrency[host] = (group, limit)
+    return concurrency
+
+
+limiter = RateLimiter(build_limits({}), concurrency=build_concurrency({}))
+
+
+def configure(plugin_config: dict) -> None:
+    """根据插件配置重建全局限流器"""
+    global limiter
+    limiter = RateLimiter(
+        build_limits(plugin_config),
+        max_retries=plugin_config.get("upstream_max_retries", config.UPSTREAM_MAX_RETRIES),
+        concurrency=build_concurrency(plugin_config),
+    )
+
+
+def request(session: aiohttp.ClientSession, method: str, url: str, **kwargs):
+    """使用全局限流器发起请求，见 RateLimiter.request"""
+    return limiter.request(session, method, url, **kwargs)
+
+
+def elapsed(response: aiohttp.ClientResponse) -> float | None:
+    """返回 request 得到的响应从发出请求到现在的秒数（不含限流排队与退避等待），未知时返回 None"""
+    sent = _sent_at.get(response)
+    return None if sent is None else time.monotonic() - sent
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+
+import aiohttp
+from astrbot.api import logger
+
+from . import breaker, ratelimit, tracing, transport
+from .singleflight import SingleFlight
+
+# 不可变缓存文件的文件名前缀，这类文件不受 max_age 限制
+_IMMUTABLE_PREFIX = "i-"
+
+
+class RenderCache:
+    """
+    渲染图片的本地磁盘缓存。
+
+    文件名为缓存键的 SHA-256，总大小超过 max_bytes 时按最久未使用的顺序淘汰；
+    超过 max_age 秒的文件视为过期，以不可变内容（如皮肤材质哈希）为键的文件除外。
+    索引只保存在内存中，启动时按文件修改时间重建。
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_age: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        # 文件名 -> (大小, 创建时间)，顺序即 LRU 顺序
+        self._index: OrderedDict[str, tuple[int, float]] | None = None
+        self._total_bytes = 0
+        self._flight = SingleFlight()
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """将缓存键的各部分拼接为字符串"""
+        return "|".join(str(p) for p in parts)
+
+    def _filename(self, key: str, immutable: bool) -> str:
+        prefix = _IMMUTABLE_PREFIX if immutable else ""
+        return prefix + hashlib.sha256(key.encode("utf-8")).hexdigest() + ".png"
+
+    def _load_index(self) -> OrderedDict:
+        if self._index is None:
+            os.makedirs(self.directory, exist_ok=True)
+            entries = []
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if name.endswith(".tmp"):
+                    os.remove(path)
+                    continue
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name, stat.st_size))
+            entries.sort()
+            self._index = OrderedDict((name, (size, mtime)) for mtime, name, size in entries)
+            self._total_bytes = sum(size for _, _, size in entries)
+            logger.info(f"渲染缓存已加载 {len(entries)} 个文件，共 {self._total_bytes / 1024 / 1024:.1f} MB")
+        return self._index
+
+    def _remove(self, name: str) -> None:
+        size, _ = self._index.pop(name)
+        self._total_bytes -= size
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    def get(self, key: str, immutable: bool = False, allow_stale: bool = False) -> str | None:
+        """返回缓存文件路径，未命中或已过期（allow_stale 为 False 时）返回 None"""
+        index = self._load_index()
+        name = self._filename(key, immutable)
+        entry = index.get(name)
+        if entry is None:
+            return None
+        if not immutable and not allow_stale and time.time() - entry[1] > self.max_age:
+            self._remove(name)
+            return None
+        index.move_to_end(name)
+        return os.path.join(self.directory, name)
+
+    def _write(self, path: str, data: bytes) -> None:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    async def put(self, key: str, data: bytes, immutable: bool = False) -> str:
+        """写入缓存并按总大小淘汰旧文件，返回文件路径"""
+        index = self._load_index()
+        name = self._filename(key, immutable)
+        path = os.path.join(self.directory, name)
+        await asyncio.to_thread(self._write, path, data)
+        if name in index:
+            self._total_bytes -= index[name][0]
+        index[name] = (len(data), time.time())
+        index.move_to_end(name)
+        self._total_bytes += len(data)
+        while self._total_bytes > self.max_bytes and len(index) > 1:
+            self._remove(next(iter(index)))
+        return path
+
+    async def fetch(
+        self,
+        session: aiohttp.ClientSession,
+        key: str,
+        url: str,
+        immutable: bool = False,
+    ) -> str | None:
+        """
+        获取渲染图片：命中缓存直接返回本地路径，否则下载并写入缓存。
+        下载失败返回 None。
+        """
+        path = self.get(key, immutable)
+        if path:
+            logger.info(f"{tracing.log_prefix()}命中渲染缓存: {key}")
+            return path
+        return await self._flight.do(key, lambda: self._download(session, key, url, immutable))
+
+    async def _download(
+        self,
+        session: aiohttp.ClientSession,
+        key: str,
+        url: str,
+        immutable: bool,
+    ) -> str | None:
+        data = await download(session, url)
+        if data is None:
+            return None
+        return await self.put(key, data, immutable)
+
+
+async def download(session: aiohttp.ClientSession, url: str) -> bytes | None:
+    """下载一张渲染图片并将结果记录到对应上游的熔断器，失败返回 None"""
+    circuit = breaker.for_url(url)
+    with tracing.span("download") as stage:
+        try:
+            async with ratelimit.request(session, "GET", url, timeout=transport.timeout("render")) as response:
+                stage.set(status=response.status)
+                content_type = response.headers.get("Content-Type", "")
+                if response.status != 200 or not content_type.startswith("image/"):
+                    logger.warning(f"{tracing.log_prefix()}下载渲染图片失败 (状态: {response.status}, 类型: {content_type}): {url}")
+                    # 4xx 通常是请求本身的问题（如渲染参数无效），不计入上游故障
+                    if circuit is not None and (response.status >= 500 or response.status == 429):
+                        circuit.record_failure()
+                    return None
+                data = await response.read()
+                # 只统计上游耗时，限流排队和 429/503 退避的等待不计入熔断器的慢请求判断
+                latency = ratelimit.elapsed(response)
+                stage.set(bytes=len(data))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            stage.set(error=repr(e))
+            logger.error(f"{tracing.log_prefix()}下载渲染图片时发生网络错误: {e!r}")
+            if circuit is not None:
+                circuit.record_failure()
+            return None
+    if circuit is not None:
+        circuit.record_success(latency or 0.0)
+    return data
@@ -0,0 +1,193 @@
+import asyncio
+import io
+
+import aiohttp
+import numpy as np
+from PIL import Image
+from astrbot.api import logger
+
+from . import config, ratelimit, transport, renderer3d
+from .cache import TTLCache
+
+# 本地渲染后端："starlight" 只使用 Starlight，"local" 本地渲染支持的类型，
+# "auto" 本地渲染支持的类型并在 Starlight 熔断时也使用本地渲染
+backend = config.DEFAULT_RENDER_BACKEND
+
+# 皮肤材质哈希 -> 解码后的 64x64 RGBA 数组
+_skin_cache = TTLCache(config.LOCAL_SKIN_CACHE_SIZE, config.TEXTURE_CACHE_TTL)
+
+# 各身体部位正面在 64x64 皮肤中的位置 (x, y, 宽, 高)，依次为基础层与外层
+_FRONT_FACES = {
+    "head": ((8, 8, 8, 8), (40, 8, 8, 8)),
+    "body": ((20, 20, 8, 12), (20, 36, 8, 12)),
+    "right_arm": ((44, 20, 4, 12), (44, 36, 4, 12)),
+    "left_arm": ((36, 52, 4, 12), (52, 52, 4, 12)),
+    "right_leg": ((4, 20, 4, 12), (4, 36, 4, 12)),
+    "left_leg": ((20, 52, 4, 12), (4, 52, 4, 12)),
+}
+
+
+def configure(plugin_config: dict) -> None:
+    """根据插件配置设置渲染后端"""
+    global backend
+    backend = plugin_config.get("render_backend", config.DEFAULT_RENDER_BACKEND)
+
+
+def supports(rendertype: str) -> bool:
+    """本地渲染器是否支持该渲染类型"""
+    return rendertype in config.LOCAL_RENDERTYPES
+
+
+def should_render_locally(rendertype: str, starlight_available: bool = True) -> bool:
+    """根据当前后端配置和 Starlight 状态，判断是否使用本地渲染"""
+    if backend == "starlight" or not supports(rendertype):
+        return False
+    return backend == "local" or not starlight_available
+
+
+def _mirror_box(skin: np.ndarray, src: tuple[int, int], dst: tuple[int, int], w: int, d: int, h: int) -> None:
+    """将皮肤中的一个立方体区域左右镜像复制到另一个位置（用于旧版 64x32 皮肤转换）"""
+    sx, sy = src
+    dx, dy = dst
+    # 顶面与底面：各自水平翻转
+    for offset, width in ((d, w), (d + w, w)):
+        skin[dy:dy + d, dx + offset:dx + offset + width] = skin[sy:sy + d, sx + offset:sx + offset + width, :][:, ::-1]
+    # 侧面：右 <-> 左交换，正面与背面原位翻转
+    sides = [(0, d), (d, w), (d + w, d), (2 * d + w, w)]
+    mapping = {0: 2, 1: 1, 2: 0, 3: 3}
+    for i, (offset, width) in enumerate(sides):
+        t_offset, _ = sides[mapping[i]]
+        face = skin[sy + d:sy + d + h, sx + offset:sx + offset + width][:, ::-1]
+        skin[dy + d:dy + d + h, dx + t_offset:dx + t_offset + width] = face
+
+
+def load_skin(data: bytes) -> np.ndarray:
+    """将皮肤 PNG 解码为 64x64 RGBA 数组，旧版 64x32 皮肤会转换为新版布局"""
+    with Image.open(io.BytesIO(data)) as img:
+        arr = np.asarray(img.convert("RGBA"), dtype=np.uint8)
+    if arr.shape[1] != 64 or arr.shape[0] not in (32, 64):
+        raise ValueError(f"不支持的皮肤尺寸: {arr.shape[1]}x{arr.shape[0]}")
+    if arr.shape[0] == 64:
+        return arr.copy()
+    skin = np.zeros((64, 64, 4), dtype=np.uint8)
+    skin[:32] = arr
+    # 旧版皮肤的左腿、左臂是右腿、右臂的镜像
+    _mirror_box(skin, (0, 16), (16, 48), 4, 4, 12)
+    _mirror_box(skin, (40, 16), (32, 48), 4, 4, 12)
+    return skin
+
+
+def _composite(base: np.ndarray, overlay: np.ndarray) -> np.ndarray:
+    """将外层按 alpha 叠加到基础层上（向量化的 "over" 混合）"""
+    base = base.astype(np.float32) / 255
+    overlay = overlay.astype(np.float32) / 255
+    oa = overlay[..., 3:4]
+    ba = base[..., 3:4]
+    out_a = oa + ba * (1 - oa)
+    rgb = overlay[..., :3] * oa + base[..., :3] * ba * (1 - oa)
+    rgb = np.divide(rgb, out_a, out=np.zeros_like(rgb), where=out_a > 0)
+    return (np.concatenate([rgb, out_a], axis=-1) * 255 + 0.5).astype(np.uint8)
+
+
+def _crop(skin: np.ndarray, rect: tuple[int, int, int, int]) -> np.ndarray:
+    x, y, w, h = rect
+    return skin[y:y + h, x:x + w]
+
+
+def _front(skin: np.ndarray, part: str, slim: bool) -> np.ndarray:
+    base_rect, overlay_rect = _FRONT_FACES[part]
+    if slim and part.endswith("_arm"):
+        base_rect = base_rect[:2] + (3,) + base_rect[3:]
+        overlay_rect = overlay_rect[:2] + (3,) + overlay_rect[3:]
+    return _composite(_crop(skin, base_rect), _crop(skin, overlay_rect))
+
+
+def upscale(arr: np.ndarray, scale: int) -> np.ndarray:
+    """最近邻放大"""
+    return np.repeat(np.repeat(arr, scale, axis=0), scale, axis=1)
+
+
+def render_head(skin: np.ndarray, scale: int) -> np.ndarray:
+    """正面头像（含帽子层）"""
+    return upscale(_front(skin, "head", False), scale)
+
+
+def render_pixel(skin: np.ndarray, slim: bool, scale: int) -> np.ndarray:
+    """正面平面全身像，纤细模型的手臂宽 3 像素"""
+    canvas = np.zeros((32, 16, 4), dtype=np.uint8)
+    arm_w = 3 if slim else 4
+    placements = [
+        ("head", 4, 0),
+        ("body", 4, 8),
+        ("right_arm", 4 - arm_w, 8),
+        ("left_arm", 12, 8),
+        ("right_leg", 4, 20),
+        ("left_leg", 8, 20),
+    ]
+    for part, x, y in placements:
+        face = _front(skin, part, slim)
+        h, w = face.shape[:2]
+        canvas[y:y + h, x:x + w] = face
+    return upscale(canvas, scale)
+
+
+def render_skin_texture(skin: np.ndarray, scale: int) -> np.ndarray:
+    """皮肤材质本身的放大图"""
+    return upscale(skin, scale)
+
+
+def encode_png(arr: np.ndarray) -> bytes:
+    buf = io.BytesIO()
+    Image.fromarray(arr, "RGBA").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def render_array(rendertype: str, skin: np.ndarray, slim: bool) -> np.ndarray:
+    """按渲染类型生成 RGBA 数组"""
+    if rendertype == "head":
+        return render_head(skin, config.LOCAL_RENDER_SCALES["head"])
+    if rendertype == "pixel":
+        return render_pixel(skin, slim, config.LOCAL_RENDER_SCALES["pixel"])
+    if rendertype == "skin":
+        return render_skin_texture(skin, config.LOCAL_RENDER_SCALES["skin"])
+    if rendertype in ("default", "isometric"):
+        return renderer3d.render(skin, slim, rendertype)
+    raise ValueError(f"本地渲染器不支持渲染类型 '{rendertype}'")
+
+
+async def fetch_skin(session: aiohttp.ClientSession, textures: dict) -> np.ndarray | None:
+    """下载并解码玩家的皮肤材质，按材质哈希缓存；玩家使用默认皮肤或下载失败时返回 None"""
+    skin_hash = textures.get("hash")
+    if not skin_hash:
+        return None
+    skin = _skin_cache.get(skin_hash)
+    if skin is not None:
+        return skin
+    url = config.SKIN_TEXTURE_URL.format(hash=skin_hash)
+    try:
+        async with ratelimit.request(session, "GET", url, timeout=transport.timeout("api")) as response:
+            if response.status != 200:
+                logger.warning(f"下载皮肤材质失败 (状态: {response.status}): {url}")
+                return None
+            data = await response.read()
+        skin = await asyncio.to_thread(load_skin, data)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, OSError) as e:
+        logger.error(f"下载或解码皮肤材质失败: {e!r}")
+        return None
+    _skin_cache.set(skin_hash, skin)
+    return skin
+
+
+async def render(session: aiohttp.ClientSession, rendertype: str, textures: dict) -> bytes | None:
+    """
+    在本地渲染玩家皮肤，返回 PNG 数据。
+    无法获取皮肤材质时返回 None，调用方应退回到 Starlight。
+    """
+    skin = await fetch_skin(session, textures)
+    if skin is None:
+        return None
+
+    def work() -> bytes:
+        return encode_png(render_array(rendertype, skin, textures.get("slim", False)))
+
+    return await asyncio.to_thread(work)
@@ -0,0 +1,168 @@
+import numpy as np
+from PIL import Image, ImageDraw
+
+from . import config
+
+# 坐标系：单位为皮肤像素，脚底中心为原点，y 轴向上，玩家面朝 -z，玩家的右侧为 +x。
+# 每个部位：(名称, 尺寸 (宽, 高, 深), 中心, 基础层 UV, 外层 UV, 外层膨胀量, 旋转轴心)
+_PARTS = [
+    ("head", (8, 8, 8), (0, 28, 0), (0, 0), (32, 0), 0.5, (0, 24, 0)),
+    ("body", (8, 12, 4), (0, 18, 0), (16, 16), (16, 32), 0.25, (0, 24, 0)),
+    ("right_arm", (4, 12, 4), (6, 18, 0), (40, 16), (40, 32), 0.25, (5, 22, 0)),
+    ("left_arm", (4, 12, 4), (-6, 18, 0), (32, 48), (48, 48), 0.25, (-5, 22, 0)),
+    ("right_leg", (4, 12, 4), (2, 6, 0), (0, 16), (0, 32), 0.25, (2, 12, 0)),
+    ("left_leg", (4, 12, 4), (-2, 6, 0), (16, 48), (0, 48), 0.25, (-2, 12, 0)),
+]
+
+# 各姿势下部位绕 z 轴的旋转角度（度），正值使手臂向外张开
+_POSES = {
+    "default": {"right_arm": 8, "left_arm": -8},
+    "isometric": {},
+}
+
+# 按面法线的简单明暗，模仿游戏内的方向光照
+_SHADE = {"top": 1.0, "bottom": 0.5, "front": 0.85, "back": 0.85, "right": 0.7, "left": 0.7}
+
+
+def _faces(size: tuple[float, float, float], uv: tuple[int, int]) -> list:
+    """
+    返回长方体六个面的 (面名, 纹理矩形 (x, y, 宽, 高), 原点, u 方向, v 方向, 法线)。
+    原点为纹理左上角对应的顶点，u/v 方向为纹理向右/向下一个像素对应的位移（在单位立方体坐标中）。
+    """
+    w, h, d = size
+    u, v = uv
+    return [
+        ("top", (u + d, v, w, d), (1, 1, 1), (-1, 0, 0), (0, 0, -1), (0, 1, 0)),
+        ("bottom", (u + d + w, v, w, d), (1, 0, 0), (-1, 0, 0), (0, 0, 1), (0, -1, 0)),
+        ("right", (u, v + d, d, h), (1, 1, 1), (0, 0, -1), (0, -1, 0), (1, 0, 0)),
+        ("front", (u + d, v + d, w, h), (1, 1, 0), (-1, 0, 0), (0, -1, 0), (0, 0, -1)),
+        ("left", (u + d + w, v + d, d, h), (0, 1, 0), (0, 0, 1), (0, -1, 0), (-1, 0, 0)),
+        ("back", (u + 2 * d + w, v + d, w, h), (0, 1, 1), (1, 0, 0), (0, -1, 0), (0, 0, 1)),
+    ]
+
+
+def _rotation_z(degrees: float) -> np.ndarray:
+    r = np.radians(degrees)
+    c, s = np.cos(r), np.sin(r)
+    return np.array([[c, -s, 0], [s, c, 0], [0, 0, 1]], dtype=np.float64)
+
+
+def build_quads(skin: np.ndarray, slim: bool, pose: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    将玩家模型拆分为逐纹素的四边形。
+
+    Returns:
+        (corners, normals, colors)：形状分别为 (N, 4, 3)、(N, 3)、(N, 4)，已剔除透明纹素
+    """
+    all_corners, all_normals, all_colors = [], [], []
+    rotations = _POSES.get(pose, {})
+    for name, size, center, base_uv, overlay_uv, inflate, pivot in _PARTS:
+        size = np.array(size, dtype=np.float64)
+        center = np.array(center, dtype=np.float64)
+        if slim and name.endswith("_arm"):
+            size[0] = 3
+            center[0] -= 0.5 * np.sign(center[0])
+        rot = _rotation_z(rotations.get(name, 0))
+        pivot = np.array(pivot, dtype=np.float64)
+
+        for uv, grow in ((base_uv, 0.0), (overlay_uv, inflate)):
+            box = size + 2 * grow
+            box_min = center - box / 2
+            for face, (tx, ty, tw, th), origin, u_dir, v_dir, normal in _faces(tuple(size.astype(int)), uv):
+                tw, th = int(tw), int(th)
+                texels = skin[ty:ty + th, tx:tx + tw].reshape(-1, 4)
+                visible = texels[:, 3] > 0
+                if not visible.any():
+                    continue
+                # 每个纹素在 u/v 方向上对应的世界坐标位移
+                u_step = np.array(u_dir) * (box @ np.abs(u_dir)) / tw
+                v_step = np.array(v_dir) * (box @ np.abs(v_dir)) / th
+                start = box_min + np.array(origin) * box
+                jj, ii = np.mgrid[0:th, 0:tw]
+                ii = ii.reshape(-1, 1)
+                jj = jj.reshape(-1, 1)
+                p00 = start + ii * u_step + jj * v_step
+                corners = np.stack([p00, p00 + u_step, p00 + u_step + v_step, p00 + v_step], axis=1)
+                corners = (corners - pivot) @ rot.T + pivot
+                shade = _SHADE[face]
+                colors = texels.astype(np.float64)
+                colors[:, :3] *= shade
+                all_corners.append(corners[visible])
+                all_normals.append(np.repeat((rot @ np.array(normal, dtype=np.float64))[None], visible.sum(), axis=0))
+                all_colors.append(colors[visible])
+    return (
+        np.concatenate(all_corners),
+        np.concatenate(all_normals),
+        np.concatenate(all_colors).round().astype(np.uint8),
+    )
+
+
+def _camera_basis(position: np.ndarray, focal: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    forward = focal - position
+    forward /= np.linalg.norm(forward)
+    right = np.cross(forward, np.array([0.0, 1.0, 0.0]))
+    if np.linalg.norm(right) < 1e-6:
+        # 相机正对上下方时改用 z 轴作为参考
+        right = np.cross(forward, np.array([0.0, 0.0, 1.0]))
+    right /= np.linalg.norm(right)
+    up = np.cross(right, forward)
+    return forward, right, up
+
+
+def _preset(presets: dict, name: str) -> np.ndarray:
+    point = presets.get(name) or presets["default"]
+    return np.array([float(point["x"]), float(point["y"]), float(point["z"])])
+
+
+def render(skin: np.ndarray, slim: bool, pose: str, max_size: int = config.LOCAL_3D_MAX_SIZE) -> np.ndarray:
+    """
+    渲染玩家模型，返回 RGBA 数组。
+
+    isometric 使用正交投影，其他姿势使用透视投影；相机与焦点取自 CAMERA_PRESETS / FOCAL_PRESETS。
+    投影与背面剔除批量完成，随后按深度从远到近绘制每个纹素（画家算法），并以 2 倍超采样抗锯齿。
+    """
+    corners, normals, colors = build_quads(skin, slim, pose)
+    position = _preset(config.CAMERA_PRESETS, pose)
+    focal = _preset(config.FOCAL_PRESETS, pose)
+    forward, right, up = _camera_basis(position, focal)
+    orthographic = pose == "isometric"
+
+    # 背面剔除
+    centers = corners.mean(axis=1)
+    view_dirs = np.broadcast_to(forward, centers.shape) if orthographic else centers - position
+    front_facing = np.einsum("ij,ij->i", normals, view_dirs) < 0
+    corners, colors, centers = corners[front_facing], colors[front_facing], centers[front_facing]
+
+    # 投影到相机坐标
+    rel = corners - position
+    depth = rel @ forward
+    sx = rel @ right
+    sy = rel @ up
+    if not orthographic:
+        sx = sx / depth
+        sy = sy / depth
+
+    # 缩放到输出尺寸
+    supersample = 2
+    min_x, max_x = sx.min(), sx.max()
+    min_y, max_y = sy.min(), sy.max()
+    span = max(max_x - min_x, max_y - min_y)
+    margin = 0.04 * span
+    scale = (max_size * supersample - 1) / (span + 2 * margin)
+    width = int(np.ceil((max_x - min_x + 2 * margin) * scale)) + 1
+    height = int(np.ceil((max_y - min_y + 2 * margin) * scale)) + 1
+    px = (sx - min_x + margin) * scale
+    py = (max_y - sy + margin) * scale
+
+    order = np.argsort(-(centers - position) @ forward, kind="stable")
+    canvas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(canvas, "RGBA")
+    polygons = np.stack([px, py], axis=-1)
+    for idx in order:
+        color = tuple(int(c) for c in colors[idx])
+        points = [tuple(p) for p in polygons[idx]]
+        # 不透明纹素同时描边，消除相邻四边形之间的缝隙
+        draw.polygon(points, fill=color, outline=color if color[3] == 255 else None)
+
+    canvas = canvas.resize((max(1, width // supersample), max(1, height // supersample)), Image.LANCZOS)
+    return np.asarray(canvas)
@@ -0,0 +1,206 @@
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable
+
+from astrbot.api import logger
+
+from . import config, metrics, tracing
+
+# 优先级：数值越小越先运行
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# 排队较久时的回调，参数为当前排队位置（从 1 开始）
+NotifyCallback = Callable[[int], Awaitable[None]]
+
+
+class QueueFullError(Exception):
+    """排队的任务过多，消息可以直接发送给用户"""
+
+
+class _Job:
+    __slots__ = ("command", "priority", "tenant", "enqueued", "seq", "future")
+
+    def __init__(self, command: str, priority: int, tenant: str, seq: int):
+        self.command = command
+        self.priority = priority
+        self.tenant = tenant
+        self.enqueued = time.monotonic()
+        self.seq = seq
+        self.future: asyncio.Future | None = None
+
+
+class Scheduler:
+    """
+    全局渲染任务调度器，所有指令的渲染工作都经过这里。
+
+    最多 max_jobs 个任务同时运行，其余任务排队，每次有任务结束时按以下顺序选出下一个：
+    1. 优先级（廉价指令优先），每等待 aging 秒提升一级，避免昂贵指令被一直插队；
+    2. 同一优先级内在租户（群或私聊用户）之间轮转，最久没有被服务的租户优先，
+       单个群的大量请求不会挤占其他群；
+    3. 先到先得。
+    """
+
+    def __init__(self, max_jobs: int, max_queue: int, aging: float):
+        self.max_jobs = max(1, max_jobs)
+        self.max_queue = max_queue
+        self.aging = aging
+        self.running = 0
+        self._waiting: list[_Job] = []
+        # 租户 -> 上次被服务的序号，只保留有任务排队的租户
+        self._last_served: dict[str, int] = {}
+        self._seq = itertools.count()
+        self._served = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+    def _effective_priority(self, job: _Job, now: float) -> int:
+        if self.aging <= 0:
+            return job.priority
+        return job.priority - int((now - job.enqueued) // self.aging)
+
+    def _order(self, last_served: dict[str, int], now: float):
+        return lambda job: (self._effective_priority(job, now), last_served.get(job.tenant, -1), job.seq)
+
+    def position(self, job: _Job) -> int | None:
+        """按当前排队情况模拟调度顺序，返回任务的排队位置（从 1 开始），已不在队列中时返回 None"""
+        if job not in self._waiting:
+            return None
+        now = time.monotonic()
+        last_served = dict(self._last_served)
+        # 模拟中被服务的租户排在所有真实记录之后
+        served = itertools.count(next(self._served))
+        waiting = list(self._waiting)
+        for position in range(1, len(waiting) + 1):
+            nxt = min(waiting, key=self._order(last_served, now))
+            if nxt is job:
+                return position
+            waiting.remove(nxt)
+            last_served[nxt.tenant] = next(served)
+        return None
+
+    def _start(self, job: _Job) -> None:
+        self.running += 1
+        if any(waiting.tenant == job.tenant for waiting in self._waiting):
+            self._last_served[job.tenant] = next(self._served)
+        else:
+            self._last_served.pop(job.tenant, None)
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        while self._waiting and self.running < self.max_jobs:
+            job = min(self._waiting, key=self._order(self._last_served, now))
+            self._waiting.remove(job)
+            if job.future.done():
+                # 等待者已被取消，_abandon 会在其任务恢复时清理
+                continue
+            self._start(job)
+            job.future.set_result(None)
+
+    def _release(self) -> None:
+        self.running -= 1
+        self._dispatch()
+
+    def _enqueue(self, command: str, priority: int, tenant: str) -> _Job:
+        job = _Job(command, priority, tenant, next(self._seq))
+        if self.running < self.max_jobs and not self._waiting:
+            self._start(job)
+            return job
+        if len(self._waiting) >= self.max_queue:
+            logger.warning(f"{tracing.log_prefix()}渲染队列已满 ({len(self._waiting)} 个任务排队)，拒绝 {tenant} 的 /{command} 请求")
+            raise QueueFullError("当前排队的渲染任务过多，请稍后再试。")
+        job.future = asyncio.get_running_loop().create_future()
+        self._waiting.append(job)
+        # 有任务排队时才需要记录租户的服务顺序
+        self._last_served.setdefault(tenant, -1)
+        return job
+
+    def _abandon(self, job: _Job) -> None:
+        """等待中的任务被取消：仍在队列中则移除，已经分配到运行名额则归还"""
+        if job in self._waiting:
+            self._waiting.remove(job)
+            if not any(waiting.tenant == job.tenant for waiting in self._waiting):
+                self._last_served.pop(job.tenant, None)
+        elif job.future.done() and not job.future.cancelled():
+            self._release()
+
+    async def _wait(self, job: _Job, notify: NotifyCallback | None, notify_after: float) -> None:
+        if notify is None or notify_after <= 0:
+            await job.future
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(job.future), notify_after)
+            return
+        except asyncio.TimeoutError:
+            pass
+        position = self.position(job)
+        if position is not None:
+            try:
+                await notify(position)
+            except Exception as e:
+                logger.warning(f"发送排队提示失败: {e!r}")
+        await job.future
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        command: str,
+        priority: int,
+        tenant: str,
+        notify: NotifyCallback | None = None,
+        notify_after: float = config.SCHEDULER_NOTIFY_AFTER,
+    ):
+        """
+        获取一个运行名额，在 async with 块结束时归还。
+        排队超过 notify_after 秒时调用一次 notify 告知排队位置。
+
+        Raises:
+            QueueFullError: 排队任务数已达上限
+        """
+        job = self._enqueue(command, priority, tenant)
+        if job.future is not None:
+            with tracing.span("queue", priority=priority) as stage:
+                try:
+                    await self._wait(job, notify, notify_after)
+                except BaseException:
+                    self._abandon(job)
+                    raise
+                waited = time.monotonic() - job.enqueued
+                stage.set(waited_ms=round(waited * 1000, 1))
+            metrics.registry.observe("scheduler_wait_seconds", waited, command=command)
+        try:
+            yield
+        finally:
+            self._release()
+
+
+scheduler = Scheduler(config.SCHEDULER_MAX_JOBS, config.SCHEDULER_MAX_QUEUE, config.SCHEDULER_AGING_SECONDS)
+_notify_after = config.SCHEDULER_NOTIFY_AFTER
+
+
+def configure(plugin_config: dict) -> None:
+    """根据插件配置重建全局调度器"""
+    global scheduler, _notify_after
+    scheduler = Scheduler(
+        plugin_config.get("scheduler_max_jobs", config.SCHEDULER_MAX_JOBS),
+        plugin_config.get("scheduler_max_queue", config.SCHEDULER_MAX_QUEUE),
+        config.SCHEDULER_AGING_SECONDS,
+    )
+    _notify_after = plugin_config.get("scheduler_notify_after", config.SCHEDULER_NOTIFY_AFTER)
+
+
+def priority_for(command: str, rendertype: str | None = None) -> int:
+    """指令的调度优先级：廉价的渲染类型最高，其余按 SCHEDULER_COMMAND_PRIORITIES"""
+    if rendertype is not None and rendertype.lower() in config.SCHEDULER_CHEAP_RENDERTYPES:
+        return PRIORITY_HIGH
+    return config.SCHEDULER_COMMAND_PRIORITIES.get(command, PRIORITY_NORMAL)
+
+
+def slot(command: str, tenant: str, notify: NotifyCallback | None = None, rendertype: str | None = None):
+    """使用全局调度器获取运行名额，见 Scheduler.slot"""
+    return scheduler.slot(command, priority_for(command, rendertype), tenant, notify, _notify_after)
@@ -0,0 +1,61 @@
+import io
+
+from PIL import Image, ImageDraw, ImageFont
+
+from . import config
+
+
+def _load_font(size: int) -> ImageFont.ImageFont:
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 的默认字体不支持指定字号
+        return ImageFont.load_default()
+
+
+def _fit(img: Image.Image, width: int, height: int) -> Image.Image:
+    """等比缩放图片以放入 width x height 的格子；放大时使用最近邻以保持像素风格"""
+    scale = min(width / img.width, height / img.height)
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    if size == img.size:
+        return img
+    return img.resize(size, Image.NEAREST if scale > 1 else Image.LANCZOS)
+
+
+def compose_sheet(cells: list[tuple[str, bytes]], columns: int = config.SHEET_COLUMNS) -> bytes:
+    """
+    将多张渲染图按网格拼接为一张 PNG。
+
+    Args:
+        cells: (标签, 图片数据) 列表，按顺序从左到右、从上到下排列
+        columns: 每行最多的格子数
+
+    Returns:
+        拼接后的 PNG 数据
+    """
+    cell_w, cell_h = config.SHEET_CELL_SIZE
+    padding = config.SHEET_PADDING
+    label_h = config.SHEET_LABEL_SIZE + padding
+    columns = max(1, min(columns, len(cells)))
+    rows = (len(cells) + columns - 1) // columns
+
+    width = columns * cell_w + (columns + 1) * padding
+    height = rows * (cell_h + label_h) + (rows + 1) * padding
+    sheet = Image.new("RGBA", (width, height), config.SHEET_BACKGROUND)
+    draw = ImageDraw.Draw(sheet)
+    font = _load_font(config.SHEET_LABEL_SIZE)
+
+    for i, (label, data) in enumerate(cells):
+        row, col = divmod(i, columns)
+        x = padding + col * (cell_w + padding)
+        y = padding + row * (cell_h + label_h + padding)
+        with Image.open(io.BytesIO(data)) as img:
+            img = _fit(img.convert("RGBA"), cell_w, cell_h)
+        # 图片在格子内水平居中、底部对齐，使不同动作的脚底处于同一高度
+        sheet.alpha_composite(img, (x + (cell_w - img.width) // 2, y + cell_h - img.height))
+        text_w = draw.textlength(label, font=font)
+        draw.text((x + (cell_w - text_w) / 2, y + cell_h + padding), label, fill=config.SHEET_LABEL_COLOR, font=font)
+
+    buf = io.BytesIO()
+    sheet.save(buf, format="PNG")
+    return buf.getvalue()
@@ -0,0 +1,201 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from astrbot.api import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS names (
+    name_lower TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    uuid TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_names_hits ON names (hits DESC);
+CREATE TABLE IF NOT EXISTS profiles (
+    uuid TEXT PRIMARY KEY,
+    name TEXT,
+    textures TEXT,
+    updated_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class ProfileStore:
+    """
+    基于 SQLite (WAL 模式) 的玩家名 -> UUID 与 UUID -> 档案持久化存储。
+
+    所有数据库操作都在一个单线程执行器中完成，避免阻塞事件循环；
+    数据库在第一次使用时才打开。命中次数先累计在内存中，由 flush/compact 批量写入。
+    """
+
+    def __init__(self, db_path: str, ttl: float = 86400, max_rows: int = 50000):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._conn: sqlite3.Connection | None = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mcskin-store")
+        self._pending_hits: Counter = Counter()
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+            logger.info(f"玩家档案数据库已打开: {self.db_path}")
+        return self._conn
+
+    def _is_fresh(self, updated_at: float) -> bool:
+        return time.time() - updated_at < self.ttl
+
+    # ---- 玩家名 -> UUID ----
+
+    def _get_uuid(self, name: str) -> tuple[str, float] | None:
+        row = self._connect().execute(
+            "SELECT uuid, updated_at FROM names WHERE name_lower = ?", (name.lower(),)
+        ).fetchone()
+        return row
+
+    async def get_uuid(self, name: str) -> str | None:
+        """返回未过期的 UUID 记录，不存在或已过期返回 None"""
+        row = await self._run(self._get_uuid, name)
+        if row and self._is_fresh(row[1]):
+            return row[0]
+        return None
+
+    def _put_uuid(self, name: str, uuid: str) -> None:
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO names (name_lower, name, uuid, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(name_lower) DO UPDATE SET name = excluded.name, uuid = excluded.uuid, "
+            "updated_at = excluded.updated_at",
+            (name.lower(), name, uuid, time.time()),
+        )
+        conn.commit()
+
+    async def put_uuid(self, name: str, uuid: str) -> None:
+        await self._run(self._put_uuid, name, uuid)
+
+    def record_hit(self, name: str) -> None:
+        """记录一次玩家名查询，用于启动时预热热门玩家"""
+        self._pending_hits[name.lower()] += 1
+
+    # ---- UUID -> 档案 ----
+
+    def _get_profile(self, uuid: str) -> tuple | None:
+        return self._connect().execute(
+            "SELECT uuid, name, textures, updated_at FROM profiles WHERE uuid = ?", (uuid,)
+        ).fetchone()
+
+    async def get_profile(self, uuid: str, allow_stale: bool = False) -> dict | None:
+        """
+        返回 UUID 对应的档案记录 {uuid, name, textures, updated_at}。
+        默认只返回未过期的记录，allow_stale=True 时忽略过期时间。
+        """
+        row = await self._run(self._get_profile, uuid)
+        if not row or (not allow_stale and not self._is_fresh(row[3])):
+            return None
+        return {
+            "uuid": row[0],
+            "name": row[1],
+            "textures": json.loads(row[2]) if row[2] else None,
+            "updated_at": row[3],
+        }
+
+    def _put_profile(self, uuid: str, name: str | None, textures: dict | None) -> None:
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO profiles (uuid, name, textures, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(uuid) DO UPDATE SET name = COALESCE(excluded.name, profiles.name), "
+            "textures = COALESCE(excluded.textures, profiles.textures), updated_at = excluded.updated_at",
+            (uuid, name, json.dumps(textures) if textures is not None else None, time.time()),
+        )
+        conn.commit()
+
+    async def put_profile(self, uuid: str, name: str | None = None, textures: dict | None = None) -> None:
+        await self._run(self._put_profile, uuid, name, textures)
+
+    # ---- 预热与维护 ----
+
+    def _top_names(self, limit: int) -> list[tuple[str, str, float]]:
+        cutoff = time.time() - self.ttl
+        return self._connect().execute(
+            "SELECT name_lower, uuid, updated_at FROM names WHERE updated_at >= ? "
+            "ORDER BY hits DESC LIMIT ?",
+            (cutoff, limit),
+        ).fetchall()
+
+    async def top_names(self, limit: int) -> list[tuple[str, str, float]]:
+        """返回查询次数最多且未过期的 (玩家名小写, UUID, 更新时间) 列表"""
+        return await self._run(self._top_names, limit)
+
+    def _flush(self, hits: dict) -> None:
+        if not hits:
+            return
+        conn = self._connect()
+        conn.executemany(
+            "UPDATE names SET hits = hits + ? WHERE name_lower = ?",
+            [(count, name) for name, count in hits.items()],
+        )
+        conn.commit()
+
+    async def flush(self) -> None:
+        """将内存中累计的命中次数写入数据库"""
+        hits, self._pending_hits = self._pending_hits, Counter()
+        await self._run(self._flush, hits)
+
+    def _compact(self) -> tuple[int, int]:
+        conn = self._connect()
+        cutoff = time.time() - self.ttl
+        removed = conn.execute("DELETE FROM names WHERE updated_at < ?", (cutoff,)).rowcount
+        removed += conn.execute("DELETE FROM profiles WHERE updated_at < ?", (cutoff,)).rowcount
+        # 超出行数上限时，按命中次数淘汰冷门记录
+        removed += conn.execute(
+            "DELETE FROM names WHERE name_lower NOT IN "
+            "(SELECT name_lower FROM names ORDER BY hits DESC, updated_at DESC LIMIT ?)",
+            (self.max_rows,),
+        ).rowcount
+        conn.commit()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        total = conn.execute("SELECT COUNT(*) FROM names").fetchone()[0]
+        return removed, total
+
+    async def compact(self) -> None:
+        """写入命中计数，删除过期记录并截断 WAL 文件"""
+        await self.flush()
+        removed, total = await self._run(self._compact)
+        logger.info(f"玩家档案数据库整理完成：删除 {removed} 条过期记录，剩余 {total} 条玩家名记录")
+
+    async def run_maintenance(self, interval: float) -> None:
+        """后台循环，定期整理数据库"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.compact()
+            except Exception as e:
+                logger.error(f"整理玩家档案数据库时失败: {e}", exc_info=True)
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def close(self) -> None:
+        try:
+            await self.flush()
+        finally:
+            await self._run(self._close)
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,29 @@
+import importlib
+import importlib.machinery
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+PACKAGE = "mcskin_test_plugin"
+
+# 插件使用相对导入，将插件目录注册为一个包后再导入其中的模块（与 benchmarks/run.py 相同）
+if PACKAGE not in sys.modules:
+    spec = importlib.machinery.ModuleSpec(PACKAGE, None, is_package=True)
+    spec.submodule_search_locations = [str(ROOT)]
+    sys.modules[PACKAGE] = importlib.util.module_from_spec(spec)
+
+
+def plugin_module(name: str):
+    return importlib.import_module(f"{PACKAGE}.{name}")
+
+
+@pytest.fixture
+def utils():
+    """每个测试使用全新的 UUID / 材质缓存，并关闭批量查询"""
+    module = plugin_module("utils")
+    module.configure_uuid_lookup({"uuid_batch_window_ms": 0})
+    yield module
+    module.set_profile_store(None)
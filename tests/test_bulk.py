@@ -0,0 +1,44 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from conftest import plugin_module
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    async def json(self):
+        return self._payload
+
+
+def test_batch_resolves_and_holds_task_until_done(monkeypatch):
+    bulk = plugin_module("bulk")
+    requested = []
+    in_flight = []
+
+    @asynccontextmanager
+    async def request(session, method, url, json=None, **kwargs):
+        requested.append(list(json))
+        # 请求进行中，批量任务必须被模块持有引用
+        in_flight.append(len(bulk._send_tasks))
+        yield FakeResponse([{"id": f"id-{name.lower()}", "name": name} for name in json if name != "Nobody"])
+
+    monkeypatch.setattr(plugin_module("ratelimit"), "request", request)
+
+    async def main():
+        resolver = bulk.BulkNameResolver(window=0.001, max_batch=10)
+        return await asyncio.wait_for(
+            asyncio.gather(*(resolver.resolve(None, name) for name in ("Notch", "jeb_", "Nobody"))), 1
+        )
+
+    notch, jeb, nobody = asyncio.run(main())
+    assert requested == [["Notch", "jeb_", "Nobody"]]
+    assert in_flight == [1]
+    assert notch == {"id": "id-notch", "name": "Notch"}
+    assert jeb == {"id": "id-jeb_", "name": "jeb_"}
+    assert nobody is None
+    assert not bulk._send_tasks
@@ -0,0 +1,69 @@
+import asyncio
+import base64
+import json
+import sqlite3
+from contextlib import asynccontextmanager
+
+from conftest import plugin_module
+
+UUID = "069a79f444e94726a5befca90e38aaf5"
+
+
+class BrokenStore:
+    """所有操作都抛出 SQLite 错误的档案存储"""
+
+    def record_hit(self, name):
+        pass
+
+    async def _fail(self, *args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    get_uuid = put_uuid = get_profile = put_profile = _fail
+
+
+class FakeResponse:
+    def __init__(self, status, payload=None):
+        self.status = status
+        self._payload = payload
+
+    async def json(self):
+        return self._payload
+
+
+def fake_request(status, payload=None):
+    @asynccontextmanager
+    async def request(session, method, url, **kwargs):
+        yield FakeResponse(status, payload)
+    return request
+
+
+def test_username_lookup_survives_store_errors(utils, monkeypatch):
+    async def fetch(session, username):
+        return {"id": UUID, "name": "Notch"}, 200
+
+    monkeypatch.setattr(utils, "_fetch_player_by_name", fetch)
+    utils.set_profile_store(BrokenStore())
+    assert asyncio.run(utils.get_player_uuid(None, "Notch")) == (UUID, None)
+
+
+def test_uuid_lookup_survives_store_errors(utils, monkeypatch):
+    monkeypatch.setattr(plugin_module("ratelimit"), "request", fake_request(200))
+    utils.set_profile_store(BrokenStore())
+    assert asyncio.run(utils.get_player_uuid(None, UUID)) == (UUID, None)
+
+
+def test_textures_survive_store_errors(utils, monkeypatch):
+    textures = {"textures": {"SKIN": {"url": "http://textures.minecraft.net/texture/abc123"}}}
+    profile = {
+        "id": UUID,
+        "name": "Notch",
+        "properties": [{"name": "textures", "value": base64.b64encode(json.dumps(textures).encode()).decode()}],
+    }
+    monkeypatch.setattr(plugin_module("ratelimit"), "request", fake_request(200, profile))
+    utils.set_profile_store(BrokenStore())
+
+    # 读取失败视为未命中
+    assert asyncio.run(utils.get_known_textures(UUID)) == (None, True)
+    # 写入失败不影响返回从 Mojang 获取到的材质
+    result = asyncio.run(utils.fetch_skin_textures(None, UUID))
+    assert result == {"hash": "abc123", "url": "http://textures.minecraft.net/texture/abc123", "slim": False}
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import os
+import random
+import time
+import uuid as uuid_lib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from astrbot.api import logger
+
+from . import config
+
+
+class Span:
+    """一次指令中的一个计时阶段，子阶段按开始顺序记录在 children 中"""
+
+    __slots__ = ("name", "trace_id", "attrs", "start", "end", "children")
+
+    def __init__(self, name: str, trace_id: str, attrs: dict | None = None, start: float | None = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.attrs = attrs or {}
+        self.start = time.perf_counter() if start is None else start
+        self.end: float | None = None
+        self.children: list[Span] = []
+
+    def set(self, **attrs) -> None:
+        """为阶段附加属性（如状态码、字节数）"""
+        self.attrs.update(attrs)
+
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def to_dict(self, origin: float) -> dict:
+        data = {
+            "name": self.name,
+            "offset_ms": round((self.start - origin) * 1000, 1),
+            "duration_ms": round(self.duration() * 1000, 1),
+        }
+        if self.attrs:
+            data["attrs"] = self.attrs
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in self.children]
+        return data
+
+
+class _NoopSpan:
+    """没有进行中的追踪时返回的占位对象，调用方无需判断"""
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+_current: ContextVar[Span | None] = ContextVar("mcskin_span", default=None)
+
+# 由 configure 设置
+_slow_threshold = config.TRACE_SLOW_THRESHOLD
+_sample_rate = config.TRACE_SAMPLE_RATE
+_log_path: str | None = None
+
+
+def configure(plugin_config: dict, log_path: str | None) -> None:
+    """根据插件配置设置慢指令阈值、采样率与慢日志路径（路径为 None 时不写日志）"""
+    global _slow_threshold, _sample_rate, _log_path
+    _slow_threshold = plugin_config.get("trace_slow_threshold", config.TRACE_SLOW_THRESHOLD)
+    _sample_rate = plugin_config.get("trace_sample_rate", config.TRACE_SAMPLE_RATE)
+    _log_path = log_path
+
+
+def current_id() -> str | None:
+    """当前指令的关联 ID，没有进行中的追踪时返回 None"""
+    span = _current.get()
+    return span.trace_id if span is not None else None
+
+
+def log_prefix() -> str:
+    """日志行前缀 "[关联 ID] "，用于把插件日志与慢日志中的记录对应起来；没有进行中的追踪时为空"""
+    trace_id = current_id()
+    return f"[{trace_id}] " if trace_id else ""
+
+
+def start(command: str, **attrs) -> Span:
+    """开始一次指令追踪，生成新的关联 ID；需要配合 activate 与 finish 使用"""
+    return Span(command, uuid_lib.uuid4().hex[:12], attrs)
+
+
+@contextmanager
+def activate(span: Span):
+    """
+    在当前上下文中激活一个阶段，之后创建的 span 会成为它的子阶段。
+    用于把不在同一个任务中执行的代码（如 session_waiter 的回调）挂到原来的追踪下。
+    """
+    previous = _current.get()
+    _current.set(span)
+    try:
+        yield span
+    finally:
+        _current.set(previous)
+
+
+def finish(root: Span) -> None:
+    """结束一次指令追踪：耗时超过阈值或被采样时写入慢日志"""
+    root.end = time.perf_counter()
+    duration = root.duration()
+    slow = duration >= _slow_threshold
+    if slow:
+        logger.warning(f"[{root.trace_id}] /{root.name} 耗时 {duration:.1f} 秒，超过慢指令阈值")
+    if _log_path is None or not (slow or random.random() < _sample_rate):
+        return
+    record = {
+        "trace_id": root.trace_id,
+        "command": root.name,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(time.time() - duration)),
+        "duration_ms": round(duration * 1000, 1),
+        "slow": slow,
+        "attrs": root.attrs,
+        "spans": [child.to_dict(root.start) for child in root.children],
+    }
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    try:
+        asyncio.get_running_loop().run_in_executor(None, _append, _log_path, line)
+    except RuntimeError:
+        _append(_log_path, line)
+
+
+@contextmanager
+def trace(command: str, **attrs):
+    """追踪一次指令的完整处理过程，见 start / finish"""
+    root = start(command, **attrs)
+    with activate(root):
+        try:
+            yield root
+        except BaseException as e:
+            root.set(error=repr(e))
+            raise
+        finally:
+            finish(root)
+
+
+@contextmanager
+def span(name: str, parent: Span | None = None, **attrs):
+    """
+    记录一个阶段的耗时，作为当前阶段（或 parent）的子阶段。
+    没有进行中的追踪时不做任何记录。
+    """
+    parent = parent or _current.get()
+    if parent is None:
+        yield _NOOP
+        return
+    child = Span(name, parent.trace_id, attrs)
+    parent.children.append(child)
+    previous = _current.get()
+    _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.set(error=repr(e))
+        raise
+    finally:
+        child.end = time.perf_counter()
+        _current.set(previous)
+
+
+def record(name: str, started: float, parent: Span | None = None, **attrs) -> None:
+    """补记一个从 started（time.perf_counter()）持续到现在的阶段，如等待用户发送文件"""
+    parent = parent or _current.get()
+    if parent is None:
+        return
+    child = Span(name, parent.trace_id, attrs, start=started)
+    child.end = time.perf_counter()
+    parent.children.append(child)
+
+
+def _append(path: str, line: str) -> None:
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.exists(path) and os.path.getsize(path) > config.TRACE_SLOW_LOG_MAX_BYTES:
+            # 只保留一个历史文件
+            os.replace(path, path + ".1")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        logger.error(f"写入慢指令日志失败: {e}")
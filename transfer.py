@@ -1,30 +1,71 @@
+import asyncio
+import hashlib
 import aiohttp
 from astrbot.api import logger
 import json
 
+from . import config, ratelimit, tracing, transport
+from .cache import TTLCache
+from .singleflight import SingleFlight
+
+# 模型文件 SHA-256 -> tmpfiles.org 下载链接
+_upload_cache = TTLCache(config.MODEL_UPLOAD_CACHE_SIZE, config.MODEL_UPLOAD_CACHE_TTL)
+_upload_flight = SingleFlight()
+
+def hash_file(file_path: str) -> str:
+    """分块计算文件的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 async def upload_to_tmpfiles(session: aiohttp.ClientSession, file_path: str) -> str | None:
     """
-    将文件上传到 tmpfiles.org 并返回公共 URL
+    将文件上传到 tmpfiles.org 并返回公共 URL。
+    按文件内容哈希缓存上传结果，同一模型在 tmpfiles.org 保留期内再次使用时直接复用已有链接。
     """
+    try:
+        file_hash = await asyncio.to_thread(hash_file, file_path)
+    except OSError as e:
+        logger.error(f"读取待上传文件失败: {e}")
+        return None
+    cached_url = _upload_cache.get(file_hash)
+    if cached_url:
+        logger.info(f"模型文件已上传过，复用 tmpfiles.org 链接: {cached_url}")
+        return cached_url
+    # 同一模型的并发上传只进行一次
+    with tracing.span("upload_tmpfiles"):
+        public_url = await _upload_flight.do(file_hash, lambda: _upload_to_tmpfiles(session, file_path))
+    if public_url:
+        _upload_cache.set(file_hash, public_url)
+    return public_url
+
+async def _upload_to_tmpfiles(session: aiohttp.ClientSession, file_path: str) -> str | None:
+    """实际的上传请求，文件以流的方式分块发送，不会整个读入内存"""
+    opened_files = []
     try:
         logger.info(f"正在尝试上传文件到 tmpfiles.org: {file_path}...")
-        
-        data = aiohttp.FormData()
-        data.add_field('file',
-                       open(file_path, 'rb'),
-                       filename = file_path.split('/')[-1] + '.obj'
-                       )
-
-        # tmpfiles.org API endpoint
-        url = 'https://tmpfiles.org/api/v1/upload'
-        
+        filename = file_path.split('/')[-1]
+        if not filename.endswith('.obj'):
+            filename += '.obj'
+
+        def build_form() -> aiohttp.FormData:
+            # 每次重试都需要重新构建表单，打开的文件在上传结束后统一关闭
+            f = open(file_path, 'rb')
+            opened_files.append(f)
+            data = aiohttp.FormData()
+            data.add_field('file', f, filename=filename)
+            return data
+
         # 设置请求头
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
         }
 
-        # 增加30秒超时
-        async with session.post(url, data=data, headers=headers, timeout=30) as response:
+        async with ratelimit.request(
+            session, "POST", config.TMPFILES_UPLOAD_URL, data=build_form, headers=headers, timeout=transport.timeout("upload")
+        ) as response:
             if response.status == 200:
                 result = await response.json()
                 if result.get("status") == "success":
@@ -48,3 +89,6 @@ async def upload_to_tmpfiles(session: aiohttp.ClientSession, file_path: str) ->
     except Exception as e:
         logger.error(f"上传到 tmpfiles.org 过程中发生异常: {e}", exc_info=True)
         return None
+    finally:
+        for f in opened_files:
+            f.close()
@@ -0,0 +1,61 @@
+import aiohttp
+
+from . import config, metrics
+
+# 各类请求的超时配置，由 configure 根据插件配置生成
+_timeouts: dict[str, aiohttp.ClientTimeout] = {}
+
+
+def _build_timeouts(plugin_config: dict) -> dict[str, aiohttp.ClientTimeout]:
+    connect = plugin_config.get("http_connect_timeout", config.HTTP_CONNECT_TIMEOUT)
+    timeouts = {}
+    for kind, (total, sock_read) in config.HTTP_TIMEOUTS.items():
+        total = plugin_config.get(f"http_{kind}_timeout", total)
+        timeouts[kind] = aiohttp.ClientTimeout(
+            total=total,
+            connect=connect,
+            sock_connect=connect,
+            sock_read=min(sock_read, total),
+        )
+    return timeouts
+
+
+def configure(plugin_config: dict) -> None:
+    """根据插件配置生成各类请求的超时设置"""
+    global _timeouts
+    _timeouts = _build_timeouts(plugin_config)
+
+
+def timeout(kind: str = "default") -> aiohttp.ClientTimeout:
+    """
+    返回某类请求的超时设置。
+
+    Args:
+        kind: "default"、"api"（Mojang 等接口）、"render"（渲染图片下载）或 "upload"（文件上传）
+    """
+    if not _timeouts:
+        configure({})
+    return _timeouts.get(kind) or _timeouts["default"]
+
+
+def create_session(plugin_config: dict) -> aiohttp.ClientSession:
+    """
+    创建插件共享的 aiohttp.ClientSession。
+
+    连接池按总数和单个主机分别限制，保持长连接以复用 TCP/TLS 连接，
+    并缓存 DNS 解析结果；未指定超时的请求使用 "default" 超时。
+    所有请求都会经过 metrics 的追踪钩子，按上游主机记录请求数、状态码、耗时与流量。
+    """
+    configure(plugin_config)
+    connector = aiohttp.TCPConnector(
+        limit=plugin_config.get("http_pool_size", config.HTTP_POOL_SIZE),
+        limit_per_host=plugin_config.get("http_pool_size_per_host", config.HTTP_POOL_SIZE_PER_HOST),
+        ttl_dns_cache=config.HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=timeout("default"),
+        headers={"User-Agent": config.HTTP_USER_AGENT},
+        trace_configs=[metrics.trace_config()],
+    )
@@ -0,0 +1,78 @@
+import asyncio
+import io
+import math
+
+import aiohttp
+from PIL import Image
+
+from . import config
+from .render_cache import download as download_render
+
+
+def clamp_frames(frames: int) -> int:
+    """将配置的帧数限制在 TURNTABLE_MIN_FRAMES 到 TURNTABLE_MAX_FRAMES 之间"""
+    return max(config.TURNTABLE_MIN_FRAMES, min(frames, config.TURNTABLE_MAX_FRAMES))
+
+
+def orbit_positions(camera: dict, focal: dict, frames: int) -> list[dict]:
+    """
+    以焦点为中心、绕竖直轴生成 frames 个均匀分布的相机位置。
+    轨道半径与高度取自起始相机位置，返回值与预设格式相同（坐标为字符串）。
+    """
+    fx, fy, fz = (float(focal[k]) for k in ("x", "y", "z"))
+    dx = float(camera["x"]) - fx
+    dz = float(camera["z"]) - fz
+    height = float(camera["y"])
+    radius = math.hypot(dx, dz) or config.TURNTABLE_MIN_RADIUS
+    start = math.atan2(dz, dx)
+    positions = []
+    for i in range(frames):
+        angle = start + 2 * math.pi * i / frames
+        positions.append({
+            "x": f"{fx + radius * math.cos(angle):.2f}",
+            "y": f"{height:.2f}",
+            "z": f"{fz + radius * math.sin(angle):.2f}",
+        })
+    return positions
+
+
+async def fetch_frames(
+    session: aiohttp.ClientSession,
+    urls: list[str],
+    concurrency: int = config.TURNTABLE_CONCURRENCY,
+) -> list[bytes | None]:
+    """并发下载所有帧（最多 concurrency 个同时进行），结果顺序与 urls 相同，失败的帧为 None"""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(url: str) -> bytes | None:
+        async with semaphore:
+            return await download_render(session, url)
+
+    return await asyncio.gather(*(fetch(url) for url in urls))
+
+
+def assemble(frames: list[bytes], image_format: str, duration: int) -> bytes:
+    """
+    将各帧合成为循环播放的动图（GIF 或 WebP）。
+    帧尺寸不一致时居中放到统一大小的透明画布上。
+    """
+    images = []
+    for data in frames:
+        with Image.open(io.BytesIO(data)) as img:
+            images.append(img.convert("RGBA"))
+    width = max(img.width for img in images)
+    height = max(img.height for img in images)
+    canvases = []
+    for img in images:
+        canvas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        canvas.alpha_composite(img, ((width - img.width) // 2, (height - img.height) // 2))
+        canvases.append(canvas)
+
+    buf = io.BytesIO()
+    options = {"save_all": True, "append_images": canvases[1:], "duration": duration, "loop": 0}
+    if image_format == "webp":
+        canvases[0].save(buf, format="WEBP", quality=config.TURNTABLE_WEBP_QUALITY, **options)
+    else:
+        # 每帧替换而不是叠加在上一帧之上，否则透明背景会残留上一帧的图像
+        canvases[0].save(buf, format="GIF", disposal=2, **options)
+    return buf.getvalue()
@@ -1,14 +1,90 @@
 import aiohttp
 import os
+import re
+import json
+import time
+import base64
+import sqlite3
 import asyncio
 import uuid as uuid_lib
 from astrbot.api import logger
 
-from . import config
+from . import config, ratelimit, tracing, transport
+from .cache import TTLCache
+from .store import ProfileStore
+from .bulk import BulkNameResolver
+from .singleflight import SingleFlight
+
+# 玩家名 -> UUID 的内存缓存，值为 UUID 字符串，None 表示已确认玩家不存在
+_uuid_cache = TTLCache(config.UUID_CACHE_MAX_SIZE, config.UUID_CACHE_TTL)
+_negative_ttl = config.UUID_NEGATIVE_CACHE_TTL
+_username_re = re.compile(config.USERNAME_PATTERN)
+# 玩家名批量查询器，批处理窗口为 0 时为 None（逐个查询）
+_bulk_resolver: BulkNameResolver | None = BulkNameResolver(config.UUID_BATCH_WINDOW_MS / 1000, config.MOJANG_BULK_MAX_NAMES)
+# 合并相同玩家的并发查询
+_uuid_flight = SingleFlight()
+# UUID -> (皮肤材质信息, 上次校验时间)
+_texture_cache = TTLCache(config.UUID_CACHE_MAX_SIZE, config.TEXTURE_CACHE_TTL)
+_texture_flight = SingleFlight()
+_texture_revalidate_interval = config.TEXTURE_REVALIDATE_INTERVAL
+# 持久化的玩家档案存储，由插件在 initialize 时设置
+_profile_store: ProfileStore | None = None
+
+def configure_uuid_lookup(plugin_config: dict) -> None:
+    """根据插件配置重建 UUID 缓存与批量查询器"""
+    global _uuid_cache, _negative_ttl, _bulk_resolver, _texture_revalidate_interval
+    _uuid_cache = TTLCache(
+        plugin_config.get("uuid_cache_size", config.UUID_CACHE_MAX_SIZE),
+        plugin_config.get("uuid_cache_ttl", config.UUID_CACHE_TTL),
+    )
+    _negative_ttl = plugin_config.get("uuid_negative_cache_ttl", config.UUID_NEGATIVE_CACHE_TTL)
+    window_ms = plugin_config.get("uuid_batch_window_ms", config.UUID_BATCH_WINDOW_MS)
+    _bulk_resolver = BulkNameResolver(window_ms / 1000, config.MOJANG_BULK_MAX_NAMES) if window_ms > 0 else None
+    _texture_revalidate_interval = plugin_config.get(
+        "texture_revalidate_interval", config.TEXTURE_REVALIDATE_INTERVAL
+    )
+
+async def _store_call(coro, action: str):
+    """
+    执行一次持久化存储操作。存储只是尽力而为的缓存：失败时记录警告并返回 None，
+    读取失败视为未命中，写入失败视为跳过，不影响向上游查询。
+    """
+    try:
+        return await coro
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"{tracing.log_prefix()}玩家档案存储{action}失败，已跳过: {e!r}")
+        return None
+
+def set_profile_store(store: ProfileStore | None) -> None:
+    """设置 get_player_uuid 使用的持久化存储"""
+    global _profile_store
+    _profile_store = store
+
+async def warm_up_uuid_cache(limit: int) -> int:
+    """从持久化存储中加载最常查询的玩家到内存缓存，返回加载数量"""
+    if _profile_store is None or limit <= 0:
+        return 0
+    rows = await _profile_store.top_names(limit)
+    for name_lower, uuid, _ in rows:
+        _uuid_cache.set(f"name:{name_lower}", uuid)
+    return len(rows)
+
+def get_data_dir() -> str:
+    """返回插件的数据目录（位于 AstrBot 的 data/plugin_data 下）"""
+    from astrbot.core.utils.astrbot_path import get_astrbot_data_path
+    path = os.path.join(get_astrbot_data_path(), "plugin_data", config.PLUGIN_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def is_valid_username(username: str) -> bool:
+    """本地检查玩家名格式（3-16 位字母、数字或下划线）"""
+    return bool(_username_re.match(username))
 
 async def get_player_uuid(session: aiohttp.ClientSession, username: str) -> tuple[str | None, str | None]:
     """
     通过 Mojang API 获取玩家 UUID，如果传入的已经是UUID，则直接格式化并返回。
+    查询结果（包括"玩家不存在"）会按配置的 TTL 缓存在内存中，
+    同一玩家的并发查询只会发起一次上游请求。
     
     Args:
         session: aiohttp.ClientSession
@@ -17,56 +93,233 @@ async def get_player_uuid(session: aiohttp.ClientSession, username: str) -> tupl
     Returns:
         tuple[uuid, error_msg]: 成功返回 (uuid, None)，失败返回 (None, error_msg)
     """
+    try:
+        flight_key = f"uuid:{uuid_lib.UUID(username).hex}"
+    except ValueError:
+        flight_key = f"name:{username.lower()}"
+        if _profile_store is not None and is_valid_username(username):
+            _profile_store.record_hit(username)
+    with tracing.span("uuid_lookup", player=username):
+        return await _uuid_flight.do(flight_key, lambda: _lookup_player_uuid(session, username))
+
+async def _lookup_player_uuid(session: aiohttp.ClientSession, username: str) -> tuple[str | None, str | None]:
+    """get_player_uuid 的实际查询逻辑：内存缓存 -> 持久化存储 -> Mojang API"""
     # 检查传入的 username 是否已经是 UUID
     try:
         # 尝试将输入解析为UUID对象
         parsed_uuid = uuid_lib.UUID(username)
-        # 如果成功，格式化为32位无连字符的字符串
-        uuid_hex = parsed_uuid.hex
-    
-        # 验证UUID是否存在
-        validation_url = config.MOJANG_API_UUID_URL.format(uuid=uuid_hex)
-        async with session.get(validation_url) as response:
-            if response.status == 200:
-                logger.info(f"UUID '{parsed_uuid}' 验证成功，直接使用: {uuid_hex}")
-                return uuid_hex, None
-            elif response.status == 404:
-                logger.warning(f"UUID '{parsed_uuid}' 格式正确但不存在。")
-                return None, f"错误：UUID '{username}' 对应的玩家不存在。"
-            else:
-                logger.error(f"验证UUID时发生API错误，状态码: {response.status}")
-                return None, "验证UUID时发生网络错误。"
-    
     except ValueError:
         # 如果不是有效的UUID，则继续执行API查询
+        parsed_uuid = None
         logger.info(f"输入 '{username}' 不是UUID，将作为玩家名进行查询。")
 
-    mojang_url = config.MOJANG_API_URL.format(username=username)
+    if parsed_uuid is not None:
+        try:
+            return await _lookup_uuid(session, username, parsed_uuid)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"验证 UUID '{parsed_uuid}' 时发生网络错误: {e!r}")
+            return None, "查询玩家信息时发生网络错误，请稍后再试。"
+        except Exception as e:
+            logger.error(f"验证 UUID '{parsed_uuid}' 时发生未知错误: {e}", exc_info=True)
+            return None, "查询玩家信息时发生内部错误。"
+
+    # 格式不合法的玩家名不可能存在，无需请求 Mojang
+    if not is_valid_username(username):
+        logger.info(f"玩家名 '{username}' 格式不合法，跳过查询。")
+        return None, f"错误：找不到玩家 '{username}'。"
+
+    cache_key = f"name:{username.lower()}"
+    cached = _uuid_cache.get(cache_key, False)
+    if cached is not False:
+        if cached is None:
+            return None, f"错误：找不到玩家 '{username}'。"
+        logger.info(f"命中 UUID 缓存: {username} -> {cached}")
+        return cached, None
+
+    if _profile_store is not None:
+        stored = await _store_call(_profile_store.get_uuid(username), "读取")
+        if stored:
+            logger.info(f"命中持久化 UUID 记录: {username} -> {stored}")
+            _uuid_cache.set(cache_key, stored)
+            return stored, None
+
     logger.info(f"正在为 {username} 异步查询 UUID...")
     
     try:
-        async with session.get(mojang_url) as response:
-            if response.status != 200:
-                logger.warning(f"Mojang API 玩家 {username} 未找到 (状态: {response.status})。")
-                return None, f"错误：找不到玩家 '{username}'。"
-            
-            player_data = await response.json()
-            uuid = player_data.get("id")
-            
-            if not uuid:
-                logger.error(f"Mojang API 响应中未找到 {username} 的 UUID。")
-                return None, "获取玩家数据时出错。"
-            
-            logger.info(f"成功获取 {username} 的 UUID: {uuid}")
-            return uuid, None
+        if _bulk_resolver is not None:
+            # 通过批量接口查询，同一时间窗口内的查询会合并为一次请求
+            player_data = await _bulk_resolver.resolve(session, username)
+            status = 200 if player_data else 404
+        else:
+            player_data, status = await _fetch_player_by_name(session, username)
+
+        if status == 429:
+            logger.warning(f"Mojang API 查询 {username} 时被限流，重试次数已用尽。")
+            return None, "错误：查询玩家信息过于频繁，请稍后再试。"
+
+        if status != 200:
+            logger.warning(f"Mojang API 玩家 {username} 未找到 (状态: {status})。")
+            # 只缓存明确的"不存在"响应，限流或服务端错误不缓存
+            if status in (204, 404):
+                _uuid_cache.set(cache_key, None, _negative_ttl)
+            return None, f"错误：找不到玩家 '{username}'。"
+
+        uuid = player_data.get("id")
+
+        if not uuid:
+            logger.error(f"Mojang API 响应中未找到 {username} 的 UUID。")
+            return None, "获取玩家数据时出错。"
+
+        logger.info(f"成功获取 {username} 的 UUID: {uuid}")
+        _uuid_cache.set(cache_key, uuid)
+        if _profile_store is not None:
+            await _store_call(_profile_store.put_uuid(player_data.get("name") or username, uuid), "写入")
+        return uuid, None
             
-    except aiohttp.ClientError as e:
+    except aiohttp.ClientResponseError as e:
+        if e.status == 429:
+            logger.warning(f"Mojang API 批量查询 {username} 时被限流，重试次数已用尽。")
+            return None, "错误：查询玩家信息过于频繁，请稍后再试。"
         logger.error(f"为 {username} 获取 UUID 时发生 aiohttp ClientError: {e}")
         return None, "查询玩家信息时发生网络错误，请稍后再试。"
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"为 {username} 获取 UUID 时发生网络错误: {e!r}")
+        return None, "查询玩家信息时发生网络错误，请稍后再试。"
     except Exception as e:
         logger.error(f"获取 {username} 的 UUID 时发生未知错误: {e}", exc_info=True)
         return None, "查询玩家信息时发生内部错误。"
 
+async def _lookup_uuid(
+    session: aiohttp.ClientSession, username: str, parsed_uuid: uuid_lib.UUID
+) -> tuple[str | None, str | None]:
+    """验证输入的 UUID 是否对应存在的玩家：内存缓存 -> 持久化存储 -> Mojang API"""
+    # 格式化为32位无连字符的字符串
+    uuid_hex = parsed_uuid.hex
+
+    cache_key = f"uuid:{uuid_hex}"
+    cached = _uuid_cache.get(cache_key, False)
+    if cached is not False:
+        if cached is None:
+            return None, f"错误：UUID '{username}' 对应的玩家不存在。"
+        return cached, None
+
+    if _profile_store is not None and await _store_call(_profile_store.get_profile(uuid_hex), "读取"):
+        _uuid_cache.set(cache_key, uuid_hex)
+        return uuid_hex, None
+
+    # 验证UUID是否存在
+    validation_url = config.MOJANG_API_UUID_URL.format(uuid=uuid_hex)
+    async with ratelimit.request(session, "GET", validation_url, timeout=transport.timeout("api")) as response:
+        if response.status == 200:
+            logger.info(f"UUID '{parsed_uuid}' 验证成功，直接使用: {uuid_hex}")
+            _uuid_cache.set(cache_key, uuid_hex)
+            if _profile_store is not None:
+                await _store_call(_profile_store.put_profile(uuid_hex), "写入")
+            return uuid_hex, None
+        elif response.status == 404:
+            logger.warning(f"UUID '{parsed_uuid}' 格式正确但不存在。")
+            _uuid_cache.set(cache_key, None, _negative_ttl)
+            return None, f"错误：UUID '{username}' 对应的玩家不存在。"
+        else:
+            logger.error(f"验证UUID时发生API错误，状态码: {response.status}")
+            return None, "验证UUID时发生网络错误。"
+
+async def _fetch_player_by_name(session: aiohttp.ClientSession, username: str) -> tuple[dict | None, int]:
+    """通过单个玩家名接口查询，返回 (玩家数据, 状态码)"""
+    mojang_url = config.MOJANG_API_URL.format(username=username)
+    async with ratelimit.request(session, "GET", mojang_url, timeout=transport.timeout("api")) as response:
+        if response.status != 200:
+            return None, response.status
+        return await response.json(), response.status
+
+async def resolve_player_uuids(
+    session: aiohttp.ClientSession,
+    usernames: list[str],
+    concurrency: int = config.UUID_LOOKUP_CONCURRENCY,
+) -> list[tuple[str | None, str | None]]:
+    """
+    并发查询多个玩家的 UUID，并发数由信号量限制。
+
+    Returns:
+        与 usernames 顺序一致的 (uuid, error_msg) 列表
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def resolve(username: str) -> tuple[str | None, str | None]:
+        async with semaphore:
+            return await get_player_uuid(session, username)
+
+    return list(await asyncio.gather(*(resolve(name) for name in usernames)))
+
+def parse_textures_property(profile: dict) -> dict | None:
+    """
+    从会话服务器返回的玩家档案中解析皮肤材质信息。
+
+    Returns:
+        {"hash": 材质哈希, "url": 皮肤 URL, "slim": 是否为纤细模型}，
+        玩家使用默认皮肤时 hash 与 url 为 None；档案中没有 textures 属性时返回 None
+    """
+    for prop in profile.get("properties", []):
+        if prop.get("name") != "textures":
+            continue
+        payload = json.loads(base64.b64decode(prop["value"]))
+        skin = payload.get("textures", {}).get("SKIN")
+        if not skin:
+            return {"hash": None, "url": None, "slim": False}
+        url = skin.get("url", "")
+        return {
+            "hash": url.rsplit("/", 1)[-1] or None,
+            "url": url,
+            "slim": skin.get("metadata", {}).get("model") == "slim",
+        }
+    return None
+
+async def fetch_skin_textures(session: aiohttp.ClientSession, uuid: str) -> dict | None:
+    """
+    从 Mojang 会话服务器获取玩家当前的皮肤材质信息，并更新内存缓存与持久化存储。
+    请求失败返回 None。
+    """
+    return await _texture_flight.do(uuid, lambda: _fetch_skin_textures(session, uuid))
+
+async def _fetch_skin_textures(session: aiohttp.ClientSession, uuid: str) -> dict | None:
+    url = config.MOJANG_SESSION_PROFILE_URL.format(uuid=uuid)
+    try:
+        async with ratelimit.request(session, "GET", url, timeout=transport.timeout("api")) as response:
+            if response.status != 200:
+                logger.warning(f"获取玩家 {uuid} 的皮肤材质失败 (状态: {response.status})")
+                return None
+            profile = await response.json()
+        textures = parse_textures_property(profile)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+        logger.error(f"获取玩家 {uuid} 的皮肤材质时发生错误: {e}")
+        return None
+    if textures is None:
+        return None
+
+    _texture_cache.set(uuid, (textures, time.monotonic()))
+    if _profile_store is not None:
+        await _store_call(_profile_store.put_profile(uuid, profile.get("name"), textures), "写入")
+    return textures
+
+async def get_known_textures(uuid: str) -> tuple[dict | None, bool]:
+    """
+    返回上次已知的皮肤材质信息（可能已过时），不请求上游。
+
+    Returns:
+        tuple[textures, needs_revalidate]: 距上次校验超过重新校验间隔时 needs_revalidate 为 True
+    """
+    cached = _texture_cache.get(uuid)
+    if cached:
+        textures, checked_at = cached
+        return textures, time.monotonic() - checked_at > _texture_revalidate_interval
+    if _profile_store is not None:
+        profile = await _store_call(_profile_store.get_profile(uuid, allow_stale=True), "读取")
+        if profile and profile["textures"]:
+            age = time.time() - profile["updated_at"]
+            _texture_cache.set(uuid, (profile["textures"], time.monotonic() - age))
+            return profile["textures"], age > _texture_revalidate_interval
+    return None, True
+
 def build_render_url(rendertype: str, uuid: str) -> str:
     """
     构建 Starlight 渲染 API 的 URL
@@ -78,13 +331,16 @@ def build_render_url(rendertype: str, uuid: str) -> str:
     Returns:
         完整的渲染 URL
     """
-    rendercrop = config.SKIN_RENDERCROP if rendertype == "skin" else config.DEFAULT_RENDERCROP
     return config.STARLIGHT_RENDER_URL.format(
         rendertype=rendertype,
         uuid=uuid,
-        rendercrop=rendercrop
+        rendercrop=get_rendercrop(rendertype)
     )
 
+def get_rendercrop(rendertype: str) -> str:
+    """返回渲染类型对应的 rendercrop"""
+    return config.SKIN_RENDERCROP if rendertype == "skin" else config.DEFAULT_RENDERCROP
+
 def validate_rendertype(rendertype: str) -> tuple[bool, str | None]:
     """
     验证渲染类型是否有效